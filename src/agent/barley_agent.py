@@ -1,9 +1,11 @@
-import json
-
-from vega_datasets import data
 from langchain_core.messages import AIMessage
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.graph import StateGraph, MessagesState, START, END
 
+from agent.schema import data_message
+from utils.dataset_registry import dataset_registry
+from utils.tracing import node_tracer
+
 
 column_mapping = {
     'yield': '产量',
@@ -21,18 +23,20 @@ def node_start(state: MessagesState):
 def call_model(state: MessagesState):
     print("start call model...")
 
-    barley = data.barley()
-    filtered_df = barley[barley["year"] == 1931]
-    data_json = filtered_df.to_dict(orient="records")
+    data_table = dataset_registry.view("barley", year=1931)
 
-    return {"messages": [AIMessage(content="获取到数据, 如下："), AIMessage(content=json.dumps(data_json, ensure_ascii=False))]}
+    # 数据以 Arrow IPC 附件随消息传递，不再序列化为 JSON 文本
+    return {"messages": [AIMessage(content="获取到数据, 如下："), data_message(data_table)]}
 
 
-def build_graph():
+def build_graph(checkpointer: BaseCheckpointSaver = None):
+    """构建图
+    :param checkpointer: 检查点，挂载后状态按 thread_id 保存，每轮只需发送新消息
+    """
     graph1 = StateGraph(MessagesState)
-    graph1.add_node("start", node_start)
-    graph1.add_node("model", call_model)
+    graph1.add_node("start", node_tracer.wrap("barley", "start", node_start))
+    graph1.add_node("model", node_tracer.wrap("barley", "model", call_model))
     graph1.add_edge(START, "start")
     graph1.add_edge("start", "model")
     graph1.add_edge("model", END)
-    return graph1.compile()
\ No newline at end of file
+    return graph1.compile(checkpointer=checkpointer)
\ No newline at end of file
@@ -0,0 +1,452 @@
+"""图状态检查点
+
+图编译时挂载检查点后，会话状态按 thread_id 保存在服务端，前端每轮只需发送新消息，
+不必每轮重发并重新序列化完整的对话历史。
+
+- memory：进程内存储，按线程保留最近的检查点，线程数超出上限时淘汰最久未访问的线程
+- sqlite：本地 SQLite 文件（WAL 模式，读写互不阻塞），可在同一节点的多个进程间共享、重启后恢复
+- none：不挂载检查点，前端每轮发送完整历史
+
+注意：压缩只保留每个线程最近的检查点，依赖 DeltaChannel 的图（需逐个回放祖先检查点的写入）不能使用。
+"""
+import asyncio
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Iterator, Sequence
+from typing import Any, Optional
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    SerializerProtocol,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.memory import InMemorySaver
+
+CHECKPOINT_BACKEND = os.getenv("CHECKPOINT_BACKEND", "memory") # memory / sqlite / none
+CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH", os.path.join(tempfile.gettempdir(), "streamlit-demo-checkpoint.db"))
+CHECKPOINT_KEEP_LAST = int(os.getenv("CHECKPOINT_KEEP_LAST", 4)) # 每个线程保留的检查点数，0 表示不压缩
+CHECKPOINT_MAX_THREADS = int(os.getenv("CHECKPOINT_MAX_THREADS", 1000)) # memory 模式保留的线程数上限
+
+
+def _thread_config(thread_id: str, checkpoint_ns: str, checkpoint_id: Optional[str]) -> Optional[RunnableConfig]:
+    if not checkpoint_id:
+        return None
+    return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}}
+
+
+class CompactingMemorySaver(InMemorySaver):
+    """带压缩的内存检查点：每个线程只保留最近的检查点，线程按 LRU 淘汰"""
+
+    def __init__(self, keep_last: int = CHECKPOINT_KEEP_LAST, max_threads: int = CHECKPOINT_MAX_THREADS,
+                 serde: SerializerProtocol | None = None):
+        """
+        :param keep_last: 每个线程保留的检查点数，检查点数超过 2 倍时压缩，0 表示不压缩
+        :param max_threads: 保留的线程数上限，0 表示不限制
+        :param serde: 序列化器
+        """
+        super().__init__(serde=serde)
+        self.keep_last = keep_last
+        self.max_threads = max_threads
+        self._recent: OrderedDict[str, None] = OrderedDict() # 线程访问顺序
+        self._lock = threading.Lock()
+
+    def _touch(self, thread_id: str) -> None:
+        with self._lock:
+            self._recent[thread_id] = None
+            self._recent.move_to_end(thread_id)
+            evicted = []
+            while self.max_threads and len(self._recent) > self.max_threads:
+                evicted.append(self._recent.popitem(last=False)[0])
+        for old_thread_id in evicted:
+            super().delete_thread(old_thread_id)
+
+    def has_thread(self, thread_id: str) -> bool:
+        """线程是否有检查点（不反序列化状态）"""
+        return any(self.storage.get(thread_id, {}).values())
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        thread_id = config["configurable"]["thread_id"]
+        if thread_id in self.storage:
+            self._touch(thread_id)
+        return super().get_tuple(config)
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        next_config = super().put(config, checkpoint, metadata, new_versions)
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        if self.keep_last and len(self.storage[thread_id][checkpoint_ns]) > self.keep_last * 2:
+            self._compact(thread_id, checkpoint_ns, self.keep_last)
+        self._touch(thread_id)
+        return next_config
+
+    def _compact(self, thread_id: str, checkpoint_ns: str, keep: int) -> int:
+        """删除线程中较早的检查点、对应的写入，以及不再被引用的通道值
+        :return: 删除的检查点数
+        """
+        checkpoints = self.storage[thread_id][checkpoint_ns]
+        dropped = sorted(checkpoints)[:-keep] if keep else list(checkpoints)
+        for checkpoint_id in dropped:
+            del checkpoints[checkpoint_id]
+            self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+
+        referenced = set()
+        for saved, _, _ in checkpoints.values():
+            referenced.update(self.serde.loads_typed(saved)["channel_versions"].items())
+        for key in list(self.blobs): # 先复制键，避免其他线程写入时迭代出错
+            if key[0] == thread_id and key[1] == checkpoint_ns and (key[2], key[3]) not in referenced:
+                del self.blobs[key]
+        return len(dropped)
+
+    def prune(self, thread_ids: Sequence[str], *, strategy: str = "keep_latest") -> None:
+        """压缩指定线程：keep_latest 只保留最新的检查点，delete 删除全部"""
+        for thread_id in thread_ids:
+            if strategy == "delete":
+                self.delete_thread(thread_id)
+                continue
+            for checkpoint_ns in list(self.storage.get(thread_id, {})):
+                self._compact(thread_id, checkpoint_ns, 1)
+
+    async def aprune(self, thread_ids: Sequence[str], *, strategy: str = "keep_latest") -> None:
+        self.prune(thread_ids, strategy=strategy)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._recent.pop(thread_id, None)
+        super().delete_thread(thread_id)
+
+
+class SqliteCheckpointSaver(BaseCheckpointSaver[str]):
+    """基于本地 SQLite 的检查点
+
+    - WAL 模式：读不阻塞写，多个进程可共享同一个文件
+    - 通道值按版本单独存储，每一步只写入发生变化的通道，未变化的大状态不重复序列化
+    - 每个线程只保留最近的检查点，超过 2 倍时压缩
+    """
+
+    _SCHEMA = """
+    CREATE TABLE IF NOT EXISTS checkpoints (
+        thread_id TEXT NOT NULL,
+        checkpoint_ns TEXT NOT NULL DEFAULT '',
+        checkpoint_id TEXT NOT NULL,
+        parent_checkpoint_id TEXT,
+        type TEXT,
+        checkpoint BLOB,
+        metadata_type TEXT,
+        metadata BLOB,
+        PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+    );
+    CREATE TABLE IF NOT EXISTS blobs (
+        thread_id TEXT NOT NULL,
+        checkpoint_ns TEXT NOT NULL DEFAULT '',
+        channel TEXT NOT NULL,
+        version TEXT NOT NULL,
+        type TEXT NOT NULL,
+        blob BLOB,
+        PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+    );
+    CREATE TABLE IF NOT EXISTS writes (
+        thread_id TEXT NOT NULL,
+        checkpoint_ns TEXT NOT NULL DEFAULT '',
+        checkpoint_id TEXT NOT NULL,
+        task_id TEXT NOT NULL,
+        idx INTEGER NOT NULL,
+        channel TEXT NOT NULL,
+        type TEXT,
+        value BLOB,
+        task_path TEXT NOT NULL DEFAULT '',
+        PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+    );
+    """
+
+    def __init__(self, path: str = CHECKPOINT_PATH, keep_last: int = CHECKPOINT_KEEP_LAST,
+                 serde: SerializerProtocol | None = None):
+        """
+        :param path: 数据库文件路径，":memory:" 表示不落盘
+        :param keep_last: 每个线程保留的检查点数，0 表示不压缩
+        :param serde: 序列化器
+        """
+        super().__init__(serde=serde)
+        self.path = path
+        self.keep_last = keep_last
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Streamlit 各会话运行在不同线程，共享一个连接并加锁串行访问
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL") # WAL 模式下 NORMAL 只在断电时可能丢失最后的事务
+        self.conn.executescript(self._SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
+
+    def _load_blobs(self, thread_id: str, checkpoint_ns: str, versions: ChannelVersions) -> dict[str, Any]:
+        if not versions:
+            return {}
+        values = {}
+        placeholders = ",".join("(?, ?)" for _ in versions)
+        params = [item for channel, version in versions.items() for item in (channel, str(version))]
+        rows = self.conn.execute(
+            f"SELECT channel, type, blob FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND (channel, version) IN (VALUES {placeholders})",
+            [thread_id, checkpoint_ns, *params],
+        ).fetchall()
+        for channel, type_, blob in rows:
+            if type_ != "empty":
+                values[channel] = self.serde.loads_typed((type_, blob))
+        return values
+
+    def _load_writes(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> list[tuple[str, str, Any]]:
+        rows = self.conn.execute(
+            "SELECT task_id, channel, type, value FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? "
+            "ORDER BY task_path, task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        return [(task_id, channel, self.serde.loads_typed((type_, value))) for task_id, channel, type_, value in rows]
+
+    def _to_tuple(self, thread_id: str, checkpoint_ns: str, row: tuple) -> CheckpointTuple:
+        checkpoint_id, parent_checkpoint_id, type_, saved, metadata_type, metadata = row
+        checkpoint = self.serde.loads_typed((type_, saved))
+        return CheckpointTuple(
+            config=_thread_config(thread_id, checkpoint_ns, checkpoint_id),
+            checkpoint={
+                **checkpoint,
+                "channel_values": self._load_blobs(thread_id, checkpoint_ns, checkpoint["channel_versions"]),
+            },
+            metadata=self.serde.loads_typed((metadata_type, metadata)),
+            pending_writes=self._load_writes(thread_id, checkpoint_ns, checkpoint_id),
+            parent_config=_thread_config(thread_id, checkpoint_ns, parent_checkpoint_id),
+        )
+
+    def has_thread(self, thread_id: str) -> bool:
+        """线程是否有检查点（不反序列化状态）"""
+        with self._lock:
+            return self.conn.execute("SELECT 1 FROM checkpoints WHERE thread_id = ? LIMIT 1", (thread_id,)).fetchone() is not None
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        columns = "checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata"
+        with self._lock:
+            if checkpoint_id := get_checkpoint_id(config):
+                row = self.conn.execute(
+                    f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                ).fetchone()
+            else:
+                row = self.conn.execute(
+                    f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns),
+                ).fetchone()
+            return self._to_tuple(thread_id, checkpoint_ns, row) if row else None
+
+    def list(self, config: RunnableConfig | None, *, filter: dict[str, Any] | None = None,
+             before: RunnableConfig | None = None, limit: int | None = None) -> Iterator[CheckpointTuple]:
+        where, params = [], []
+        if config:
+            where.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                where.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                where.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            where.append("checkpoint_id < ?")
+            params.append(before_id)
+        sql = "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata FROM checkpoints"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY checkpoint_id DESC"
+
+        with self._lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        for thread_id, checkpoint_ns, *row in rows:
+            if limit is not None and limit <= 0:
+                break
+            if filter:
+                metadata = self.serde.loads_typed((row[4], row[5]))
+                if not all(metadata.get(k) == v for k, v in filter.items()):
+                    continue
+            if limit is not None:
+                limit -= 1
+            with self._lock:
+                item = self._to_tuple(thread_id, checkpoint_ns, tuple(row))
+            yield item
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        saved = checkpoint.copy()
+        values = saved.pop("channel_values") # 通道值只写入本步发生变化的版本
+        blobs = [
+            (thread_id, checkpoint_ns, channel, str(version), *(
+                self.serde.dumps_typed(values[channel]) if channel in values else ("empty", None)
+            ))
+            for channel, version in new_versions.items()
+        ]
+        type_, data = self.serde.dumps_typed(saved)
+        metadata_type, metadata_data = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        with self._lock:
+            with self.conn:
+                self.conn.execute("BEGIN")
+                self.conn.executemany("INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?)", blobs)
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+                     type_, data, metadata_type, metadata_data),
+                )
+                if self.keep_last:
+                    count = self.conn.execute(
+                        "SELECT COUNT(*) FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?", (thread_id, checkpoint_ns)
+                    ).fetchone()[0]
+                    if count > self.keep_last * 2:
+                        self._compact(thread_id, checkpoint_ns, self.keep_last)
+        return _thread_config(thread_id, checkpoint_ns, checkpoint["id"])
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[tuple[str, Any]], task_id: str,
+                   task_path: str = "") -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        # 特殊通道（错误、中断等）使用固定的负数序号，重复写入时覆盖；普通写入已存在则保留
+        replace = all(channel in WRITES_IDX_MAP for channel, _ in writes)
+        rows = [
+            (thread_id, checkpoint_ns, checkpoint_id, task_id, WRITES_IDX_MAP.get(channel, idx), channel,
+             *self.serde.dumps_typed(value), task_path)
+            for idx, (channel, value) in enumerate(writes)
+        ]
+        with self._lock:
+            with self.conn:
+                self.conn.execute("BEGIN")
+                self.conn.executemany(
+                    f"INSERT OR {'REPLACE' if replace else 'IGNORE'} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+                )
+
+    def _compact(self, thread_id: str, checkpoint_ns: str, keep: int) -> int:
+        """删除线程中较早的检查点、对应的写入，以及不再被引用的通道值（需在事务内调用）
+        :return: 删除的检查点数
+        """
+        rows = self.conn.execute(
+            "SELECT checkpoint_id, type, checkpoint FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id DESC",
+            (thread_id, checkpoint_ns),
+        ).fetchall()
+        kept, dropped = rows[:keep], rows[keep:]
+        if not dropped:
+            return 0
+        cutoff = dropped[0][0]
+        for table in ("checkpoints", "writes"):
+            self.conn.execute(
+                f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id <= ?",
+                (thread_id, checkpoint_ns, cutoff),
+            )
+
+        referenced = set()
+        for _, type_, saved in kept:
+            referenced.update((channel, str(version)) for channel, version in self.serde.loads_typed((type_, saved))["channel_versions"].items())
+        stored = self.conn.execute(
+            "SELECT channel, version FROM blobs WHERE thread_id = ? AND checkpoint_ns = ?", (thread_id, checkpoint_ns)
+        ).fetchall()
+        self.conn.executemany(
+            "DELETE FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+            [(thread_id, checkpoint_ns, channel, version) for channel, version in stored if (channel, version) not in referenced],
+        )
+        return len(dropped)
+
+    def prune(self, thread_ids: Sequence[str], *, strategy: str = "keep_latest") -> None:
+        """压缩指定线程：keep_latest 只保留最新的检查点，delete 删除全部"""
+        for thread_id in thread_ids:
+            if strategy == "delete":
+                self.delete_thread(thread_id)
+                continue
+            with self._lock:
+                with self.conn:
+                    self.conn.execute("BEGIN")
+                    namespaces = self.conn.execute(
+                        "SELECT DISTINCT checkpoint_ns FROM checkpoints WHERE thread_id = ?", (thread_id,)
+                    ).fetchall()
+                    for (checkpoint_ns,) in namespaces:
+                        self._compact(thread_id, checkpoint_ns, 1)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            with self.conn:
+                self.conn.execute("BEGIN")
+                for table in ("checkpoints", "blobs", "writes"):
+                    self.conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+
+    # 异步接口在线程池中执行同步的 SQLite 读写：所有会话共享一个事件循环，
+    # 慢写入或 WAL 检查点不应阻塞其他会话的 token 流
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config: RunnableConfig | None, *, filter: dict[str, Any] | None = None,
+                    before: RunnableConfig | None = None, limit: int | None = None) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+                   new_versions: ChannelVersions) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[tuple[str, Any]], task_id: str,
+                          task_path: str = "") -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def aprune(self, thread_ids: Sequence[str], *, strategy: str = "keep_latest") -> None:
+        await asyncio.to_thread(self.prune, thread_ids, strategy=strategy)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def get_next_version(self, current: str | None, channel: None) -> str:
+        # 与 InMemorySaver 相同的版本格式：定长递增序号 + 随机后缀，可按字符串排序
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+
+def _create_checkpointer(backend: str = CHECKPOINT_BACKEND) -> Optional[BaseCheckpointSaver]:
+    """按 CHECKPOINT_BACKEND 创建检查点，none 时返回 None"""
+    if backend == "sqlite":
+        print(f"检查点使用 SQLite：{CHECKPOINT_PATH}")
+        return SqliteCheckpointSaver(CHECKPOINT_PATH)
+    if backend == "memory":
+        return CompactingMemorySaver()
+    return None
+
+
+def thread_inputs(messages: list, thread_id: str, saver: Optional[BaseCheckpointSaver] = None) -> list:
+    """本轮需要发送给图的消息：线程已有检查点时只发送最后一条新消息，否则发送完整历史
+    （首轮、检查点被淘汰或服务重启后，用前端保存的历史重新建立线程状态）
+    :param messages: 前端保存的完整消息列表，最后一条为本轮问题
+    :param thread_id: 会话线程 ID
+    :param saver: 检查点，默认使用全局检查点
+    """
+    saver = checkpointer if saver is None else saver
+    if saver is not None and getattr(saver, "has_thread", None) and saver.has_thread(thread_id):
+        return messages[-1:]
+    return list(messages)
+
+
+# 全局唯一检查点（单例），CHECKPOINT_BACKEND=none 时为 None
+checkpointer = _create_checkpointer()
@@ -0,0 +1,184 @@
+"""对话上下文窗口管理
+
+最近的对话按 token 预算保留在滑动窗口中，窗口之外的早期对话折叠为滚动摘要。
+折叠边界按固定步长对齐，摘要按“已折叠消息前缀”的哈希缓存，后续轮次只需把新折叠的消息合并进已有摘要。
+"""
+import functools
+import hashlib
+import os
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Optional
+
+from langchain_core.messages import BaseMessage
+
+from utils.cache import CacheType, GlobalCache, global_cache
+
+KEY_CONTEXT_SUMMARY = "ctx" # 缓存键前缀
+
+LLM_CONTEXT_TOKENS = int(os.getenv("LLM_CONTEXT_TOKENS", 1024)) # 最近对话窗口的 token 预算
+LLM_SUMMARY_STEP = int(os.getenv("LLM_SUMMARY_STEP", 4)) # 折叠边界对齐的消息条数，摘要每折叠这么多条消息更新一次
+LLM_TOKENIZER = os.getenv("LLM_TOKENIZER", "cl100k_base") # tiktoken 编码名称，加载失败时按字符估算
+
+_ROLE_NAMES = {"human": "用户", "user": "用户", "ai": "助手", "assistant": "助手", "system": "系统"}
+_CJK_PATTERN = re.compile(r"[⺀-鿿가-힯＀-￯]")
+
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    """按需加载 tiktoken 编码（首次加载可能需要下载词表），失败时返回 None"""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        with _encoding_lock:
+            if not _encoding_loaded:
+                try:
+                    import tiktoken
+
+                    _encoding = tiktoken.get_encoding(LLM_TOKENIZER)
+                except Exception as e:
+                    print(f"tiktoken 编码 {LLM_TOKENIZER} 加载失败，按字符估算 token 数: {e}")
+                _encoding_loaded = True
+    return _encoding
+
+
+@functools.lru_cache(maxsize=4096)
+def count_tokens(text: str) -> int:
+    """统计 token 数：优先使用 tiktoken，不可用时按 CJK 字符 1 token、其他字符 4 个 1 token 估算"""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def message_role_content(message: BaseMessage | dict[str, Any]) -> tuple[str, str]:
+    """获取消息的角色与文本内容（兼容 Streamlit 会话中的 dict 消息）"""
+    if isinstance(message, dict):
+        role, content = message.get("role", ""), message.get("content", "")
+    else:
+        role, content = message.type, message.content
+    if isinstance(content, list): # 多段内容（如 demo30 的消息列表）拼接为文本
+        content = "\n".join(item if isinstance(item, str) else str(item.get("text", "")) for item in content)
+    return role, content or ""
+
+
+def format_messages(messages: list[BaseMessage | dict[str, Any]]) -> str:
+    """格式化为 “角色：内容” 的对话文本"""
+    lines = []
+    for message in messages:
+        role, content = message_role_content(message)
+        lines.append(f"{_ROLE_NAMES.get(role, role)}：{content}")
+    return "\n".join(lines)
+
+
+@dataclass
+class ContextWindow:
+    """本轮对话的上下文"""
+    summary: str # 早期对话摘要
+    history: str # 最近对话（窗口内）
+    folded: int # 折叠为摘要的消息条数
+    tokens: int # 摘要 + 最近对话的 token 数
+
+
+class ContextManager:
+    """对话上下文管理：滑动窗口 + 滚动摘要，摘要缓存在 GlobalCache 中跨轮次、跨会话复用"""
+
+    def __init__(self, cache: GlobalCache, cache_type: str = CacheType.SESSION,
+                 max_tokens: int = LLM_CONTEXT_TOKENS, step: int = LLM_SUMMARY_STEP):
+        """
+        :param cache: 摘要缓存
+        :param cache_type: 使用的缓存层
+        :param max_tokens: 最近对话窗口的 token 预算
+        :param step: 折叠边界对齐的消息条数
+        """
+        self.cache = cache
+        self.cache_type = cache_type
+        self.max_tokens = max_tokens
+        self.step = max(step, 1)
+
+    def _fold_point(self, history: list) -> int:
+        """折叠边界：对齐到 step 的最小前缀长度，使剩余消息不超过窗口预算"""
+        # 按格式化后的文本（含角色前缀与换行）计数，保证窗口文本整体不超过预算
+        tokens = [count_tokens(format_messages([message])) + 1 for message in history]
+        remaining, fold = sum(tokens), 0
+        while remaining > self.max_tokens and fold < len(history):
+            end = min(fold + self.step, len(history))
+            remaining -= sum(tokens[fold:end])
+            fold = end
+        return fold
+
+    @staticmethod
+    def _prefix_keys(messages: list, namespace: str) -> list[str]:
+        """各前缀的滚动哈希：keys[i] 对应 messages[:i + 1]"""
+        keys, digest = [], hashlib.sha256(namespace.encode("utf-8")).hexdigest()
+        for message in messages:
+            role, content = message_role_content(message)
+            digest = hashlib.sha256(f"{digest}\n{role}\n{content}".encode("utf-8")).hexdigest()
+            keys.append(f"{KEY_CONTEXT_SUMMARY}:summary:{digest}")
+        return keys
+
+    def _plan(self, history: list, namespace: str) -> tuple[int, str, list[tuple[int, int, str]]]:
+        """计算折叠边界，并找出最长的已缓存摘要前缀
+        :return: (折叠条数, 已缓存摘要, 待合并的批次 [(开始位置, 结束位置, 缓存键)])
+        """
+        fold = self._fold_point(history)
+        if not fold:
+            return 0, "", []
+        keys = self._prefix_keys(history[:fold], namespace)
+        # 可能已缓存的前缀：折叠边界本身，以及之前各轮对齐到 step 的边界
+        candidates = sorted({fold, *range(self.step, fold + 1, self.step)}, reverse=True)
+        start, summary = 0, ""
+        for end in candidates:
+            cached = self.cache.get(keys[end - 1], self.cache_type)
+            if cached is not None:
+                start, summary = end, cached
+                break
+        # 按 step 分批合并，每批的摘要都缓存，单次摘要请求的输入保持有界
+        batches = []
+        while start < fold:
+            end = min(start + self.step, fold)
+            batches.append((start, end, keys[end - 1]))
+            start = end
+        return fold, summary, batches
+
+    def _window(self, history: list, fold: int, summary: str) -> ContextWindow:
+        recent = format_messages(history[fold:])
+        return ContextWindow(summary, recent, fold, count_tokens(summary) + count_tokens(recent))
+
+    def build(self, history: list, summarize: Callable[[str, str], str], namespace: str = "") -> ContextWindow:
+        """构建本轮上下文
+        :param history: 本轮问题之前的对话消息
+        :param summarize: 摘要函数 summarize(已有摘要, 新折叠的对话文本) -> 新摘要
+        :param namespace: 缓存分区（如模型名 + 摘要提示词哈希）
+        """
+        fold, summary, batches = self._plan(history, namespace)
+        for start, end, key in batches:
+            summary = summarize(summary, format_messages(history[start:end]))
+            self.cache.set(key, summary, self.cache_type)
+        return self._window(history, fold, summary)
+
+    async def abuild(self, history: list, summarize: Callable[[str, str], Awaitable[str]], namespace: str = "") -> ContextWindow:
+        """build 的异步版本"""
+        fold, summary, batches = self._plan(history, namespace)
+        for start, end, key in batches:
+            summary = await summarize(summary, format_messages(history[start:end]))
+            self.cache.set(key, summary, self.cache_type)
+        return self._window(history, fold, summary)
+
+
+def current_question_index(messages: list) -> Optional[int]:
+    """最后一条用户消息的位置，之前的消息为对话历史"""
+    for i in range(len(messages) - 1, -1, -1):
+        if message_role_content(messages[i])[0] in ("human", "user"):
+            return i
+    return None
+
+
+# 全局唯一上下文管理器（单例）
+context_manager = ContextManager(global_cache)
@@ -1,13 +1,13 @@
 from dataclasses import asdict
-import json
-import os
 import uuid
 
 from langchain_core.messages import AIMessage
 from langgraph.graph import StateGraph, MessagesState, START, END
 
-from agent.schema import CustomState, DataMetaProtocol
-from utils.cache import CacheType, global_cache
+from agent.delivery import delivery_policy
+from agent.schema import CustomState
+from utils.dataset_registry import dataset_registry
+from utils.tracing import node_tracer
 
 
 def node_start(state: CustomState):
@@ -18,28 +18,16 @@ def node_start(state: CustomState):
 def call_model(state: CustomState):
     print("start call model...")
 
-    # 项目根目录
-    root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    medal_list = json.load(open(os.path.join(root_dir, "data/medal_long.json"), "r", encoding="utf-8"))
-    store_key = str(uuid.uuid4())
-    
-    # 随机判断store_key的奇偶性
-    is_even = hash(store_key) % 2 == 0
-    if is_even:
-        print(f"表格数据已发送到前端本地")
-        data_meta = DataMetaProtocol(store_key=store_key, store_type="local", row_count=len(medal_list), data=medal_list)
-    else:
-        print(f"表格数据已发送到前端内存") # 模拟重新请求获取数据
-        key = f"{CacheType.KEY_PAYLOAD_DATA}:{store_key}"
-        global_cache.set(key, medal_list, CacheType.HOT)
-        data_meta = DataMetaProtocol(store_key=store_key, store_type="memory", row_count=len(medal_list))
+    medal_table = dataset_registry.get("medal_long")
+    # 按结果大小与缓存压力决定内联、引用、分页或溢出到磁盘
+    data_meta = delivery_policy.deliver(str(uuid.uuid4()), medal_table, rows=dataset_registry.rows("medal_long"), dataset="medal_long")
     
     return {"messages": [AIMessage(content="已经完成表格的提取。")], "data_meta": data_meta}
 
 
 graph2 = StateGraph(MessagesState)
-graph2.add_node("start", node_start)
-graph2.add_node("model", call_model)
+graph2.add_node("start", node_tracer.wrap("data", "start", node_start))
+graph2.add_node("model", node_tracer.wrap("data", "model", call_model))
 graph2.add_edge(START, "start")
 graph2.add_edge("start", "model")
 graph2.add_edge("model", END)
@@ -0,0 +1,133 @@
+import os
+from dataclasses import asdict, dataclass
+from enum import StrEnum
+from typing import Any
+
+import pyarrow as pa
+
+from agent.schema import DataMetaProtocol
+from utils.payload_store import PayloadStore, get_spill_store, payload_store, to_arrow_table
+
+KB = 1024
+MB = 1024 * 1024
+
+
+class DeliveryMode(StrEnum):
+    """数据交付方式"""
+    INLINE = "inline" # 行数据内联在消息（图状态、st.session_state）中，store_type=local
+    REFERENCE = "reference" # 数据放入内存载荷存储，消息只带 store_key，store_type=memory
+    PAGED = "paged" # 同 reference，但前端只按页读取，不构建整表 DataFrame
+    SPILL = "spill" # 数据写入磁盘并内存映射，前端按页读取，store_type=disk
+
+
+# 交付方式 -> DataMetaProtocol.store_type
+STORE_TYPES = {
+    DeliveryMode.INLINE: "local",
+    DeliveryMode.REFERENCE: "memory",
+    DeliveryMode.PAGED: "memory",
+    DeliveryMode.SPILL: "disk",
+}
+
+
+@dataclass
+class DeliveryThresholds:
+    """交付阈值，默认读取环境变量，可按部署调整"""
+    inline_rows: int = int(os.getenv("DELIVERY_INLINE_ROWS", 200)) # 不超过该行数且不超过 inline_bytes 时内联
+    inline_bytes: int = int(float(os.getenv("DELIVERY_INLINE_KB", 64)) * KB)
+    paged_rows: int = int(os.getenv("DELIVERY_PAGED_ROWS", 50_000)) # 超过该行数时只分页读取
+    spill_bytes: int = int(float(os.getenv("DELIVERY_SPILL_MB", 64)) * MB) # 超过该大小时溢出到磁盘
+    # 单个结果超过缓存层预算的该比例时溢出到磁盘：写入它需要淘汰大量其他条目；需不超过单个分片的预算（默认 4 个分片，即 25%）
+    # 不按整体占用比例判断：按字节预算淘汰的 LRU 层预热后本就接近满载，这是正常状态
+    max_share: float = float(os.getenv("DELIVERY_MAX_SHARE", 0.2))
+
+
+@dataclass
+class DeliveryDecision:
+    """交付决策，记录在 DataMetaProtocol.delivery 中"""
+    mode: DeliveryMode
+    reason: str
+    rows: int # 行数
+    nbytes: int # 列缓冲区字节数
+    pressure: float # 决策时内存载荷存储的占用比例（仅记录，不参与决策）
+
+    @property
+    def store_type(self) -> str:
+        return STORE_TYPES[self.mode]
+
+
+class DeliveryPolicy:
+    """交付策略：按结果的行数、字节数及其占缓存层预算的比例决定数据如何交给前端
+    缓存整体占用（pressure）只记录在决策中供观察，不参与决策
+    """
+
+    def __init__(self, thresholds: DeliveryThresholds = None, store: PayloadStore = None):
+        """
+        :param thresholds: 交付阈值，默认读取环境变量
+        :param store: 内存载荷存储，默认为全局载荷存储
+        """
+        self.thresholds = thresholds or DeliveryThresholds()
+        self.store = store or payload_store
+
+    def decide(self, table: pa.Table, store_type: str = "") -> DeliveryDecision:
+        """决定交付方式
+        :param table: 结果数据
+        :param store_type: 调用方指定的存储类型（local / memory / disk），为空时按阈值决定
+        """
+        rows, nbytes = table.num_rows, table.nbytes
+        used, capacity = self.store.usage()
+        pressure = used / capacity if capacity else 0.0
+        limits = self.thresholds
+
+        def decision(mode: DeliveryMode, reason: str) -> DeliveryDecision:
+            return DeliveryDecision(mode, reason, rows, nbytes, round(pressure, 4))
+
+        if store_type:
+            mode = {"local": DeliveryMode.INLINE, "memory": DeliveryMode.REFERENCE, "disk": DeliveryMode.SPILL}.get(store_type)
+            if mode is not None:
+                return decision(mode, f"调用方指定 {store_type}")
+        if rows <= limits.inline_rows and nbytes <= limits.inline_bytes:
+            return decision(DeliveryMode.INLINE, f"小结果（{rows} 行 ≤ {limits.inline_rows}，{nbytes}B ≤ {limits.inline_bytes}B）")
+        if nbytes >= limits.spill_bytes:
+            return decision(DeliveryMode.SPILL, f"超大结果（{nbytes}B ≥ {limits.spill_bytes}B）")
+        if self.store.has_content(table):
+            mode = DeliveryMode.PAGED if rows > limits.paged_rows else DeliveryMode.REFERENCE
+            return decision(mode, "相同内容已在缓存中")
+        if capacity and nbytes > capacity * limits.max_share:
+            return decision(DeliveryMode.SPILL, f"占用缓存比例过高（{nbytes / capacity:.0%} > {limits.max_share:.0%}）")
+        if rows > limits.paged_rows:
+            return decision(DeliveryMode.PAGED, f"行数较多（{rows} 行 > {limits.paged_rows}）")
+        return decision(DeliveryMode.REFERENCE, "中等结果按引用交付")
+
+    def deliver(self, store_key: str, data: Any, store_type: str = "", rows: list[dict[str, Any]] = None,
+                **meta) -> DataMetaProtocol:
+        """按决策交付数据，返回数据元信息
+        :param store_key: 存储键
+        :param data: list[dict] / DataFrame / Arrow Table
+        :param store_type: 调用方指定的存储类型，为空时按阈值决定
+        :param rows: 已有的行格式数据（如 dataset_registry.rows），内联时直接使用，不再转换
+        :param meta: DataMetaProtocol 的其他字段，如 dataset、display_type
+        """
+        table = to_arrow_table(data)
+        decision = self.decide(table, store_type)
+        record = asdict(decision)
+        if decision.mode == DeliveryMode.INLINE:
+            return DataMetaProtocol(store_type=decision.store_type, store_key=store_key, row_count=table.num_rows,
+                                    data=rows if rows is not None else table.to_pylist(), delivery=record, **meta)
+        store = get_spill_store() if decision.mode == DeliveryMode.SPILL else self.store
+        payload = store.put(store_key, table)
+        return DataMetaProtocol(store_type=decision.store_type, store_key=store_key, row_count=payload.row_count,
+                                schema=payload.schema, delivery=record, **meta)
+
+
+def payload_store_for(data_meta: dict[str, Any]) -> PayloadStore:
+    """按数据元信息获取前端读取数据的载荷存储"""
+    return get_spill_store() if data_meta.get("store_type") == "disk" else payload_store
+
+
+def is_paged(data_meta: dict[str, Any]) -> bool:
+    """前端是否只应按页读取（不构建整表 DataFrame）"""
+    return (data_meta.get("delivery") or {}).get("mode") in (DeliveryMode.PAGED, DeliveryMode.SPILL)
+
+
+# 全局唯一交付策略（单例）
+delivery_policy = DeliveryPolicy()
@@ -0,0 +1,93 @@
+import importlib
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable
+
+
+# 内置智能体：名称 -> "模块:构建函数"，首次使用时才导入对应模块
+_BUILTIN_BUILDERS = {
+    "barley": "agent.barley_agent:build_graph",
+    "medal": "agent.medal_agent:build_graph",
+    "sql": "agent.sql_agent:build_graph",
+}
+
+
+class GraphRegistry:
+    """图注册表：每个智能体图在进程内只编译一次，编译结果在各会话线程间共享
+
+    编译后的图本身无状态（状态随每次 invoke/stream 传入），可安全地被多个线程并发执行。
+    通过 get(name, checkpointer=...) 挂载检查点时，对话状态保存在检查点中并按 thread_id 区分。
+    """
+
+    def __init__(self):
+        self._builders: dict[str, Callable[..., Any]] = {}
+        self._graphs: dict[tuple, Any] = {}
+        self._compile_seconds: dict[tuple, float] = {}
+        self._hits: Counter[tuple] = Counter() # 获取次数，在 _lock 内更新
+        self._locks: dict[tuple, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, builder: Callable[..., Any]) -> None:
+        """注册图构建函数
+        :param name: 智能体名称
+        :param builder: 构建函数，返回编译后的图，关键字参数即配置形态
+        """
+        with self._lock:
+            self._builders[name] = builder
+
+    def _builder(self, name: str) -> Callable[..., Any]:
+        builder = self._builders.get(name)
+        if builder is None:
+            module_name, func_name = _BUILTIN_BUILDERS[name].split(":")
+            builder = getattr(importlib.import_module(module_name), func_name)
+            self.register(name, builder)
+        return builder
+
+    @staticmethod
+    def _key(name: str, options: dict[str, Any]) -> tuple:
+        return (name, tuple(sorted(options.items())))
+
+    def get(self, name: str, **options) -> Any:
+        """获取编译后的图，首次获取时编译
+        :param name: 智能体名称
+        :param options: 传给构建函数的参数（需可哈希），不同参数分别编译
+        :return: 编译后的图
+        """
+        key = self._key(name, options)
+        graph = self._graphs.get(key)
+        if graph is None:
+            with self._lock:
+                lock = self._locks.setdefault(key, threading.Lock())
+            with lock:
+                graph = self._graphs.get(key)
+                if graph is None:
+                    start = time.perf_counter()
+                    graph = self._builder(name)(**options)
+                    seconds = time.perf_counter() - start
+                    with self._lock:
+                        self._compile_seconds[key] = seconds
+                        self._graphs[key] = graph
+                    print(f"图 {name} 编译完成，耗时 {seconds * 1000:.1f}ms")
+        with self._lock:
+            self._hits[key] += 1
+        return graph
+
+    def clear(self) -> None:
+        """清空已编译的图（构建函数保留）"""
+        with self._lock:
+            self._graphs.clear()
+            self._compile_seconds.clear()
+            self._hits.clear()
+
+    def stats(self) -> list[dict[str, Any]]:
+        """统计信息：每个图的编译耗时与获取次数"""
+        with self._lock:
+            return [
+                {"name": key[0], "options": dict(key[1]), "compile_ms": seconds * 1000, "hits": self._hits[key]}
+                for key, seconds in self._compile_seconds.items()
+            ]
+
+
+# 全局唯一图注册表（单例）
+graph_registry = GraphRegistry()
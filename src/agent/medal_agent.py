@@ -1,13 +1,14 @@
-import json
-import os
 import uuid
 
 from langchain_core.messages import AIMessage
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.graph import StateGraph, MessagesState, START, END
 from langgraph.graph.state import RunnableConfig
 
-from agent.schema import CustomState, DataMetaProtocol
-from utils.cache import CacheType, global_cache
+from agent.delivery import delivery_policy
+from agent.schema import CustomState
+from utils.dataset_registry import dataset_registry
+from utils.tracing import node_tracer
 
 
 def node_start(state: CustomState):
@@ -20,32 +21,25 @@ def call_model(state: CustomState, config: RunnableConfig):
 
     data_type = config.get("configurable", {}).get("data_type", "medal_width")
     store_type = config.get("configurable", {}).get("store_type", "")
-    file_name = "medal_width.json"
-    if data_type == "medal_long":
-        file_name = "medal_long.json"
-
-    # 项目根目录
-    root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    medal_list = json.load(open(os.path.join(root_dir, f"data/{file_name}"), "r", encoding="utf-8"))
-    store_key = str(uuid.uuid4())
-    # 随机判断store_key的奇偶性
-    is_even = hash(store_key) % 2 == 0
-    if store_type == "local" or is_even:
-        print(f"表格数据已发送到前端本地")
-        data_meta = DataMetaProtocol(store_key=store_key, store_type="local", row_count=len(medal_list), data=medal_list)
-    else:
-        print(f"表格数据已发送到前端内存") # 模拟重新请求获取数据
-        key = f"{CacheType.KEY_PAYLOAD_DATA}:{store_key}"
-        global_cache.set(key, medal_list, CacheType.HOT)
-        data_meta = DataMetaProtocol(store_key=store_key, store_type="memory", row_count=len(medal_list))
+    if data_type != "medal_long":
+        data_type = "medal_width"
+
+    # 宽表、长表都是同一张规范奖牌表的投影，按数据版本缓存，不再读取文件或重新变换
+    medal_table = dataset_registry.get(data_type)
+    # 按结果大小与缓存压力决定内联、引用、分页或溢出到磁盘，store_type 配置可强制指定
+    data_meta = delivery_policy.deliver(str(uuid.uuid4()), medal_table, store_type=store_type,
+                                        rows=dataset_registry.rows(data_type), dataset=data_type)
     
     return {"messages": [AIMessage(content="已经完成表格的提取。")], "data_meta": data_meta.__dict__}
 
-def build_graph():
+def build_graph(checkpointer: BaseCheckpointSaver = None):
+    """构建图
+    :param checkpointer: 检查点，挂载后状态按 thread_id 保存，每轮只需发送新消息
+    """
     graph = StateGraph(CustomState)
-    graph.add_node("start", node_start)
-    graph.add_node("model", call_model)
+    graph.add_node("start", node_tracer.wrap("medal", "start", node_start))
+    graph.add_node("model", node_tracer.wrap("medal", "model", call_model))
     graph.add_edge(START, "start")
     graph.add_edge("start", "model")
     graph.add_edge("model", END)
-    return graph.compile()
+    return graph.compile(checkpointer=checkpointer)
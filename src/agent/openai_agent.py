@@ -1,26 +1,141 @@
-import re
+import asyncio
+import hashlib
+import os
+import threading
 import uuid
-import re
-from langchain_core.messages import AIMessage, HumanMessage
+import weakref
+from typing import Any, AsyncIterator, Iterator
+
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.graph import StateGraph, MessagesState, START, END
-from langchain.chat_models import init_chat_model
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableConfig
+
+from agent.checkpoint import checkpointer
+from agent.context_window import context_manager, current_question_index
+from agent.response_cache import response_cache
+from agent.schema import ChatState
+from utils.tracing import node_tracer
+
+# 本地 LLM 服务配置
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "http://127.0.0.1:1234/v1")
+LLM_MODEL = os.getenv("LLM_MODEL", "qwen/qwen3-8b")
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", 32)) # 连接池最大连接数
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 16)) # 异步路径同时进行的请求数上限
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 120))
 
 # Define the model
 #model = ChatOpenAI(base_url="http://127.0.0.1:1234/v1", api_key="not-needed", model="qwen/qwen3-8b")
-model = init_chat_model(model_provider="openai", base_url="http://127.0.0.1:1234/v1", api_key="not-needed", model="qwen/qwen3-8b", verbose=True)
+model = None # 首次调用 get_model() 时创建
+_model_lock = threading.Lock()
+
+
+def get_model():
+    """获取共享的聊天模型，同步/异步请求分别复用带连接池的 HTTP 客户端"""
+    global model
+    if model is None:
+        with _model_lock:
+            if model is None:
+                # 按需导入：init_chat_model 会加载 langchain 的模型注册表，导入耗时较长
+                import httpx
+                from langchain.chat_models import init_chat_model
+
+                limits = httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_CONNECTIONS)
+                model = init_chat_model(
+                    model_provider="openai",
+                    base_url=LLM_BASE_URL,
+                    api_key="not-needed",
+                    model=LLM_MODEL,
+                    verbose=True,
+                    http_client=httpx.Client(limits=limits, timeout=LLM_TIMEOUT),
+                    http_async_client=httpx.AsyncClient(limits=limits, timeout=LLM_TIMEOUT),
+                )
+    return model
+
+
+# 每个事件循环一个信号量，限制异步路径的并发请求数
+_semaphores: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def _llm_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _semaphores[loop] = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    return semaphore
+
+
+class ThinkTagFilter:
+    """流式过滤 <think>...</think> 推理块的状态机
+
+    标签可能被拆分在多个 token 中，未确定是否为标签的尾部文本先缓存，待后续 token 到达再判断。
+    """
+
+    OPEN_TAG = "<think>"
+    CLOSE_TAG = "</think>"
+
+    def __init__(self):
+        self._buffer = ""
+        self._in_think = False
+        self._started = False # 是否已输出正文，用于去掉正文开头的空白
+
+    @staticmethod
+    def _partial_tag_len(text: str, tag: str) -> int:
+        """text 结尾与 tag 开头重叠的最大长度（可能是被拆分的标签）"""
+        for size in range(min(len(text), len(tag) - 1), 0, -1):
+            if text[-size:] == tag[:size]:
+                return size
+        return 0
+
+    def feed(self, chunk: str) -> str:
+        """输入一个 token 片段，返回可以立即输出的正文"""
+        self._buffer += chunk
+        output = []
+        while self._buffer:
+            lowered = self._buffer.lower()
+            tag = self.CLOSE_TAG if self._in_think else self.OPEN_TAG
+            index = lowered.find(tag)
+            if index >= 0:
+                if not self._in_think:
+                    output.append(self._buffer[:index])
+                self._buffer = self._buffer[index + len(tag):]
+                self._in_think = not self._in_think
+                continue
+            keep = self._partial_tag_len(lowered, tag)
+            if not self._in_think:
+                output.append(self._buffer[:len(self._buffer) - keep])
+            self._buffer = self._buffer[len(self._buffer) - keep:]
+            break
+        return self._emit("".join(output))
+
+    def flush(self) -> str:
+        """流结束时输出剩余正文（未闭合的推理块直接丢弃）"""
+        text = "" if self._in_think else self._buffer
+        self._buffer = ""
+        return self._emit(text)
+
+    def _emit(self, text: str) -> str:
+        if not self._started:
+            text = text.lstrip()
+            self._started = bool(text)
+        return text
+
 
 def node_start(state: MessagesState):
     print("node start...")
     question = state["messages"][-1].content
     return {"messages": [AIMessage(content=f"你的问题是：{question}")]}
 
-def call_model(state: MessagesState):
-    print("start call model...")
-    #response = model.invoke(state["messages"])
-    template = """
+PROMPT_TEMPLATE = """
     你是一个智能助手，你的任务是回答用户的问题。
+
+    # 早期对话摘要
+    {summary}
+
+    # 最近对话
+    {history}
     
     # 用户问题
     {question}
@@ -29,22 +144,201 @@ def call_model(state: MessagesState):
     - 保持回答的简洁性，字数控制在150字以内。
     - 输出内容不允许出现 <think>、<reasoning> 等多余标记。
     """
-    prompt = PromptTemplate(template=template, input_variables=["question"])
-    chain = prompt | model | StrOutputParser()
-    
-    question = state["messages"][-1].content
-    response = chain.invoke({"question": question})
-    cleaned_msg = re.sub(r"<think>.*?</think>", "", response, flags=re.DOTALL | re.IGNORECASE).strip()
+
+SUMMARY_TEMPLATE = """
+    请将新的对话内容合并进已有摘要，保留用户关注的问题、关键结论和数据。
+
+    # 已有摘要
+    {summary}
+
+    # 新的对话
+    {conversation}
+
+    # 输出要求：
+    - 只输出合并后的摘要，字数控制在200字以内。
+    - 输出内容不允许出现 <think>、<reasoning> 等多余标记。
+    """
+
+# 摘要缓存分区：模型或摘要提示词变化后不复用旧摘要
+_SUMMARY_NAMESPACE = f"{LLM_MODEL}:{hashlib.sha1(SUMMARY_TEMPLATE.encode('utf-8')).hexdigest()[:16]}"
+
+def _build_chain(template: str = PROMPT_TEMPLATE):
+    prompt = PromptTemplate.from_template(template)
+    return prompt | get_model() | StrOutputParser()
+
+def _summary_inputs(summary: str, conversation: str) -> dict[str, str]:
+    return {"summary": summary or "无", "conversation": conversation}
+
+def _summarize(summary: str, conversation: str) -> str:
+    """将新折叠的对话合并进已有摘要"""
+    think_filter = ThinkTagFilter()
+    text = think_filter.feed(_build_chain(SUMMARY_TEMPLATE).invoke(_summary_inputs(summary, conversation)))
+    return (text + think_filter.flush()).strip()
+
+async def _asummarize(summary: str, conversation: str) -> str:
+    think_filter = ThinkTagFilter()
+    async with _llm_semaphore():
+        text = think_filter.feed(await _build_chain(SUMMARY_TEMPLATE).ainvoke(_summary_inputs(summary, conversation)))
+    return (text + think_filter.flush()).strip()
+
+def _history(messages: list) -> list:
+    """本轮问题之前的对话"""
+    index = current_question_index(messages)
+    return messages[:index] if index is not None else messages[:-1]
+
+def manage_context(state: ChatState):
+    """上下文窗口节点：最近对话按 token 预算保留，更早的对话折叠为缓存的滚动摘要"""
+    window = context_manager.build(_history(state["messages"]), _summarize, _SUMMARY_NAMESPACE)
+    print(f"上下文：折叠 {window.folded} 条消息，约 {window.tokens} tokens")
+    return {"summary": window.summary, "history": window.history}
+
+async def amanage_context(state: ChatState):
+    window = await context_manager.abuild(_history(state["messages"]), _asummarize, _SUMMARY_NAMESPACE)
+    print(f"上下文：折叠 {window.folded} 条消息，约 {window.tokens} tokens")
+    return {"summary": window.summary, "history": window.history}
+
+def _chain_inputs(state: ChatState) -> dict[str, str]:
+    return {
+        "question": state["messages"][-1].content,
+        "summary": state.get("summary") or "无",
+        "history": state.get("history") or "无",
+    }
+
+def _cache_prompt(inputs: dict[str, str]) -> str:
+    """回答缓存使用的问题文本：有对话上下文时与上下文一起作为键，避免不同上下文下的追问共用回答"""
+    if inputs["summary"] == "无" and inputs["history"] == "无":
+        return inputs["question"]
+    return "\n".join([inputs["summary"], inputs["history"], inputs["question"]])
+
+def _bypass_cache(config: RunnableConfig) -> bool:
+    """configurable.bypass_cache 为 True 时不读写回答缓存，也不与并发的相同问题合并"""
+    return bool(config.get("configurable", {}).get("bypass_cache"))
+
+def call_model(state: ChatState, config: RunnableConfig):
+    print("start call model...")
+    #response = model.invoke(state["messages"])
+    inputs = _chain_inputs(state)
+
+    def generate() -> str:
+        chain = _build_chain()
+        # 以流式调用模型，token 会通过 stream_mode="messages" 实时推送给前端
+        think_filter = ThinkTagFilter()
+        parts = [think_filter.feed(chunk) for chunk in chain.stream(inputs)]
+        parts.append(think_filter.flush())
+        return "".join(parts).strip()
+
+    if _bypass_cache(config):
+        cleaned_msg = generate()
+    else:
+        # 多个会话同时提出相同问题时只请求一次模型，其余会话等待并共享回答
+        cleaned_msg = response_cache.get_or_compute(_cache_prompt(inputs), LLM_MODEL, PROMPT_TEMPLATE, generate)
     
     return {"messages": [AIMessage(content=cleaned_msg)]}
 
-graph = StateGraph(MessagesState)
-graph.add_node("start", node_start)
-graph.add_node("model", call_model)
-graph.add_edge(START, "start")
-graph.add_edge("start", "model")
-graph.add_edge("model", END)
-graph = graph.compile()
+async def acall_model(state: ChatState, config: RunnableConfig):
+    """call_model 的异步版本，请求经由共享的异步连接池发出，不占用线程等待"""
+    print("start call model...")
+    inputs = _chain_inputs(state)
+
+    async def generate() -> str:
+        chain = _build_chain()
+        think_filter = ThinkTagFilter()
+        parts = []
+        async with _llm_semaphore():
+            async for chunk in chain.astream(inputs):
+                parts.append(think_filter.feed(chunk))
+        parts.append(think_filter.flush())
+        return "".join(parts).strip()
+
+    if _bypass_cache(config):
+        cleaned_msg = await generate()
+    else:
+        cleaned_msg = await response_cache.aget_or_compute(_cache_prompt(inputs), LLM_MODEL, PROMPT_TEMPLATE, generate)
+
+    return {"messages": [AIMessage(content=cleaned_msg)]}
+
+def build_graph(async_mode: bool = False, checkpointer: BaseCheckpointSaver = None):
+    """构建图
+    :param async_mode: 为 True 时模型节点使用异步实现，需通过 ainvoke/astream 执行
+    :param checkpointer: 检查点，挂载后状态按 thread_id 保存，每轮只需发送新消息
+    """
+    graph = StateGraph(ChatState)
+    graph.add_node("start", node_tracer.wrap("openai", "start", node_start))
+    graph.add_node("context", node_tracer.wrap("openai", "context", amanage_context if async_mode else manage_context))
+    graph.add_node("model", node_tracer.wrap("openai", "model", acall_model if async_mode else call_model))
+    graph.add_edge(START, "start")
+    graph.add_edge("start", "context")
+    graph.add_edge("context", "model")
+    graph.add_edge("model", END)
+    return graph.compile(checkpointer=checkpointer)
+
+graph = build_graph()
+async_graph = build_graph(async_mode=True)
+# 挂载检查点的图：配置中带 thread_id 时使用，对话状态在服务端按线程延续
+thread_graph = build_graph(checkpointer=checkpointer) if checkpointer else graph
+async_thread_graph = build_graph(async_mode=True, checkpointer=checkpointer) if checkpointer else async_graph
+
+
+def _select_graph(config: dict[str, Any] | None, async_mode: bool = False):
+    """配置中带 thread_id 时使用挂载检查点的图，否则使用无状态的图"""
+    threaded = bool((config or {}).get("configurable", {}).get("thread_id"))
+    if async_mode:
+        return async_thread_graph if threaded else async_graph
+    return thread_graph if threaded else graph
+
+
+class _ReplyFilter:
+    """将 messages 模式的流式输出转换为 (节点名称, 文本增量)，模型输出过滤 <think> 块"""
+
+    def __init__(self):
+        self.think_filter = ThinkTagFilter()
+        self.model_streamed = False
+
+    def process(self, message, metadata: dict[str, Any]) -> tuple[str, str] | None:
+        node = metadata.get("langgraph_node", "")
+        if node == "context":
+            return None # 摘要请求的输出不展示
+        if node != "model":
+            return node, message.content
+        if isinstance(message, AIMessageChunk):
+            self.model_streamed = True
+            text = self.think_filter.feed(message.content)
+            return (node, text) if text else None
+        if not self.model_streamed:
+            # 模型未产生 token（如命中缓存），直接输出节点返回的完整消息
+            return node, message.content
+        return None
+
+    def finish(self) -> tuple[str, str] | None:
+        tail = self.think_filter.flush()
+        return ("model", tail) if tail else None
+
+
+def stream_reply(inputs: dict[str, Any], config: dict[str, Any] = None) -> Iterator[tuple[str, str]]:
+    """以 messages 模式流式执行图，模型输出逐 token 过滤 <think> 块后返回
+    :param inputs: 图的输入状态，配置带 thread_id 且已挂载检查点时只需包含本轮新消息
+    :param config: 运行配置
+    :return: (节点名称, 文本增量) 迭代器，同一节点的增量依次拼接即为完整消息
+    """
+    reply_filter = _ReplyFilter()
+    for message, metadata in _select_graph(config).stream(inputs, config=config, stream_mode="messages"):
+        item = reply_filter.process(message, metadata)
+        if item:
+            yield item
+    item = reply_filter.finish()
+    if item:
+        yield item
+
+async def astream_reply(inputs: dict[str, Any], config: dict[str, Any] = None) -> AsyncIterator[tuple[str, str]]:
+    """stream_reply 的异步版本，同步脚本可通过 utils.async_bridge 调用"""
+    reply_filter = _ReplyFilter()
+    async for message, metadata in _select_graph(config, async_mode=True).astream(inputs, config=config, stream_mode="messages"):
+        item = reply_filter.process(message, metadata)
+        if item:
+            yield item
+    item = reply_filter.finish()
+    if item:
+        yield item
 
 if __name__ == "__main__":
     config = {
@@ -60,6 +354,6 @@ if __name__ == "__main__":
     #for message in result_state.get("messages", []):
     #    message.pretty_print()
     
-    for chunk in graph.stream({"messages": [HumanMessage(content=question)]}):
+    for chunk in thread_graph.stream({"messages": [HumanMessage(content=question)]}, config=config):
         print("="*20)
         print(f"\nchunk: {chunk}\n")
\ No newline at end of file
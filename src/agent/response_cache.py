@@ -0,0 +1,188 @@
+import hashlib
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+import numpy as np
+
+from utils.cache import CacheType, GlobalCache, global_cache
+
+KEY_LLM_RESPONSE = "llm" # 缓存键前缀
+
+# 句末标点，归一化时去掉（“最近7天的新增用户？” 与 “最近7天的新增用户” 视为同一问题）
+_TRAILING_PUNCT = "?？!！。.~～ "
+
+
+def normalize_prompt(prompt: str) -> str:
+    """问题归一化：全半角统一、小写、合并空白、去掉句末标点"""
+    text = unicodedata.normalize("NFKC", prompt or "").lower()
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.rstrip(_TRAILING_PUNCT)
+
+
+# 数字、中文数字与相对日期：只差这些词的问题（“最近7天” / “最近3天”、“2024年” / “2020年”、“今年” / “去年”）
+# 字符向量非常接近，但答案不同，相似问题层要求它们完全一致
+_LITERAL_PATTERN = re.compile(
+    r"\d+(?:\.\d+)?"
+    r"|[零〇一二两三四五六七八九十百千万亿]+"
+    r"|[今昨前明后去本上下][天日年月周季]|大前天|大后天|上个?[月周季]|下个?[月周季]|这个?[月周季]"
+)
+
+
+def prompt_literals(text: str) -> tuple[str, ...]:
+    """问题中的数字与日期词，按出现顺序"""
+    return tuple(_LITERAL_PATTERN.findall(text))
+
+
+def _embed(text: str, dims: int) -> np.ndarray:
+    """本地轻量向量：字符 unigram + bigram 哈希到定长向量后归一化，无需额外模型"""
+    vector = np.zeros(dims, dtype=np.float32)
+    grams = list(text) + [text[i:i + 2] for i in range(len(text) - 1)]
+    for gram in grams:
+        digest = hashlib.blake2b(gram.encode("utf-8"), digest_size=4).digest()
+        vector[int.from_bytes(digest, "little") % dims] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class _SemanticIndex:
+    """相似问题索引：按模型+模板分区，保存归一化问题的向量与对应的精确缓存键
+    只在数字、日期词完全一致的问题之间比较相似度
+    """
+
+    def __init__(self, capacity: int, dims: int):
+        self.capacity = capacity
+        self.dims = dims
+        self._entries: OrderedDict[str, tuple[str, tuple, np.ndarray, float]] = OrderedDict() # 缓存键 -> (分区, 数字与日期词, 向量, 过期时间)
+        self._lock = threading.Lock()
+
+    def add(self, key: str, namespace: str, text: str, expires_at: float) -> None:
+        vector = _embed(text, self.dims)
+        with self._lock:
+            self._entries[key] = (namespace, prompt_literals(text), vector, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def search(self, namespace: str, text: str, threshold: float) -> Optional[str]:
+        """查找数字、日期词相同且最相似、未过期的问题，返回其精确缓存键"""
+        now = time.time()
+        literals = prompt_literals(text)
+        with self._lock:
+            candidates = [
+                (key, vector) for key, (ns, entry_literals, vector, expires_at) in self._entries.items()
+                if ns == namespace and entry_literals == literals and expires_at > now
+            ]
+        if not candidates:
+            return None
+        scores = np.stack([vector for _, vector in candidates]) @ _embed(text, self.dims)
+        best = int(np.argmax(scores))
+        return candidates[best][0] if scores[best] >= threshold else None
+
+
+class ResponseCache:
+    """LLM 回答缓存：精确匹配层存放在 GlobalCache，可选的相似问题层在本地计算向量相似度"""
+
+    def __init__(self, cache: GlobalCache, cache_type: str = CacheType.SESSION, ttl: int = 3600,
+                 semantic: bool = False, threshold: float = 0.9, capacity: int = 2000, dims: int = 1024):
+        """
+        :param cache: 底层缓存
+        :param cache_type: 精确匹配层使用的缓存层
+        :param ttl: 回答有效期（秒）
+        :param semantic: 是否启用相似问题层
+        :param threshold: 相似问题层的余弦相似度阈值
+        :param capacity: 相似问题层最多保存的问题数
+        :param dims: 向量维度
+        """
+        self.cache = cache
+        self.cache_type = cache_type
+        self.ttl = ttl
+        self.semantic = semantic
+        self.threshold = threshold
+        self._index = _SemanticIndex(capacity, dims)
+
+    @staticmethod
+    def _namespace(model: str, template: str) -> str:
+        template_hash = hashlib.sha1(template.encode("utf-8")).hexdigest()[:16]
+        return f"{model}:{template_hash}"
+
+    def key(self, prompt: str, model: str, template: str) -> str:
+        """缓存键：归一化问题 + 模型 + 模板哈希"""
+        raw = f"{self._namespace(model, template)}\n{normalize_prompt(prompt)}"
+        return f"{KEY_LLM_RESPONSE}:{hashlib.sha256(raw.encode('utf-8')).hexdigest()}"
+
+    def _get_exact(self, key: str) -> Optional[str]:
+        entry = self.cache.get(key, self.cache_type)
+        if entry is None:
+            return None
+        response, expires_at = entry
+        if expires_at <= time.time():
+            self.cache.delete(key, self.cache_type)
+            return None
+        return response
+
+    def get(self, prompt: str, model: str, template: str) -> Optional[str]:
+        """查询缓存的回答，未命中返回 None"""
+        response = self._get_exact(self.key(prompt, model, template))
+        if response is None and self.semantic:
+            similar_key = self._index.search(self._namespace(model, template), normalize_prompt(prompt), self.threshold)
+            if similar_key:
+                response = self._get_exact(similar_key)
+        return response
+
+    def get_or_compute(self, prompt: str, model: str, template: str, compute: Callable[[], str]) -> str:
+        """查询缓存的回答，未命中时调用模型；并发的相同问题只调用一次，其余请求等待并共享回答
+        :param compute: 生成回答的函数
+        """
+        response = self.get(prompt, model, template)
+        if response is not None:
+            print("命中回答缓存")
+            return response
+
+        def load():
+            response = self.get(prompt, model, template) # 排队期间上一次调用可能已经写入
+            if response is None:
+                response = compute()
+                if response:
+                    self.set(prompt, model, template, response)
+            return response
+
+        return self.cache.single_flight.do(self.key(prompt, model, template), load)
+
+    async def aget_or_compute(self, prompt: str, model: str, template: str, compute: Callable[[], Awaitable[str]]) -> str:
+        """get_or_compute 的异步版本，compute 为协程函数"""
+        response = self.get(prompt, model, template)
+        if response is not None:
+            print("命中回答缓存")
+            return response
+
+        async def load():
+            response = self.get(prompt, model, template)
+            if response is None:
+                response = await compute()
+                if response:
+                    self.set(prompt, model, template, response)
+            return response
+
+        return await self.cache.single_flight.ado(self.key(prompt, model, template), load)
+
+    def set(self, prompt: str, model: str, template: str, response: str) -> None:
+        """缓存回答"""
+        key = self.key(prompt, model, template)
+        expires_at = time.time() + self.ttl
+        self.cache.set(key, (response, expires_at), self.cache_type)
+        if self.semantic:
+            self._index.add(key, self._namespace(model, template), normalize_prompt(prompt), expires_at)
+
+
+# 全局唯一回答缓存实例（单例）
+response_cache = ResponseCache(
+    global_cache,
+    ttl=int(os.getenv("LLM_CACHE_TTL", 3600)),
+    semantic=os.getenv("LLM_SEMANTIC_CACHE", "0") == "1",
+    threshold=float(os.getenv("LLM_SEMANTIC_THRESHOLD", 0.9)),
+)
@@ -1,9 +1,18 @@
+import hashlib
+import json
 from enum import StrEnum
-from typing import Any
-from dataclasses import dataclass, field
+from typing import Any, Optional
+from dataclasses import asdict, dataclass, field, replace
 
+import pyarrow as pa
+from langchain_core.messages import AIMessage, BaseMessage
 from langgraph.graph import MessagesState
 
+from utils.payload_store import table_schema, to_arrow_table
+
+ARTIFACT_KEY = "data_artifact" # 数据附件在消息 additional_kwargs 中的键
+ARTIFACT_FORMAT = "arrow-ipc" # 数据附件格式：Arrow IPC 流
+
 
 class DisplayType(StrEnum):
     """数据协议类型枚举"""
@@ -21,13 +30,113 @@ class DisplayType(StrEnum):
 @dataclass
 class DataMetaProtocol:
     """数据元信息协议类"""
-    store_type: str # 存储类型 local、memory等
+    store_type: str # 存储类型 local（内联）、memory（内存载荷存储）、disk（磁盘溢出）
     store_key: str # 存储键，用于唯一标识数据
     row_count: int # 数据行数
-    data: list[dict[str, Any]] = field(default_factory=list) # 数据内容
+    data: list[dict[str, Any]] = field(default_factory=list) # 数据内容，仅 local 模式内联
+    schema: dict[str, str] = field(default_factory=dict) # 表结构 {列名: 类型}，memory 模式通过 store_key 获取列数据
     display_type: DisplayType = DisplayType.TABLE # 显示类型
+    dataset: str = "" # 来源数据集（dataset_registry 中的名称），前端可直接取其缓存的投影与切片
+    delivery: dict[str, Any] = field(default_factory=dict) # 交付决策 {mode, reason, rows, nbytes, pressure}，见 agent.delivery
+
+
+@dataclass
+class DataPayload:
+    """数据载荷"""
+    data: list[Any] = field(default_factory=list) # 数据内容，list[dict] 或 list[list]（配合 columns）
+    columns: list[str] = field(default_factory=list) # 列名，data 为 list[list] 时使用
+    chart_type: str = "" # 图表类型 bar、line等
+    x: str = "" # x 轴字段
+    y: str = "" # y 轴字段
+    series: list[str] = field(default_factory=list) # 系列字段
+
+
+@dataclass
+class DataProtocol:
+    """数据协议类"""
+    type: str # 展示类型，对应 DisplayType
+    meta: dict[str, Any] = field(default_factory=dict) # 元信息，如标题
+    payload: DataPayload = field(default_factory=DataPayload) # 数据载荷
+
+
+def encode_table(data: Any, compression: Optional[str] = None) -> bytes:
+    """将表格数据编码为 Arrow IPC 流
+    :param data: list[dict] / DataFrame / Arrow Table
+    :param compression: 压缩算法 lz4 / zstd，默认不压缩（小数据压缩收益不明显）
+    :return: 二进制数据
+    """
+    table = to_arrow_table(data)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema, options=pa.ipc.IpcWriteOptions(compression=compression)) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def decode_table(data: bytes) -> pa.Table:
+    """解码 Arrow IPC 流（未压缩时零拷贝引用 data 的内存）"""
+    return pa.ipc.open_stream(pa.py_buffer(data)).read_all()
+
+
+def data_artifact(data: Any, compression: Optional[str] = None, **meta) -> dict[str, Any]:
+    """构建数据附件
+    :param data: list[dict] / DataFrame / Arrow Table
+    :param compression: 压缩算法
+    :param meta: 附加元信息，如 title、display_type
+    :return: {"format", "key", "row_count", "schema", "data", **meta}，key 为内容摘要，可作为缓存键
+    """
+    table = to_arrow_table(data)
+    encoded = encode_table(table, compression)
+    return {
+        "format": ARTIFACT_FORMAT,
+        "key": hashlib.sha1(encoded).hexdigest(),
+        "row_count": table.num_rows,
+        "schema": table_schema(table),
+        "data": encoded,
+        **meta,
+    }
+
+
+def data_message(data: Any, content: Optional[str] = None, **meta) -> AIMessage:
+    """构建携带数据附件的消息：数据以二进制附件随消息传递，content 只保留简短说明
+    :param data: list[dict] / DataFrame / Arrow Table
+    :param content: 消息文本，默认为数据行数说明
+    :param meta: 附加元信息
+    """
+    artifact = data_artifact(data, **meta)
+    if content is None:
+        content = f"数据表，共 {artifact['row_count']} 行"
+    return AIMessage(content=content, additional_kwargs={ARTIFACT_KEY: artifact})
+
+
+def protocol_message(protocol: DataProtocol) -> AIMessage:
+    """构建数据协议消息：协议描述（类型、标题、图表字段）以紧凑 JSON 作为 content，数据以 Arrow IPC 附件传递"""
+    payload = protocol.payload
+    rows = payload.data
+    if payload.columns and rows and not isinstance(rows[0], dict):
+        rows = [dict(zip(payload.columns, row)) for row in rows]
+    description = asdict(replace(protocol, payload=replace(payload, data=[])))
+    return data_message(rows, content=json.dumps(description, ensure_ascii=False), display_type=protocol.type)
+
+
+def message_artifact(message: BaseMessage | dict[str, Any]) -> Optional[dict[str, Any]]:
+    """获取消息中的数据附件，没有时返回 None"""
+    if isinstance(message, dict):
+        kwargs = message.get("additional_kwargs", {})
+    else:
+        kwargs = getattr(message, "additional_kwargs", None) or {}
+    return kwargs.get(ARTIFACT_KEY)
+
+
+class ChatState(MessagesState):
+    """对话状态"""
+    summary: str # 早期对话摘要
+    history: str # 最近对话（上下文窗口内）
 
 
 class CustomState(MessagesState):
     """自定义状态"""
-    data_meta: dict[str, Any] # 数据元信息，对应DataMetaProtocol
\ No newline at end of file
+    data_meta: dict[str, Any] # 数据元信息，对应DataMetaProtocol
+
+class SqlState(CustomState):
+    """SQL 查询状态"""
+    sql: str # 待执行的 SQL（由问题生成或直接给出）
@@ -0,0 +1,102 @@
+import re
+
+from langchain_core.messages import AIMessage
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import PromptTemplate
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.graph import StateGraph, START, END
+from langgraph.graph.state import RunnableConfig
+
+from agent.delivery import delivery_policy
+from agent.schema import SqlState
+from utils.sql_engine import SqlError, sql_engine
+from utils.tracing import node_tracer
+
+
+SQL_PROMPT_TEMPLATE = """
+    你是一个数据分析助手，请根据表结构把用户问题转换为一条 SQLite 查询语句。
+
+    # 表结构
+    {tables}
+
+    # 用户问题
+    {question}
+
+    # 输出要求：
+    - 只输出一条 SELECT 语句，不要解释。
+    - 过滤、聚合、排序都在 SQL 中完成，明细数据加 LIMIT，不要返回整张表。
+    - 中文列名用双引号括起来。
+    """
+
+# 模型输出中的 SQL：```sql 代码块，或以 SELECT/WITH 开头的内容
+_SQL_BLOCK = re.compile(r"```(?:sql)?\s*(.*?)```", re.S | re.I)
+_THINK_BLOCK = re.compile(r"<(think|reasoning)>.*?</\1>", re.S | re.I)
+
+
+def _is_sql(text: str) -> bool:
+    return re.match(r"\s*(select|with)\b", text, re.I) is not None
+
+
+def extract_sql(text: str) -> str:
+    """从模型输出中提取 SQL"""
+    text = _THINK_BLOCK.sub("", text)
+    match = _SQL_BLOCK.search(text)
+    if match:
+        return match.group(1).strip()
+    match = re.search(r"\b(select|with)\b.*", text, re.S | re.I)
+    return match.group().strip() if match else text.strip()
+
+
+def node_start(state: SqlState):
+    print("node start...")
+    question = state["messages"][-1].content
+    return {"messages": [AIMessage(content=f"你的问题是：{question}")]}
+
+def generate_sql(state: SqlState, config: RunnableConfig):
+    """生成 SQL：优先使用配置中的 sql，问题本身是可编译的单条查询时直接执行，否则由模型生成
+    （以 select/with 开头的自然语言问题，如 “With 2024 data…”，编译失败后交给模型）
+    """
+    print("start generate sql...")
+    sql = config.get("configurable", {}).get("sql")
+    question = next(m.content for m in reversed(state["messages"]) if m.type == "human")
+    if not sql and _is_sql(question):
+        try:
+            sql = sql_engine.validate(question)
+        except SqlError as e:
+            print(f"问题不是可执行的 SQL，交给模型生成：{e}")
+    if not sql:
+        from agent.openai_agent import get_model # 按需导入，只执行 SQL 时不创建模型
+
+        chain = PromptTemplate.from_template(SQL_PROMPT_TEMPLATE) | get_model() | StrOutputParser()
+        sql = extract_sql(chain.invoke({"tables": sql_engine.describe(), "question": question}))
+    return {"sql": sql}
+
+def run_query(state: SqlState, config: RunnableConfig):
+    """执行查询：过滤、聚合在 SQL 引擎中完成，结果按交付策略内联或放入载荷存储"""
+    print("start run query...")
+    use_cache = not config.get("configurable", {}).get("bypass_cache", False)
+    try:
+        result = sql_engine.query(state["sql"], use_cache=use_cache)
+    except SqlError as e:
+        return {"messages": [AIMessage(content=f"查询失败：{e}\n```sql\n{state['sql']}\n```")], "data_meta": {}}
+
+    data_meta = delivery_policy.deliver(result.key, result.table)
+    content = f"查询完成，共 {result.row_count} 行。"
+    if result.truncated:
+        content = f"查询结果超过 {sql_engine.max_rows} 行，只返回前 {result.row_count} 行。"
+    return {"messages": [AIMessage(content=f"{content}\n```sql\n{result.sql}\n```")], "data_meta": data_meta.__dict__}
+
+
+def build_graph(checkpointer: BaseCheckpointSaver = None):
+    """构建图
+    :param checkpointer: 检查点，挂载后状态按 thread_id 保存，每轮只需发送新消息
+    """
+    graph = StateGraph(SqlState)
+    graph.add_node("start", node_tracer.wrap("sql", "start", node_start))
+    graph.add_node("generate", node_tracer.wrap("sql", "generate", generate_sql))
+    graph.add_node("query", node_tracer.wrap("sql", "query", run_query))
+    graph.add_edge(START, "start")
+    graph.add_edge("start", "generate")
+    graph.add_edge("generate", "query")
+    graph.add_edge("query", END)
+    return graph.compile(checkpointer=checkpointer)
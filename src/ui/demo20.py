@@ -1,6 +1,8 @@
+import uuid
+
 import streamlit as st
-from agent import openai_agent
-from utils.common_util import render_user_message
+from utils.async_bridge import async_bridge
+from utils.common_util import render_history, render_trace_panel, render_user_message, start_trace_turn
 
 st.set_page_config(layout="wide")
 st.title("🦜🔗 Quickstart App")
@@ -9,30 +11,39 @@ st.caption("🚀基于LangChain Graph的简易Demo")
 
 if "messages" not in st.session_state:
     st.session_state["messages"] = [{"role": "assistant", "content": "How can I help you?"}]
+if "thread_id" not in st.session_state:
+    st.session_state["thread_id"] = str(uuid.uuid4()) # 会话线程 ID，服务端检查点按它保存对话状态
 
-for msg in st.session_state.messages:
+def render_message(msg: dict):
     if msg["role"] == "user":
         render_user_message(msg["content"])
     else:
         st.chat_message(msg["role"]).write(msg["content"])
 
+# 只完整渲染最近的消息，更早的消息折叠、按页展开
+render_history(st.session_state.messages, render_message)
+
 if prompt := st.chat_input():
     st.session_state.messages.append({"role": "user", "content": prompt})
     render_user_message(prompt)
 
+    from agent import openai_agent # 首次提问时才加载 LangChain/LangGraph
+    from agent.checkpoint import thread_inputs
+
+    # 对话状态按 thread_id 保存在服务端检查点中，每轮只发送新消息
+    config = {"configurable": {"thread_id": st.session_state.thread_id, "turn_id": start_trace_turn()}}
+    inputs = {"messages": thread_inputs(st.session_state.messages, st.session_state.thread_id)}
+
     assistant_box = st.chat_message("assistant")
     placeholder = assistant_box.empty()
     final_msg = ""
-    for state in openai_agent.graph.stream({"messages": st.session_state.messages}):
-        print("="*20)
-        print(f"\nstate: {state}\n")
-        for key, value in state.items():
-            print(f"{key}: {value}")
-            messages = value.get("messages", [])
-            if messages:
-                last = messages[-1]
-                content = getattr(last, "content", last.get("content") if isinstance(last, dict) else "")
-                #cleaned = re.sub(r"<think>.*?</think>", "", content, flags=re.DOTALL | re.IGNORECASE).strip()
-                final_msg = content
-                placeholder.write(content)
+    current_node = None
+    # 逐 token 更新占位符，首个 token 到达即开始展示
+    for node, text in async_bridge.iterate(openai_agent.astream_reply(inputs, config)):
+        if node != current_node:
+            current_node, final_msg = node, ""
+        final_msg += text
+        placeholder.write(final_msg)
     st.session_state.messages.append({"role": "assistant", "content": final_msg})
+
+render_trace_panel()
@@ -1,17 +1,25 @@
+import uuid
+
 import streamlit as st
-from agent import openai_agent
-from utils.common_util import render_user_message
+from utils.async_bridge import async_bridge
+from utils.common_util import render_history, render_paged_table, render_trace_panel, render_user_message, start_trace_turn
 
 
 st.set_page_config(layout="wide", page_title="Demo - ChatBI", page_icon="🦜")
 st.title("💬 ChatBI", text_alignment="center")
 st.caption("🚀 基于LangChain Graph的简易Demo", text_alignment="center")
 
+# 对话：由模型直接回答；数据查询：由 sql 智能体把问题转换为 SQL，在已注册的数据集上执行
+MODE_CHAT, MODE_SQL = "对话", "数据查询"
+mode = st.radio("模式", [MODE_CHAT, MODE_SQL], horizontal=True, key="mode")
+
 # ======================
 # Session State 初始化
 # ======================
 if "messages" not in st.session_state:
     st.session_state.messages = []
+if "thread_id" not in st.session_state:
+    st.session_state.thread_id = str(uuid.uuid4()) # 会话线程 ID，服务端检查点按它保存对话状态
 
 # ======================
 # 会话状态：是否已 chatted（首轮展示热门问题）
@@ -22,11 +30,34 @@ if "has_chatted" not in st.session_state:
 # ======================
 # 历史消息渲染
 # ======================
-for msg in st.session_state.messages:
+def render_data(key: str, data_meta: dict):
+    """查询结果分页表格：每页只从载荷存储读取可见窗口，内联数据首次读取时写入载荷存储"""
+    from agent.delivery import payload_store_for
+
+    store_key, store = data_meta.get("store_key", ""), payload_store_for(data_meta)
+    if data_meta.get("store_type") != "local" and store.get(store_key) is None:
+        st.warning("数据已过期或不在当前服务节点，请重新提问")
+        return
+
+    def fetch_page(offset: int, limit: int):
+        page = store.get_slice(store_key, offset, limit)
+        if page is None:
+            page = store.put(store_key, data_meta.get("data", [])).slice(offset, limit)
+        return page.to_frame(), page.total_rows
+
+    render_paged_table(f"sql_{key}", fetch_page)
+
+def render_message(msg: dict):
     if msg["role"] == "user":
         render_user_message(msg["content"])
     else:
-        st.chat_message(msg["role"]).write(msg["content"])
+        with st.chat_message(msg["role"]):
+            st.write(msg["content"])
+            if msg.get("data_meta"):
+                render_data(msg["id"], msg["data_meta"])
+
+# 只完整渲染最近的消息，更早的消息折叠、按页展开
+render_history(st.session_state.messages, render_message)
 
 # ======================
 # 🔥 热门问题（仅首轮展示）
@@ -37,6 +68,10 @@ if not st.session_state.has_chatted:
         "本周销售额同比增长情况",
         "最近7天的新增用户",
         "异常波动最大的指标是什么？"
+    ] if mode == MODE_CHAT else [
+        "2024年金牌数最多的5个国家",
+        "各国历届金牌总数排名",
+        "1932年各地点的大麦总产量",
     ]
     with st.chat_message("assistant"):
         st.markdown("你可以试试下面这些问题 👇")
@@ -62,16 +97,40 @@ if prompt:
     st.session_state.messages.append({"role": "user", "content": prompt})
     render_user_message(prompt)
 
-    for state in openai_agent.graph.stream({"messages": st.session_state.messages}):
-        print("="*20)
-        print(f"\nstate: {state}\n")
-        for key, value in state.items():
-            print(f"{key}: {value}")
-            messages = value.get("messages", [])
-            if messages:
-                last = messages[-1]
-                content = getattr(last, "content", last.get("content") if isinstance(last, dict) else "")
-                #cleaned = re.sub(r"<think>.*?</think>", "", content, flags=re.DOTALL | re.IGNORECASE).strip()
-                st.chat_message("assistant").markdown(content)
+if prompt and mode == MODE_SQL:
+    from agent.graph_registry import graph_registry # 首次提问时才加载 LangChain/LangGraph
+
+    # 每个问题独立查询：结果小的内联在消息中，大的放入载荷存储、按页读取
+    config = {"configurable": {"turn_id": start_trace_turn()}}
+    for state in graph_registry.get("sql").stream({"messages": [{"role": "user", "content": prompt}]}, config=config):
+        for value in state.values():
+            messages = (value or {}).get("messages", [])
+            if not messages:
+                continue
+            msg = {"role": "assistant", "content": "\n\n".join(m.content for m in messages),
+                   "data_meta": value.get("data_meta") or {}, "id": uuid.uuid4().hex}
+            render_message(msg)
+            st.session_state.messages.append(msg)
+elif prompt:
+    from agent import openai_agent # 首次提问时才加载 LangChain/LangGraph
+    from agent.checkpoint import thread_inputs
+
+    # 对话状态按 thread_id 保存在服务端检查点中，每轮只发送新消息（查询结果不发送给模型）
+    config = {"configurable": {"thread_id": st.session_state.thread_id, "turn_id": start_trace_turn()}}
+    history = [{"role": m["role"], "content": m["content"]} for m in st.session_state.messages]
+    inputs = {"messages": thread_inputs(history, st.session_state.thread_id)}
+
+    # 每个节点的消息单独展示，模型输出逐 token 更新
+    current_node, placeholder, content = None, None, ""
+    for node, text in async_bridge.iterate(openai_agent.astream_reply(inputs, config)):
+        if node != current_node:
+            if current_node is not None:
                 st.session_state.messages.append({"role": "assistant", "content": content})
-        
+            current_node, content = node, ""
+            placeholder = st.chat_message("assistant").empty()
+        content += text
+        placeholder.markdown(content)
+    if current_node is not None:
+        st.session_state.messages.append({"role": "assistant", "content": content})
+
+render_trace_panel()
@@ -1,12 +1,10 @@
 import json
 import uuid
+import zlib
 import streamlit as st
-import pandas as pd
-import altair as alt
-import plotly.express as px
-import plotly.graph_objects as go
-from agent.barley_agent import build_graph
-from utils.common_util import render_user_message
+from agent.graph_registry import graph_registry
+from utils.chart_cache import cached_figure, cached_frame, content_key
+from utils.common_util import render_history, render_paged_table, render_trace_panel, render_user_message, start_trace_turn
 
 
 st.set_page_config(layout="wide")
@@ -14,13 +12,46 @@ st.title("🦜🔗 Quickstart App")
 st.caption("🚀基于返回类型的类型展示简易Demo")
 
 
-def chart_bar_simple(data: list):
+# 注意：pandas、altair、plotly 等重量级依赖在图表函数内按需导入，避免拖慢页面冷启动
+# 图表函数的 df 为按 data_key 缓存的共享数据，只读；变换结果与图表同样按 data_key + 配置缓存
+
+def load_payload(data_key: str, source):
+    # 解码消息中的数据并写入载荷存储，同一内容只解码一次；图表与分页表格都从载荷读取
+    # source 为消息的 Arrow IPC 数据附件，或旧版消息中的 JSON 文本
+    from utils.payload_store import payload_store
+
+    payload = payload_store.get(data_key)
+    if payload is None:
+        if isinstance(source, dict):
+            from agent.schema import decode_table
+
+            payload = payload_store.put(data_key, decode_table(source["data"]))
+        else:
+            payload = payload_store.put(data_key, json.loads(source))
+    return payload
+
+def load_frame(data_key: str, source):
+    return load_payload(data_key, source).to_frame()
+
+def bar_frame(data_key: str, df):
+    # 按像素预算截断柱状图类别（超出时保留前 N 个品种，其余合并为“其他”），结果按 data_key 缓存
+    from utils.downsample import default_budget, prepare_chart
+
+    config = {"render": "bar", "width": default_budget.width_px, "bar": default_budget.min_bar_px}
+    render = cached_frame(data_key, config, lambda: prepare_chart(df, "bar", "variety", "yield", "site"))
+    if render.reduced:
+        st.caption(render.note)
+    return render.frame
+
+def chart_bar_simple(data_key: str, df):
     # 简易柱状图
-    df = pd.DataFrame(data, columns=data[0].keys())
-    st.bar_chart(df, x="variety", y="yield", color="site", width="stretch", stack=False)
+    st.bar_chart(bar_frame(data_key, df), x="variety", y="yield", color="site", width="stretch", stack=False)
+
+def chart_bar_altair(id: str, data_key: str, df):
+    import altair as alt
+
+    df = bar_frame(data_key, df)
 
-def chart_bar_altair(id: str, data: list):
-    df = pd.DataFrame(data, columns=data[0].keys())
     chart = (
         alt.Chart(df)
         .mark_bar()
@@ -28,53 +59,61 @@ def chart_bar_altair(id: str, data: list):
     )
     st.altair_chart(chart, width="stretch", key=f"bar0_{id}")
 
-def chart_bar_plotly1(id: str, data: list):
+def chart_bar_plotly1(id: str, data_key: str, source, df):
     idx = f"bar1_{id}"
-    df = pd.DataFrame(data, columns=data[0].keys())  
-    df.index = df.index + 1 # 将索引值全部加1
-    #此种方式适用于长数据格式
-    # 长数据格式：每个指标是一行记录
-    # 宽数据格式：每个指标是一列记录
-    fig = px.bar(
-        df, 
-        x='variety', 
-        y='yield', # 如果是宽数据格式，此处应该是指标数组
-        color='site', 
-        title="小麦产量分布柱状图1", 
-        text_auto=True
-    )
 
-    st.plotly_chart(fig, key=idx)
+    df_bar = bar_frame(data_key, df)
+
+    def build_figure():
+        import plotly.express as px
+
+        #此种方式适用于长数据格式
+        # 长数据格式：每个指标是一行记录
+        # 宽数据格式：每个指标是一列记录
+        return px.bar(
+            df_bar, 
+            x='variety', 
+            y='yield', # 如果是宽数据格式，此处应该是指标数组
+            color='site', 
+            title="小麦产量分布柱状图1", 
+            text_auto=True
+        )
+
+    st.plotly_chart(cached_figure(data_key, {"chart": "bar1"}, build_figure), key=idx)
     with st.expander("查看当前数据详情"):
-        # 指定列顺序
-        target_cols = ['year', 'variety', 'site', 'yield']
-        cols = [c for c in target_cols if c in df.columns]
-        # 补充剩余列
-        cols += [c for c in df.columns if c not in cols]
-        # 隐藏索引并显示
-        st.table(df[cols])
+        def fetch_page(offset: int, limit: int):
+            # 只读取当前页，指定列顺序
+            payload = load_payload(data_key, source)
+            target_cols = ['year', 'variety', 'site', 'yield']
+            cols = [c for c in target_cols if c in payload.schema]
+            # 补充剩余列
+            cols += [c for c in payload.schema if c not in cols]
+            page = payload.slice(offset, limit, columns=cols)
+            df_page = page.to_frame()
+            df_page.index = df_page.index + 1 # 将索引值全部加1
+            return df_page, page.total_rows
 
+        # 分页显示，每次只发送当前页
+        render_paged_table(idx, fetch_page)
 
-def chart_bar_plotly2(id: str, data: list):
-    # 实现按照品种总产量排行榜（按site固定顺序）
 
+def chart_bar_plotly2(id: str, data_key: str, df):
     idx = f"bar2_{id}"
-    columns = list(data[0].keys())
-    df = pd.DataFrame(data, columns=columns)
+    df_bar = bar_frame(data_key, df)
+    st.plotly_chart(cached_figure(data_key, {"chart": "bar2"}, lambda: build_bar_plotly2(df_bar)), key=idx)
 
-    # 步骤1：按variety和site聚合产量（sum）
-    df_grouped = df.groupby(['variety', 'site'], as_index=False)['yield'].sum()
 
-    # 步骤2：计算每个variety的总产量，用于排序
-    df_variety_total = df_grouped.groupby('variety')['yield'].sum().reset_index()
-    df_variety_total.columns = ['variety', 'total_yield']
+def build_bar_plotly2(df):
+    # 实现按照品种总产量排行榜（按site固定顺序）
+    import numpy as np
+    import plotly.express as px
+    import plotly.graph_objects as go
+
+    from utils.aggregate import rank_groups
 
-    # 步骤3：合并总产量到聚合数据，并按总产量降序排序
-    df_merged = pd.merge(df_grouped, df_variety_total, on='variety')
-    # 按总产量降序、site固定顺序排序（这里site顺序用数据集原生唯一值顺序）
-    fixed_site_order = df['site'].unique().tolist()  # 固定site顺序
-    df_merged['site'] = pd.Categorical(df_merged['site'], categories=fixed_site_order, ordered=True)
-    df_merged = df_merged.sort_values(['total_yield', 'site'], ascending=[False, True])
+    # 按variety和site聚合产量，附加每个variety的总产量，
+    # 按总产量降序、site固定顺序（数据集原生唯一值顺序）排序
+    df_merged = rank_groups(df, 'variety', 'site', 'yield', total_name='total_yield')
 
     fig = px.bar(
         df_merged, 
@@ -135,7 +174,7 @@ def chart_bar_plotly2(id: str, data: list):
     fig.add_trace(go.Scatter(
         x=df_unique_total['total_yield'],
         y=df_unique_total['variety'],
-        text=df_unique_total['total_yield'].apply(lambda x: f"  <b>{x:.1f}</b>"), # 格式化保留1位小数并加粗
+        text=np.char.mod("  <b>%.1f</b>", df_unique_total['total_yield'].to_numpy()), # 格式化保留1位小数并加粗
         mode='text',
         textposition='middle right',
         showlegend=False,
@@ -145,60 +184,77 @@ def chart_bar_plotly2(id: str, data: list):
     # 适当扩展x轴范围，防止文字被遮挡
     max_yield = df_unique_total['total_yield'].max()
     fig.update_layout(xaxis_range=[0, max_yield * 1.15])
+    return fig
 
-    st.plotly_chart(fig, key=idx)
-
-
-def render_assistant_message(content):
-    if content.startswith("["):
-        id = str(uuid.uuid4())
-        obj_data = json.loads(content)
-        # 求 id 的模数
-        mod = hash(id) % 4
-        if mod == 0:
-            st.markdown("#### 简易柱状图")
-            chart_bar_simple(obj_data)
-        elif mod == 1:
-            st.markdown("#### Altair 柱状图")
-            chart_bar_altair(id, obj_data)
-        elif mod == 2:
-            st.markdown("#### Plotly 柱状图1")
-            chart_bar_plotly1(id, obj_data)
-        elif mod == 3:
-            st.markdown("#### Plotly 柱状图2")
-            chart_bar_plotly2(id, obj_data)
-        else:
-            st.markdown("#### 数据表")
-            st.dataframe(obj_data)
+
+def render_assistant_message(id: str, content: str, artifact: dict = None):
+    # id 为消息内容的唯一标识（跨重新运行保持不变），用于组件 key 与图表类型选择
+    # artifact 为消息携带的数据附件（Arrow IPC），以附件内容摘要作为数据缓存键
+    if artifact is not None:
+        data_key, source = artifact["key"], artifact
+    elif content.startswith("["): # 兼容旧版以 JSON 文本传递数据的消息
+        data_key, source = content_key(content), content
     else:
         st.markdown(content)
+        return
+
+    df = load_frame(data_key, source)
+    # 求 id 的模数
+    mod = zlib.crc32(id.encode("utf-8")) % 4
+    if mod == 0:
+        st.markdown("#### 简易柱状图")
+        chart_bar_simple(data_key, df)
+    elif mod == 1:
+        st.markdown("#### Altair 柱状图")
+        chart_bar_altair(id, data_key, df)
+    elif mod == 2:
+        st.markdown("#### Plotly 柱状图1")
+        chart_bar_plotly1(id, data_key, source, df)
+    elif mod == 3:
+        st.markdown("#### Plotly 柱状图2")
+        chart_bar_plotly2(id, data_key, df)
+    else:
+        st.markdown("#### 数据表")
+        st.dataframe(df)
 
 
 if "messages" not in st.session_state:
     st.session_state["messages"] = [{"role": "assistant", "content": ["How can I help you?"]}]
 
 
-for msg in st.session_state.messages:
+def render_message(msg: dict):
     if msg["role"] == "user" or msg["role"] == "human":
         render_user_message(msg["content"])
     else:
+        msg_id = msg.setdefault("id", str(uuid.uuid4()))
+        artifacts = msg.get("artifacts") or [None] * len(msg["content"])
         with st.chat_message("assistant"):
-            for content in msg["content"]:
-                render_assistant_message(content)
+            for i, (content, artifact) in enumerate(zip(msg["content"], artifacts)):
+                render_assistant_message(f"{msg_id}_{i}", content, artifact)
+
+# 只完整渲染最近的消息，更早的消息折叠、按页展开
+render_history(st.session_state.messages, render_message)
 
 
 if prompt := st.chat_input():
     st.session_state.messages.append({"role": "user", "content": prompt})
     render_user_message(prompt)
 
+    from agent.schema import message_artifact
+
     with st.chat_message("assistant"):
-        for state in build_graph().stream({"messages": st.session_state.messages}):
+        for state in graph_registry.get("barley").stream({"messages": st.session_state.messages}, config={"configurable": {"turn_id": start_trace_turn()}}):
             for key, value in state.items():
                 #print(f"{key}: {value}")
                 messages = value.get("messages", [])
-                contents = []
-                for message in messages:
+                msg_id = str(uuid.uuid4())
+                contents, artifacts = [], []
+                for i, message in enumerate(messages):
                     raw_content = getattr(message, "content", message.get("content") if isinstance(message, dict) else "")
+                    artifact = message_artifact(message)
                     contents.append(raw_content)
-                    render_assistant_message(raw_content)
-                st.session_state.messages.append({"role": "assistant", "content": contents})
+                    artifacts.append(artifact)
+                    render_assistant_message(f"{msg_id}_{i}", raw_content, artifact)
+                st.session_state.messages.append({"role": "assistant", "content": contents, "artifacts": artifacts, "id": msg_id})
+
+render_trace_panel()
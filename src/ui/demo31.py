@@ -1,19 +1,22 @@
-import json
 import uuid
+from typing import TYPE_CHECKING
+
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-from agent.medal_agent import build_graph
-from utils.cache import CacheType, global_cache
-from utils.common_util import render_user_message
+from agent.graph_registry import graph_registry
+from utils.chart_cache import cached_figure, cached_frame
+from utils.common_util import render_history, render_paged_table, render_trace_panel, render_user_message, start_trace_turn
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 st.set_page_config(layout="wide")
 st.title("🦜🔗 Quickstart App")
 st.caption("🚀自由维度探索Demo1")
 
 
-def plotly_chart(chart_id: str, data: list[dict]):
-    df = pd.DataFrame(data, columns=data[0].keys())
+# 注意：pandas、plotly 等重量级依赖在函数内按需导入，避免拖慢页面冷启动
+
+def plotly_chart(chart_id: str, df: "pd.DataFrame", row_count: int = None, dataset: str = ""):
     st.subheader("📊 自由维度数据探索器")
 
     default_x_field = "年份"
@@ -83,72 +86,140 @@ def plotly_chart(chart_id: str, data: list[dict]):
         "type": chart_type
     })
 
-    # 过滤到选定年份
-    df_year = df[df[default_x_field] == x_value] if x_value is not None else df
-
     # 柱状图（支持单/多指标）
     category_dim = group_dim if group_dim else (default_group_options[0] if default_group_options else None)
     if not category_dim:
         st.warning("无可用分组维度用于柱状图")
         return
     
-    melted = df_year.melt(
-        id_vars=[category_dim],
-        value_vars=y_metrics,
-        var_name="指标",
-        value_name="值"
-    )
-    fig = px.bar(
-        melted,
-        x=category_dim,
-        y="值",
-        color="指标",
-        barmode="group",
-        title=f"{x_value}年 各{category_dim}的多指标对比"
-    )
-    fig.update_traces(textposition="outside")
-    fig.update_layout(xaxis_title=category_dim, yaxis_title="值")
-    st.plotly_chart(fig, width="stretch", key=f"bar2_{chart_id}")
+    config = {"x": x_value, "metrics": y_metrics, "category": category_dim}
+
+    def year_slice(name: str, frame: "pd.DataFrame") -> "pd.DataFrame":
+        # 来自数据集的数据直接取注册表按数据版本缓存的年份切片，否则现场过滤
+        if x_value is None:
+            return frame
+        if dataset:
+            from utils.dataset_registry import dataset_registry
+
+            return dataset_registry.view_frame(name, **{default_x_field: x_value})
+        return frame[frame[default_x_field] == x_value]
+
+    def build_frame():
+        from utils.downsample import prepare_chart
+
+        # 过滤后按像素预算截断类别，只在配置变化时执行
+        return prepare_chart(year_slice(dataset, df), "bar", category_dim, y_metrics)
+
+    render = cached_frame(chart_id, {"render": "bar", **config}, build_frame)
+    if render.reduced:
+        st.caption(render.note)
+
+    def build_figure():
+        import plotly.express as px
+
+        if dataset and x_value is not None and not render.reduced and category_dim == "国家":
+            # 长表投影的年份切片已缓存，只需按指标过滤，不再 melt
+            df_long = year_slice("medal_long", None)
+            melted = df_long[df_long["奖牌"].isin(y_metrics)].rename(columns={"奖牌": "指标", "数量": "值"})
+        else:
+            melted = render.frame.melt(
+                id_vars=[category_dim],
+                value_vars=y_metrics,
+                var_name="指标",
+                value_name="值"
+            )
+        fig = px.bar(
+            melted,
+            x=category_dim,
+            y="值",
+            color="指标",
+            barmode="group",
+            category_orders={"指标": y_metrics},
+            title=f"{x_value}年 各{category_dim}的多指标对比"
+        )
+        fig.update_traces(textposition="outside")
+        fig.update_layout(xaxis_title=category_dim, yaxis_title="值")
+        return fig
+
+    st.plotly_chart(cached_figure(chart_id, config, build_figure), width="stretch", key=f"bar2_{chart_id}")
+    if row_count is not None:
+        st.caption(f"原始数据共 {row_count:,} 行")
+
+
+def data_table(store_key: str, data: list[dict], store=None, expanded: bool = False):
+    # 数据详情分页表格：每页只从载荷存储读取可见窗口，local 模式的内联数据首次读取时写入载荷存储
+    from utils.payload_store import payload_store
+
+    store = store or payload_store
+
+    def fetch_page(offset: int, limit: int):
+        page = store.get_slice(store_key, offset, limit)
+        if page is None:
+            page = store.put(store_key, data).slice(offset, limit)
+        return page.to_frame(), page.total_rows
+
+    with st.expander("查看数据详情", expanded=expanded):
+        render_paged_table(f"table_{store_key}", fetch_page)
 
 
 def render_assistant_message(content: list[str], data_meta: dict):
     for item in content:
         st.markdown(item)
     
-    data = None
+    df = None
     if data_meta and data_meta.get("store_type") == "local":
         st.markdown("#### 本地图表")
-        store_key = str(uuid.uuid4())
+        store_key = data_meta.get("store_key") or str(uuid.uuid4())
         data = data_meta.get("data", [])
-    elif data_meta and data_meta.get("store_type") == "memory":
-        st.markdown("#### 内存图表")
+        if data:
+            def build():
+                import pandas as pd
+
+                return pd.DataFrame(data, columns=data[0].keys())
+
+            df = cached_frame(store_key, {}, build) # 同一消息的数据只构建一次
+    elif data_meta and data_meta.get("store_type") in ("memory", "disk"):
+        from agent.delivery import is_paged, payload_store_for
+
         store_key = data_meta.get("store_key", "")
-        key = f"{CacheType.KEY_PAYLOAD_DATA}:{store_key}"
-        data = global_cache.get(key, CacheType.HOT)
-    
-    if data:
-        plotly_chart(store_key, data)
+        store = payload_store_for(data_meta)
+        if store.get(store_key) is None:
+            st.warning("数据已过期或不在当前服务节点，请重新提问")
+            return
+        if is_paged(data_meta): # 大结果只按页读取，不构建整表 DataFrame
+            st.caption(f"数据量较大（{data_meta.get('row_count', 0):,} 行），按页加载")
+            data_table(store_key, [], store, expanded=True)
+            return
+        st.markdown("#### 内存图表")
+        df = store.get_frame(store_key) # 列式数据的只读视图，无需每次重建
+
+    if df is not None and not df.empty:
+        plotly_chart(store_key, df, data_meta.get("row_count"), data_meta.get("dataset", ""))
+        data_table(store_key, data_meta.get("data", []))
 
 
 if "messages" not in st.session_state:
     st.session_state["messages"] = [{"role": "assistant", "content": ["请输入问题，我会尽力回答。"], "data_meta": {}}]
 
 
-for msg in st.session_state.messages:
+def render_message(msg: dict):
     if msg["role"] == "user" or msg["role"] == "human":
         render_user_message(msg["content"])
     else:
         with st.chat_message("assistant"):
             render_assistant_message(msg["content"], msg["data_meta"])
 
+# 只完整渲染最近的消息，更早的消息折叠、按页展开
+render_history(st.session_state.messages, render_message)
+
 
 if prompt := st.chat_input():
     st.session_state.messages.append({"role": "user", "content": prompt})
     render_user_message(prompt)
 
     with st.chat_message("assistant"):
-        for state in build_graph().stream({"messages": prompt}, 
-            config={"configurable": {"data_type": "medal_width", "store_type": "local"}}
+        for state in graph_registry.get("medal").stream({"messages": prompt}, 
+            config={"configurable": {"data_type": "medal_width", "store_type": "local", "turn_id": start_trace_turn()}}
         ):
             for key, value in state.items():
                 #print(f"{key}: {value}")
@@ -160,3 +231,5 @@ if prompt := st.chat_input():
                 
                 render_assistant_message(contents, value.get("data_meta", {}))
                 st.session_state.messages.append({"role": "assistant", "content": contents, "data_meta": value.get("data_meta", {})})
+
+render_trace_panel()
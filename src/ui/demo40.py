@@ -1,20 +1,25 @@
-from turtle import color
 import uuid
+from typing import TYPE_CHECKING
+
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from agent.medal_agent import build_graph
-from utils.cache import CacheType, global_cache
-from utils.common_util import render_user_message
+from agent.graph_registry import graph_registry
+from utils.chart_cache import cached_figure, cached_frame
+from utils.common_util import render_history, render_paged_table, render_trace_panel, render_user_message, start_trace_turn
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 st.set_page_config(layout="wide")
 st.title("🦜🔗 Quickstart App")
 st.caption("🚀数据与消息分离的简易Demo")
 
 
-def chart_bar_plotly1(id: str, data: list[dict]):
-    df = pd.DataFrame(data, columns=data[0].keys())
+# 注意：pandas、plotly 等重量级依赖在函数内按需导入，避免拖慢页面冷启动
+
+def chart_bar_plotly1(id: str, df: "pd.DataFrame", dataset: str = ""):
+    import plotly.express as px
+    import plotly.graph_objects as go
+
     #year_options = df["年份"].unique().tolist()
     
     custom_colors = {
@@ -23,18 +28,19 @@ def chart_bar_plotly1(id: str, data: list[dict]):
         "英国": "#FFA500"   # 橙色
     }
 
-    fig1 = px.bar(
-        df, 
-        x="年份", 
-        y="数量", 
-        color="国家", 
-        barmode="group",
-        color_discrete_map=custom_colors,
-        category_orders={"国家": ["中国", "美国", "英国"]},  # 确保顺序正确
-        text="奖牌" # 
-        )
+    def build_fig1():
+        return px.bar(
+            df, 
+            x="年份", 
+            y="数量", 
+            color="国家", 
+            barmode="group",
+            color_discrete_map=custom_colors,
+            category_orders={"国家": ["中国", "美国", "英国"]},  # 确保顺序正确
+            text="奖牌" # 
+            )
 
-    st.plotly_chart(fig1, key=f"chart_bar_plotly1:{id}")
+    st.plotly_chart(cached_figure(id, {"chart": "plotly1"}, build_fig1), key=f"chart_bar_plotly1:{id}")
 
     year_options = df["年份"].unique().tolist()
     default_year = st.session_state.get("default_year", year_options[-1])
@@ -49,138 +55,171 @@ def chart_bar_plotly1(id: str, data: list[dict]):
         st.session_state["default_year"] = x_value
         title = f"奥运奖牌{x_value}年度榜单"
 
-    df_year = df[df["年份"] == x_value]
-    fig2 = px.bar(
-        df_year, 
-        x="国家", 
-        y="数量", 
-        color="奖牌", 
-        barmode="group",
-        color_discrete_map={
-            "金牌": "#FFD700",  # 金牌颜色
-            "银牌": "#C0C0C0",  # 银牌颜色
-            "铜牌": "#CD7F32"   # 铜牌颜色
-        },
-        category_orders={"奖牌": ["金牌", "银牌", "铜牌"]},  # 确保顺序正确
-        title=title,
-        text_auto=True
-        )
-    st.plotly_chart(fig2, key=f"chart_bar_plotly2:{id}")
+    def build_fig2():
+        if dataset: # 直接取注册表按数据版本缓存的年份切片
+            from utils.dataset_registry import dataset_registry
+
+            df_year = dataset_registry.view_frame(dataset, 年份=x_value)
+        else:
+            df_year = df[df["年份"] == x_value]
+        return px.bar(
+            df_year, 
+            x="国家", 
+            y="数量", 
+            color="奖牌", 
+            barmode="group",
+            color_discrete_map={
+                "金牌": "#FFD700",  # 金牌颜色
+                "银牌": "#C0C0C0",  # 银牌颜色
+                "铜牌": "#CD7F32"   # 铜牌颜色
+            },
+            category_orders={"奖牌": ["金牌", "银牌", "铜牌"]},  # 确保顺序正确
+            title=title,
+            text_auto=True
+            )
+
+    st.plotly_chart(cached_figure(id, {"chart": "plotly2", "year": x_value}, build_fig2), key=f"chart_bar_plotly2:{id}")
  
-    medal_gold = df[df["奖牌"] == "金牌"]
-    medal_silver = df[df["奖牌"] == "银牌"]
-    medal_bronze = df[df["奖牌"] == "铜牌"]
-
-    #medal_gold[medal_gold['国家'] == '中国']['数量'].tolist(),
-
-    data = [
-        go.Bar(
-            x=['2016', '2020', '2024'],
-            y=[34, 32, 28],
-            name='中国 - 金牌',
-            offsetgroup="金牌"
-        ),
-        go.Bar(
-            x=['2016', '2020', '2024'],
-            y=[31, 49, 37],
-            name='美国 - 金牌',
-            offsetgroup="金牌"
-        ),
-        go.Bar(
-            x=['2016', '2020', '2024'],
-            y=[27, 23, 48],
-            name='英国 - 金牌',
-            offsetgroup="金牌"
-        ),
-        go.Bar(
-            x=['2016', '2020', '2024'],
-            y=[28, 24, 33],
-            name='中国 - 银牌',
-            offsetgroup="银牌"
-        ),
-        go.Bar(
-            x=['2016', '2020', '2024'],
-            y=[28, 24, 33],
-            name='美国 - 银牌',
-            offsetgroup="银牌"
-        ),
-        go.Bar(
-            x=['2016', '2020', '2024'],
-            y=[28, 24, 33],
-            name='英国 - 银牌',
-            offsetgroup="银牌"
-        ),
-        go.Bar(
-            x=['2016', '2020', '2024'],
-            y=[28, 24, 33],    
-            name='中国 - 铜牌',
-            offsetgroup="铜牌"
-        ),
-        go.Bar(
-            x=['2016', '2020', '2024'],
-            y=[28, 24, 33],    
-            name='美国 - 铜牌',
-            offsetgroup="铜牌"
-        ),
-        go.Bar(
-            x=['2016', '2020', '2024'],
-            y=[28, 24, 33],    
-            name='英国 - 铜牌',
-            offsetgroup="铜牌"
-        ),
-    ]
-
-    layout = go.Layout(
-        title={
-            'text': '奥运奖牌历届榜单'
-        },
-        xaxis={
-            'title': {
-                'text': '年份'
-            }
-        },
-        yaxis={
-            'title': {
-                'text': '奖牌数量'
-            }
-        },
-        barmode='stack'
-    )
+    def build_fig3():
+        medal_gold = df[df["奖牌"] == "金牌"]
+        medal_silver = df[df["奖牌"] == "银牌"]
+        medal_bronze = df[df["奖牌"] == "铜牌"]
+
+        #medal_gold[medal_gold['国家'] == '中国']['数量'].tolist(),
+
+        data = [
+            go.Bar(
+                x=['2016', '2020', '2024'],
+                y=[34, 32, 28],
+                name='中国 - 金牌',
+                offsetgroup="金牌"
+            ),
+            go.Bar(
+                x=['2016', '2020', '2024'],
+                y=[31, 49, 37],
+                name='美国 - 金牌',
+                offsetgroup="金牌"
+            ),
+            go.Bar(
+                x=['2016', '2020', '2024'],
+                y=[27, 23, 48],
+                name='英国 - 金牌',
+                offsetgroup="金牌"
+            ),
+            go.Bar(
+                x=['2016', '2020', '2024'],
+                y=[28, 24, 33],
+                name='中国 - 银牌',
+                offsetgroup="银牌"
+            ),
+            go.Bar(
+                x=['2016', '2020', '2024'],
+                y=[28, 24, 33],
+                name='美国 - 银牌',
+                offsetgroup="银牌"
+            ),
+            go.Bar(
+                x=['2016', '2020', '2024'],
+                y=[28, 24, 33],
+                name='英国 - 银牌',
+                offsetgroup="银牌"
+            ),
+            go.Bar(
+                x=['2016', '2020', '2024'],
+                y=[28, 24, 33],    
+                name='中国 - 铜牌',
+                offsetgroup="铜牌"
+            ),
+            go.Bar(
+                x=['2016', '2020', '2024'],
+                y=[28, 24, 33],    
+                name='美国 - 铜牌',
+                offsetgroup="铜牌"
+            ),
+            go.Bar(
+                x=['2016', '2020', '2024'],
+                y=[28, 24, 33],    
+                name='英国 - 铜牌',
+                offsetgroup="铜牌"
+            ),
+        ]
+
+        layout = go.Layout(
+            title={
+                'text': '奥运奖牌历届榜单'
+            },
+            xaxis={
+                'title': {
+                    'text': '年份'
+                }
+            },
+            yaxis={
+                'title': {
+                    'text': '奖牌数量'
+                }
+            },
+            barmode='stack'
+        )
     
-    fig3 = go.Figure(data=data, layout=layout)
-    st.plotly_chart(fig3, key=f"chart_bar_plotly3:{id}")
+        return go.Figure(data=data, layout=layout)
+
+    st.plotly_chart(cached_figure(id, {"chart": "plotly3"}, build_fig3), key=f"chart_bar_plotly3:{id}")
+
+
+def _page(store, store_key: str, offset: int, limit: int):
+    page = store.get_slice(store_key, offset, limit)
+    return page.to_frame(), page.total_rows
 
 
 def render_assistant_message(content: list[str], data_meta: dict):
     for item in content:
         st.markdown(item)
     
-    data = None
+    df = None
     if data_meta and data_meta.get("store_type") == "local":
         st.markdown("#### 本地图表")
-        store_key = str(uuid.uuid4())
+        store_key = data_meta.get("store_key") or str(uuid.uuid4())
         data = data_meta.get("data", [])
-    elif data_meta and data_meta.get("store_type") == "memory":
-        st.markdown("#### 内存图表")
+        if data:
+            def build():
+                import pandas as pd
+
+                return pd.DataFrame(data, columns=data[0].keys())
+
+            df = cached_frame(store_key, {}, build) # 同一消息的数据只构建一次
+    elif data_meta and data_meta.get("store_type") in ("memory", "disk"):
+        from agent.delivery import is_paged, payload_store_for
+
         store_key = data_meta.get("store_key", "")
-        key = f"{CacheType.KEY_PAYLOAD_DATA}:{store_key}"
-        data = global_cache.get(key, CacheType.HOT)
-    
-    if data:
-        chart_bar_plotly1(store_key, data)
+        store = payload_store_for(data_meta)
+        if store.get(store_key) is None:
+            st.warning("数据已过期或不在当前服务节点，请重新提问")
+            return
+        if is_paged(data_meta): # 大结果只按页读取，不构建整表 DataFrame
+            st.caption(f"数据量较大（{data_meta.get('row_count', 0):,} 行），按页加载")
+            render_paged_table(f"table_{store_key}", lambda offset, limit: _page(store, store_key, offset, limit))
+            return
+        st.markdown("#### 内存图表")
+        df = store.get_frame(store_key) # 列式数据的只读视图，无需每次重建
+
+    if df is not None and not df.empty:
+        chart_bar_plotly1(store_key, df, data_meta.get("dataset", ""))
 
 
 if "messages" not in st.session_state:
     st.session_state["messages"] = [{"role": "assistant", "content": ["请输入问题，我会尽力回答。"], "data_meta": {}}]
 
 
-for msg in st.session_state.messages:
+def render_message(msg: dict):
     if msg["role"] == "user" or msg["role"] == "human":
         render_user_message(msg["content"])
     else:
         with st.chat_message("assistant"):
             render_assistant_message(msg["content"], msg["data_meta"])
 
+# 只完整渲染最近的消息，更早的消息折叠、按页展开
+render_history(st.session_state.messages, render_message)
+
 
 config = {"configurable": {"data_type": "medal_long"}}
 
@@ -189,7 +228,7 @@ if prompt := st.chat_input():
     render_user_message(prompt)
 
     with st.chat_message("assistant"):
-        for state in build_graph().stream({"messages": prompt}, config=config):
+        for state in graph_registry.get("medal").stream({"messages": prompt}, config={"configurable": {**config["configurable"], "turn_id": start_trace_turn()}}):
             for key, value in state.items():
                 #print(f"{key}: {value}")
                 messages = value.get("messages", [])
@@ -200,3 +239,5 @@ if prompt := st.chat_input():
                     contents.append(raw_content)
                 render_assistant_message(contents, data_meta)
                 st.session_state.messages.append({"role": "assistant", "content": contents, "data_meta": data_meta})
+
+render_trace_panel()
@@ -0,0 +1,206 @@
+"""基于 NumPy 的分组聚合内核
+
+分组键先 factorize 为整数编码，多列编码合并为一维分组号后用 bincount / reduceat 聚合，
+避免 pandas groupby + merge + sort 链路的多次中间表构建。输入输出均为 DataFrame，便于图表函数直接使用。
+"""
+from typing import TYPE_CHECKING, Any, Sequence
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+AGG_FUNCS = ("sum", "count", "mean", "min", "max")
+
+# 分组号空间不超过该值时直接用 bincount 统计，否则先对分组号排序去重
+_DENSE_GROUP_LIMIT = 1 << 22
+
+
+def factorize(values: Any) -> tuple[np.ndarray, np.ndarray]:
+    """将一列值编码为整数，编码按首次出现顺序分配（与 Series.unique() 顺序一致）
+    :param values: Series / ndarray / list
+    :return: (编码数组, 唯一值数组)
+    """
+    import pandas as pd
+
+    series = values if isinstance(values, pd.Series) else pd.Series(values)
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # 分类列直接复用已有编码，再按首次出现顺序重排
+        cat_codes = series.cat.codes.to_numpy().astype(np.int64)
+        n_categories = len(series.cat.categories)
+        # 倒序赋值：重复下标保留最后一次写入，即每个分类首次出现的位置（O(n)，无需排序）
+        first = np.full(n_categories + 1, len(cat_codes), dtype=np.int64)
+        first[cat_codes[::-1]] = np.arange(len(cat_codes) - 1, -1, -1)
+        present = np.flatnonzero(first[:n_categories] < len(cat_codes))
+        order = present[np.argsort(first[present], kind="stable")]
+        remap = np.full(n_categories + 1, -1, dtype=np.int64) # 缺失值编码 -1 落在末位，仍映射为 -1
+        remap[order] = np.arange(len(order))
+        codes = remap[cat_codes]
+        return codes, np.asarray(series.cat.categories)[order]
+    codes, uniques = pd.factorize(series, sort=False)
+    return codes.astype(np.int64, copy=False), np.asarray(uniques)
+
+
+def _group_ids(df: "pd.DataFrame", by: Sequence[str]) -> tuple[np.ndarray, int, list[np.ndarray], list[np.ndarray]]:
+    """计算每行的紧凑分组号
+    :return: (每行分组号, 分组数, 每个分组在各键列上的取值, 各键列的唯一值)
+    """
+    codes_list, uniques_list = zip(*(factorize(df[col]) for col in by))
+    shape = tuple(max(len(u), 1) for u in uniques_list)
+    # 键列含缺失值（编码 -1）的行不参与分组，与 pandas groupby 默认行为一致
+    missing = np.logical_or.reduce([codes < 0 for codes in codes_list])
+    has_missing = bool(missing.any())
+    if has_missing:
+        codes_list = [codes[~missing] for codes in codes_list]
+    flat = np.ravel_multi_index(codes_list, shape) if len(by) > 1 else codes_list[0]
+
+    size = int(np.prod(shape, dtype=np.int64))
+    if size <= max(_DENSE_GROUP_LIMIT, len(flat)):
+        present = np.flatnonzero(np.bincount(flat, minlength=size))
+        remap = np.empty(size, dtype=np.int64)
+        remap[present] = np.arange(len(present))
+        inverse = remap[flat]
+    else:
+        present, inverse = np.unique(flat, return_inverse=True)
+
+    if has_missing:
+        full = np.full(len(missing), -1, dtype=np.int64)
+        full[~missing] = inverse
+        inverse = full
+    key_codes = np.unravel_index(present, shape) if len(by) > 1 else (present,)
+    keys = [uniques[codes] for uniques, codes in zip(uniques_list, key_codes)]
+    return inverse, len(present), keys, list(uniques_list)
+
+
+def _aggregate(inverse: np.ndarray, n_groups: int, values: np.ndarray, agg: str) -> np.ndarray:
+    """按分组号聚合，NaN 值与分组号为 -1 的行不参与计算"""
+    if agg not in AGG_FUNCS:
+        raise ValueError(f"不支持的聚合方式: {agg}，可选 {AGG_FUNCS}")
+    values = np.asarray(values, dtype=np.float64)
+    valid = ~np.isnan(values) & (inverse >= 0)
+    if not valid.all():
+        inverse, values = inverse[valid], values[valid]
+
+    counts = np.bincount(inverse, minlength=n_groups)
+    if agg == "count":
+        return counts
+    if agg in ("sum", "mean"):
+        sums = np.bincount(inverse, weights=values, minlength=n_groups)
+        if agg == "sum":
+            return sums
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return sums / counts
+
+    # min / max：按分组号排序后分段归约
+    order = np.argsort(inverse, kind="stable")
+    sorted_values = values[order]
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    reducer = np.minimum if agg == "min" else np.maximum
+    result = np.full(n_groups, np.nan)
+    non_empty = counts > 0
+    if len(sorted_values):
+        result[non_empty] = reducer.reduceat(sorted_values, starts[non_empty])
+    return result
+
+
+def group_by(df: "pd.DataFrame", by: Sequence[str], value: str, agg: str = "sum", name: str = None) -> "pd.DataFrame":
+    """分组聚合
+    :param df: 数据
+    :param by: 分组列
+    :param value: 聚合列
+    :param agg: 聚合方式 sum/count/mean/min/max
+    :param name: 结果列名，默认与 value 相同
+    :return: 每个分组一行，分组按各键首次出现顺序排列
+    """
+    import pandas as pd
+
+    by = list(by)
+    inverse, n_groups, keys, _ = _group_ids(df, by)
+    result = _aggregate(inverse, n_groups, df[value].to_numpy(), agg)
+    return pd.DataFrame({**dict(zip(by, keys)), (name or value): result})
+
+
+def rollup(df: "pd.DataFrame", by: Sequence[str], value: str, agg: str = "sum") -> "pd.DataFrame":
+    """多级小计（SQL ROLLUP）：依次按 by[:n]、by[:n-1] … 直到总计聚合
+    汇总层的键列为 None，_level 列表示参与分组的键列数量
+    """
+    import pandas as pd
+
+    by = list(by)
+    finest = group_by(df, by, value, agg)
+    frames = [finest.assign(_level=len(by))]
+    for level in range(len(by) - 1, -1, -1):
+        if agg == "mean":
+            # 均值不可由下层结果合并，直接从明细计算
+            if level:
+                frame = group_by(df, by[:level], value, agg)
+            else:
+                frame = pd.DataFrame({value: [_aggregate(np.zeros(len(df), dtype=np.int64), 1, df[value].to_numpy(), agg)[0]]})
+        else:
+            # sum/count/min/max 可以由更细一层的结果再聚合
+            merge_agg = "sum" if agg == "count" else agg
+            if level:
+                frame = group_by(finest, by[:level], value, merge_agg)
+            else:
+                frame = pd.DataFrame({value: _aggregate(np.zeros(len(finest), dtype=np.int64), 1, finest[value].to_numpy(), merge_agg)})
+        for col in by[level:]:
+            frame[col] = None
+        frames.append(frame[by + [value]].assign(_level=level))
+    return pd.concat(frames, ignore_index=True)
+
+
+def top_n(df: "pd.DataFrame", by: str, value: str, n: int, agg: str = "sum", other_label: Any = "其他") -> "pd.DataFrame":
+    """按聚合值取前 N 个分组，其余分组合并为一行 other_label（other_label 为 None 时直接丢弃）
+    :return: 按聚合值降序排列的结果
+    """
+    import pandas as pd
+
+    grouped = group_by(df, [by], value, agg)
+    order = np.argsort(-grouped[value].to_numpy(), kind="stable")
+    top = grouped.iloc[order[:n]].reset_index(drop=True)
+    rest = grouped.iloc[order[n:]]
+    if other_label is None or rest.empty:
+        return top
+    if agg == "mean":
+        # 均值不可由各分组结果合并，取其余分组的明细计算
+        rest_values = df.loc[df[by].isin(rest[by]), value].to_numpy()
+    else:
+        # sum/count/min/max 由其余分组的结果再聚合
+        rest_values = rest[value].to_numpy()
+    merge_agg = "sum" if agg == "count" else agg
+    rest_value = _aggregate(np.zeros(len(rest_values), dtype=np.int64), 1, rest_values, merge_agg)[0]
+    other = pd.DataFrame({by: [other_label], value: [rest_value]})
+    return pd.concat([top.astype({by: object}), other], ignore_index=True)
+
+
+def rank_groups(df: "pd.DataFrame", group: str, sub: str, value: str, total_name: str = None,
+                sub_order: Sequence[Any] = None) -> "pd.DataFrame":
+    """组内明细 + 组总计排行：按 (group, sub) 求和，附加 group 总计列，
+    按总计降序、sub 固定顺序排序，sub 列转为有序分类（用于图例顺序）
+    :param df: 数据
+    :param group: 排行的分组列，如品种
+    :param sub: 组内明细列，如地区
+    :param value: 求和列，如产量
+    :param total_name: 总计列名，默认 total_{value}
+    :param sub_order: sub 的固定顺序，默认按数据中首次出现顺序
+    """
+    import pandas as pd
+
+    total_name = total_name or f"total_{value}"
+    inverse, n_groups, (group_keys, sub_keys), (_, sub_uniques) = _group_ids(df, [group, sub])
+    sums = _aggregate(inverse, n_groups, df[value].to_numpy(), "sum")
+
+    # 组总计：对 (group, sub) 结果按 group 再次 bincount
+    group_codes, group_uniques = factorize(group_keys)
+    totals = np.bincount(group_codes, weights=sums, minlength=len(group_uniques))[group_codes]
+
+    if sub_order is None:
+        sub_order = sub_uniques
+    sub_rank = pd.Categorical(sub_keys, categories=list(sub_order), ordered=True)
+    order = np.lexsort((sub_rank.codes, -totals)) # 最后一个键为主排序键
+    return pd.DataFrame({
+        group: group_keys[order],
+        sub: sub_rank[order],
+        value: sums[order],
+        total_name: totals[order],
+    })
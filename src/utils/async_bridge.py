@@ -0,0 +1,70 @@
+import asyncio
+import queue
+import threading
+from typing import Any, AsyncIterator, Awaitable, Iterator
+
+_DONE = object()
+
+
+class AsyncBridge:
+    """同步脚本到异步协程的桥接器
+
+    所有协程都在同一个后台事件循环线程中执行，Streamlit 脚本线程只负责等待结果，
+    因此各会话可以共享绑定在该事件循环上的异步连接池（如 httpx.AsyncClient）。
+    """
+
+    def __init__(self, name: str = "async-bridge"):
+        self.name = name
+        self._loop: asyncio.AbstractEventLoop = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """后台事件循环，首次使用时启动"""
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name=self.name, daemon=True).start()
+                    self._loop = loop
+        return self._loop
+
+    def run(self, coro: Awaitable[Any], timeout: float = None) -> Any:
+        """在后台事件循环中执行协程并等待结果
+        :param coro: 协程
+        :param timeout: 超时时间（秒）
+        :return: 协程返回值
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def iterate(self, agen: AsyncIterator[Any]) -> Iterator[Any]:
+        """将异步迭代器转换为同步迭代器，元素产生后立即返回给调用方
+        调用方中途停止迭代（如 Streamlit 重新运行脚本）时，后台任务会被取消
+        """
+        items: queue.Queue = queue.Queue()
+
+        async def pump():
+            try:
+                async for item in agen:
+                    items.put((item, None))
+            except BaseException as e:
+                items.put((_DONE, e))
+                raise
+            else:
+                items.put((_DONE, None))
+
+        future = asyncio.run_coroutine_threadsafe(pump(), self.loop)
+        try:
+            while True:
+                item, error = items.get()
+                if item is _DONE:
+                    if error is not None and not isinstance(error, asyncio.CancelledError):
+                        raise error
+                    return
+                yield item
+        finally:
+            future.cancel()
+
+
+# 全局唯一桥接器实例（单例）
+async_bridge = AsyncBridge()
@@ -1,44 +1,393 @@
+import asyncio
+import os
+import sys
+import threading
+from concurrent.futures import CancelledError, Future
 from enum import StrEnum
 from cachetools import LRUCache, TTLCache, LFUCache
-from typing import Any, Optional
+from typing import Any, Awaitable, Callable, Optional
 
 class CacheType(StrEnum):
     """缓存类型"""
     HOT = "hot"
     SESSION = "session"
     FOREVER = "forever"
+    SHARED = "shared" # 跨进程共享（内存映射文件），需通过 register_tier 注册
+    SPILL = "spill" # 溢出到磁盘的超大载荷（内存映射文件），首次溢出时注册
 
     KEY_PAYLOAD_DATA = "payload" # 数据缓存
 
 
-class GlobalCache:
-    """全局缓存管理器，封装多种缓存策略和操作方法"""
+MB = 1024 * 1024
+
+# 大容器估算大小时的采样条数，避免对 50 万行数据逐行计算
+_SIZE_SAMPLE_COUNT = 100
+
+
+def estimate_size(value: Any) -> int:
+    """估算缓存值占用的字节数（用于按字节预算淘汰）
+    :param value: 缓存值，支持 numpy/pyarrow（nbytes）、pandas（memory_usage）及常见容器
+    :return: 估算的字节数
+    """
+    nbytes = getattr(value, "nbytes", None)
+    if isinstance(nbytes, int):
+        return nbytes
+    memory_usage = getattr(value, "memory_usage", None)
+    if callable(memory_usage) and hasattr(value, "columns"):
+        return int(memory_usage(deep=True).sum())
+    if isinstance(value, (str, bytes, bytearray, memoryview, int, float, bool)) or value is None:
+        return sys.getsizeof(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + _estimate_items(list(value.items()), len(value))
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = value if isinstance(value, (list, tuple)) else list(value)
+        return sys.getsizeof(value) + _estimate_items(items, len(items))
+    return sys.getsizeof(value)
+
+
+def _estimate_items(items: list, count: int) -> int:
+    """估算容器元素大小，元素过多时按前 N 条采样并线性外推"""
+    if count == 0:
+        return 0
+    sample = items[:_SIZE_SAMPLE_COUNT]
+    total = 0
+    for item in sample:
+        if isinstance(item, tuple) and len(item) == 2:
+            total += estimate_size(item[0]) + estimate_size(item[1])
+        else:
+            total += estimate_size(item)
+    return total * count // len(sample)
+
+
+class _StatsMixin:
+    """统计淘汰/过期次数的缓存混入类（cachetools 在淘汰时调用 popitem）"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.evictions = 0
+        self.expirations = 0
+        self.on_evict: Optional[Callable[[Any, Any], None]] = None # 淘汰/过期回调 on_evict(key, value)，在分片锁内调用
+
+    def popitem(self):
+        item = super().popitem()
+        self.evictions += 1
+        if self.on_evict is not None:
+            self.on_evict(*item)
+        return item
+
+    def expire(self, time=None):
+        expired = super().expire(time)
+        self.expirations += len(expired)
+        if self.on_evict is not None:
+            for key, value in expired:
+                self.on_evict(key, value)
+        return expired
+
+
+class _LRUCache(_StatsMixin, LRUCache):
+    pass
+
+
+class _TTLCache(_StatsMixin, TTLCache):
+    pass
+
+
+class _LFUCache(_StatsMixin, LFUCache):
+    pass
+
+
+class _CacheStripe:
+    """缓存分片：一把锁 + 一个 cachetools 缓存 + 访问计数"""
+
+    __slots__ = ("lock", "cache", "hits", "misses", "sets", "rejected")
+
+    def __init__(self, cache):
+        self.lock = threading.Lock()
+        self.cache = cache
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.rejected = 0
+
+
+_MISSING = object()
+
+
+class CacheTier:
+    """单个缓存层：按字节预算淘汰，按 key 哈希分片加锁，降低多会话线程的锁竞争"""
+
+    def __init__(self, name: str, factory, max_bytes: int, stripes: int = 4):
+        """
+        :param name: 缓存层名称
+        :param factory: 缓存构造函数，签名为 factory(maxsize, getsizeof)
+        :param max_bytes: 该层总字节预算，平均分配到各分片
+        :param stripes: 分片数量，单个值不能超过 max_bytes / stripes
+        """
+        self.name = name
+        self.max_bytes = max_bytes
+        stripe_bytes = max(1, max_bytes // stripes)
+        self._stripes = [_CacheStripe(factory(stripe_bytes, estimate_size)) for _ in range(stripes)]
+        self._listeners: list[Callable[[Any, Any], None]] = []
+
+    def add_eviction_listener(self, listener: Callable[[Any, Any], None]) -> None:
+        """注册淘汰/过期监听 listener(key, value)
+        监听函数在分片锁内调用，不能访问缓存或获取其他锁，只应记录下来稍后处理
+        """
+        self._listeners.append(listener)
+
+        def notify(key, value):
+            for item in self._listeners:
+                item(key, value)
+
+        for stripe in self._stripes:
+            with stripe.lock:
+                stripe.cache.on_evict = notify
+
+    def _stripe(self, key: Any) -> _CacheStripe:
+        return self._stripes[hash(key) % len(self._stripes)]
+
+    def set(self, key: Any, value: Any) -> bool:
+        """写入缓存，超过分片预算的值会被拒绝（并移除同 key 的旧值）
+        :return: 是否写入成功
+        """
+        stripe = self._stripe(key)
+        with stripe.lock:
+            try:
+                stripe.cache[key] = value
+            except ValueError:
+                stripe.cache.pop(key, None)
+                stripe.rejected += 1
+                return False
+            stripe.sets += 1
+            return True
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        stripe = self._stripe(key)
+        with stripe.lock:
+            value = stripe.cache.get(key, _MISSING)
+            if value is _MISSING:
+                stripe.misses += 1
+                return default
+            stripe.hits += 1
+            return value
+
+    def delete(self, key: Any) -> None:
+        stripe = self._stripe(key)
+        with stripe.lock:
+            stripe.cache.pop(key, None)
+
+    def clear(self) -> None:
+        for stripe in self._stripes:
+            with stripe.lock:
+                stripe.cache.clear()
+
+    def stats(self) -> dict[str, int]:
+        """汇总各分片的统计信息"""
+        result = {"hits": 0, "misses": 0, "sets": 0, "rejected": 0, "evictions": 0, "expirations": 0, "entries": 0, "bytes": 0}
+        for stripe in self._stripes:
+            with stripe.lock:
+                result["hits"] += stripe.hits
+                result["misses"] += stripe.misses
+                result["sets"] += stripe.sets
+                result["rejected"] += stripe.rejected
+                result["evictions"] += stripe.cache.evictions
+                result["expirations"] += stripe.cache.expirations
+                result["entries"] += len(stripe.cache)
+                result["bytes"] += stripe.cache.currsize
+        result["max_bytes"] = self.max_bytes
+        return result
+
+
+class SingleFlight:
+    """合并并发的相同计算：同一个键同时只执行一次，其余调用方等待并共享结果（包括异常）
+
+    同步与异步调用方可以等待同一次执行（如 Streamlit 线程与异步事件循环请求同一个问题）。
+    执行方被取消时，等待方重新竞争执行，不会拿到取消异常。
+    """
 
     def __init__(self):
-        # 1. LRU 缓存（最近使用淘汰策略）
-        # 适用于：热点数据缓存，优先保留最近访问的条目
-        self.hot_cache = LRUCache(maxsize=100)  # 最大缓存 100 条
+        self._calls: dict[Any, Future] = {}
+        self._lock = threading.Lock()
+        self.executions = 0 # 实际执行次数
+        self.shared = 0 # 等待并共享结果的次数
+
+    def _join(self, key: Any) -> tuple[Future, bool]:
+        """加入键对应的执行：(future, 是否由本调用方执行)"""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.shared += 1
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            self.executions += 1
+            return future, True
+
+    def _finish(self, key: Any, future: Future, result: Any = None, error: BaseException = None) -> None:
+        with self._lock:
+            self._calls.pop(key, None)
+        if isinstance(error, (asyncio.CancelledError, KeyboardInterrupt)):
+            future.cancel()
+        elif error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key: Any, func: Callable[[], Any]) -> Any:
+        """执行或等待正在进行的相同计算
+        :param key: 计算的唯一标识
+        :param func: 计算函数
+        :return: 计算结果
+        """
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                try:
+                    result = func()
+                except BaseException as e:
+                    self._finish(key, future, error=e)
+                    raise
+                self._finish(key, future, result)
+                return result
+            try:
+                return future.result()
+            except CancelledError:
+                continue # 执行方被取消，重新竞争
+
+    async def ado(self, key: Any, func: Callable[[], Awaitable[Any]]) -> Any:
+        """do 的异步版本，等待时不阻塞事件循环"""
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                try:
+                    result = await func()
+                except BaseException as e:
+                    self._finish(key, future, error=e)
+                    raise
+                self._finish(key, future, result)
+                return result
+            try:
+                # shield：本调用方被取消时不连带取消共享的执行
+                return await asyncio.shield(asyncio.wrap_future(future))
+            except asyncio.CancelledError:
+                if future.cancelled():
+                    continue
+                raise
 
-        # 2. TTL 缓存（超时自动淘汰策略）
-        # 适用于：临时数据（如会话、短期有效的Token）
-        self.session_cache = TTLCache(maxsize=5000, ttl=36000)  # 10小时后自动失效，最多 5000 条
+    def in_flight(self) -> int:
+        """正在执行的计算数"""
+        return len(self._calls)
 
-        # 3. LFU 缓存（最不经常使用淘汰策略）
-        # 适用于：长期运行的服务，优先保留访问频率高的条目
-        self.forever_cache = LFUCache(maxsize=2000)  # 最大缓存 2000 条
 
-    def set(self, key: Any, value: Any, cache_type: str = "hot") -> None:
+def _env_bytes(name: str, default: int) -> int:
+    """从环境变量读取字节预算（单位 MB）"""
+    return int(float(os.getenv(name, default / MB)) * MB)
+
+
+class GlobalCache:
+    """全局缓存管理器，封装多种缓存策略和操作方法（线程安全）"""
+
+    def __init__(self, hot_bytes: int = None, session_bytes: int = None, forever_bytes: int = None, stripes: int = 4):
+        """
+        :param hot_bytes: 热点缓存字节预算，默认读取环境变量 CACHE_HOT_MB（256MB）
+        :param session_bytes: 会话缓存字节预算，默认读取环境变量 CACHE_SESSION_MB（256MB）
+        :param forever_bytes: 常驻缓存字节预算，默认读取环境变量 CACHE_FOREVER_MB（128MB）
+        :param stripes: 每层的锁分片数量
+        """
+        self._tiers: dict[str, CacheTier] = {
+            # 1. LRU 缓存（最近使用淘汰策略）
+            # 适用于：热点数据缓存，优先保留最近访问的条目
+            CacheType.HOT: CacheTier(
+                CacheType.HOT,
+                lambda maxsize, getsizeof: _LRUCache(maxsize=maxsize, getsizeof=getsizeof),
+                hot_bytes or _env_bytes("CACHE_HOT_MB", 256 * MB),
+                stripes,
+            ),
+            # 2. TTL 缓存（超时自动淘汰策略）
+            # 适用于：临时数据（如会话、短期有效的Token），10小时后自动失效
+            CacheType.SESSION: CacheTier(
+                CacheType.SESSION,
+                lambda maxsize, getsizeof: _TTLCache(maxsize=maxsize, ttl=36000, getsizeof=getsizeof),
+                session_bytes or _env_bytes("CACHE_SESSION_MB", 256 * MB),
+                stripes,
+            ),
+            # 3. LFU 缓存（最不经常使用淘汰策略）
+            # 适用于：长期运行的服务，优先保留访问频率高的条目
+            CacheType.FOREVER: CacheTier(
+                CacheType.FOREVER,
+                lambda maxsize, getsizeof: _LFUCache(maxsize=maxsize, getsizeof=getsizeof),
+                forever_bytes or _env_bytes("CACHE_FOREVER_MB", 128 * MB),
+                stripes,
+            ),
+        }
+        self.single_flight = SingleFlight() # 合并并发的相同未命中计算
+
+    def get_or_compute(self, key: Any, compute: Callable[[], Any], cache_type: str = "hot") -> Any:
+        """获取缓存数据，未命中时计算并写入；并发的相同未命中只计算一次，其余调用方等待并共享结果
+        :param key: 缓存键
+        :param compute: 计算函数，返回 None 时不写入缓存
+        :param cache_type: 缓存类型
+        :return: 缓存值或计算结果
+        """
+        value = self.get(key, cache_type)
+        if value is not None:
+            return value
+
+        def load():
+            value = self.get(key, cache_type) # 排队期间上一次执行可能已经写入
+            if value is None:
+                value = compute()
+                if value is not None:
+                    self.set(key, value, cache_type)
+            return value
+
+        return self.single_flight.do((cache_type, key), load)
+
+    async def aget_or_compute(self, key: Any, compute: Callable[[], Awaitable[Any]], cache_type: str = "hot") -> Any:
+        """get_or_compute 的异步版本，compute 为协程函数"""
+        value = self.get(key, cache_type)
+        if value is not None:
+            return value
+
+        async def load():
+            value = self.get(key, cache_type)
+            if value is None:
+                value = await compute()
+                if value is not None:
+                    self.set(key, value, cache_type)
+            return value
+
+        return await self.single_flight.ado((cache_type, key), load)
+
+    def register_tier(self, cache_type: str, tier: Any) -> None:
+        """注册自定义缓存层（如 MmapTier），需实现 set/get/delete/clear/stats 方法
+        :param cache_type: 缓存类型
+        :param tier: 缓存层实例
+        """
+        self._tiers[cache_type] = tier
+
+    def add_eviction_listener(self, cache_type: str, listener: Callable[[Any, Any], None]) -> bool:
+        """注册缓存层的淘汰/过期监听（见 CacheTier.add_eviction_listener）
+        :return: 缓存层是否支持监听，自定义层（如 MmapTier）不支持时返回 False
+        """
+        tier = self._tier(cache_type)
+        if not hasattr(tier, "add_eviction_listener"):
+            return False
+        tier.add_eviction_listener(listener)
+        return True
+
+    def _tier(self, cache_type: str) -> CacheTier:
+        # 未知类型沿用旧行为，落到热点缓存
+        return self._tiers.get(cache_type, self._tiers[CacheType.HOT])
+
+    def set(self, key: Any, value: Any, cache_type: str = "hot") -> bool:
         """设置缓存数据
         :param key: 缓存键
         :param value: 缓存值
-        :param cache_type: 缓存类型，可选值为 "hot"（默认）、"session"、"forever"
+        :param cache_type: 缓存类型，可选值为 "hot"（默认）、"session"、"forever"，或已注册的自定义类型
+        :return: 是否写入成功，单个值超过分片字节预算时返回 False
         """
-        if cache_type == "session":
-            self.session_cache[key] = value
-        elif cache_type == "forever":
-            self.forever_cache[key] = value
-        else:
-            self.hot_cache[key] = value
+        return self._tier(cache_type).set(key, value)
 
     def get(self, key: Any, cache_type: str = "hot") -> Optional[Any]:
         """获取缓存数据
@@ -46,19 +395,30 @@ class GlobalCache:
         :param cache_type: 缓存类型，可选值为 "hot"（默认）、"session"、"forever"
         :return: 缓存值，如果键不存在则返回 None
         """
-        if cache_type == "session":
-            return self.session_cache.get(key, None)
-        elif cache_type == "forever":
-            return self.forever_cache.get(key, None)
-        else:
-            return self.hot_cache.get(key, None)
+        return self._tier(cache_type).get(key)
+
+    def delete(self, key: Any, cache_type: str = "hot") -> None:
+        """删除缓存数据
+        :param key: 缓存键
+        :param cache_type: 缓存类型
+        """
+        self._tier(cache_type).delete(key)
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """获取各缓存层的统计信息
+        :return: {缓存类型: {hits, misses, sets, rejected, evictions, expirations, entries, bytes, max_bytes}}
+        """
+        return {name: tier.stats() for name, tier in self._tiers.items()}
+
+    def tier_stats(self, cache_type: str) -> dict[str, int]:
+        """获取单个缓存层的统计信息"""
+        return self._tier(cache_type).stats()
 
     # 清空所有缓存
     def clear_all(self) -> None:
-        self.hot_cache.clear()
-        self.session_cache.clear()
-        self.forever_cache.clear()
+        for tier in self._tiers.values():
+            tier.clear()
 
 
 # 全局唯一缓存实例（单例）
-global_cache = GlobalCache()
\ No newline at end of file
+global_cache = GlobalCache()
@@ -0,0 +1,46 @@
+import hashlib
+import json
+from typing import Any, Callable
+
+from utils.cache import CacheType, global_cache
+
+KEY_CHART = "chart" # 缓存键前缀
+
+
+def content_key(content: str) -> str:
+    """内联数据（如消息中的 JSON 文本）的内容摘要，作为没有 store_key 时的缓存键"""
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+
+def _config_hash(config: dict[str, Any]) -> str:
+    raw = json.dumps(config, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def cached_frame(store_key: str, config: dict[str, Any], builder: Callable[[], Any]) -> Any:
+    """按 store_key + 图表配置缓存变换后的 DataFrame，Streamlit 重新运行时直接复用
+    :param store_key: 数据存储键（或 content_key）
+    :param config: 影响变换结果的配置，如过滤年份、指标
+    :param builder: 未命中时构建 DataFrame 的函数
+    :return: DataFrame（只读，多个会话共享）
+    """
+    key = f"{KEY_CHART}:frame:{store_key}:{_config_hash(config)}"
+    # 多个会话同时渲染同一图表时只构建一次
+    return global_cache.get_or_compute(key, builder, CacheType.SESSION)
+
+
+def cached_figure(store_key: str, config: dict[str, Any], builder: Callable[[], Any]) -> dict[str, Any]:
+    """按 store_key + 图表配置缓存序列化后的 plotly 图表
+    :param store_key: 数据存储键（或 content_key）
+    :param config: 影响图表的配置
+    :param builder: 未命中时构建 plotly Figure 的函数
+    :return: 图表字典，可直接传给 st.plotly_chart
+    """
+    key = f"{KEY_CHART}:figure:{store_key}:{_config_hash(config)}"
+
+    def build_spec() -> str:
+        import plotly.io
+
+        return plotly.io.to_json(builder(), validate=False)
+
+    return json.loads(global_cache.get_or_compute(key, build_spec, CacheType.SESSION))
@@ -1,12 +1,138 @@
+import functools
+import os
+import time
+
 import streamlit as st
 import html
 
-def render_user_message(content):
-    st.markdown(f"""
+# 历史消息：完整渲染最近的消息条数、展开更早消息时每页条数，可按部署调整
+HISTORY_RECENT_MESSAGES = int(os.getenv("HISTORY_RECENT_MESSAGES", 10))
+HISTORY_PAGE_MESSAGES = int(os.getenv("HISTORY_PAGE_MESSAGES", 10))
+# 调试面板展示的最近轮数
+TRACE_PANEL_TURNS = int(os.getenv("TRACE_PANEL_TURNS", 5))
+
+
+@functools.lru_cache(maxsize=1024)
+def _user_message_html(content: str) -> str:
+    # 同一条消息在每次重新运行时生成的 HTML 相同，只转义、拼接一次
+    return f"""
     <div style="display: flex; justify-content: flex-end; align-items: flex-start; margin-bottom: 1rem;">
         <div style="background-color: #f0f2f6; color: #31333f; padding: 1rem; border-radius: 0.5rem; margin-right: 0.5rem; max-width: 70%; text-align: left;">
             <div style="white-space: pre-wrap;">{html.escape(content)}</div>
         </div>
         <div style="font-size: 1.5rem; line-height: 1.5;">👤</div>
     </div>
-    """, unsafe_allow_html=True)
\ No newline at end of file
+    """
+
+def render_user_message(content):
+    st.markdown(_user_message_html(content), unsafe_allow_html=True)
+
+
+def _set_history_page(state_key: str, page: int):
+    st.session_state[state_key] = page
+
+
+def render_history(messages: list[dict], render_message, key: str = "history", recent: int = None, page_size: int = None):
+    """增量渲染历史消息：只完整渲染最近 recent 条，更早的消息折叠为一行摘要，展开后按页渲染
+    每次重新运行最多渲染 recent + page_size 条消息，与会话长度无关
+    :param messages: 全部历史消息
+    :param render_message: 渲染单条消息的函数 render_message(msg)
+    :param key: 组件唯一标识
+    :param recent: 完整渲染的最近消息条数
+    :param page_size: 展开更早消息时每页条数
+    """
+    recent = HISTORY_RECENT_MESSAGES if recent is None else recent
+    page_size = page_size or HISTORY_PAGE_MESSAGES
+    folded = max(len(messages) - recent, 0) # 折叠的更早消息条数
+
+    if folded:
+        state_key = f"{key}_page"
+        page_count = (folded + page_size - 1) // page_size
+        page = min(st.session_state.get(state_key, 0), page_count) # 0 表示折叠，n 表示从新到旧第 n 页
+        if page == 0:
+            last_question = next((m["content"] for m in reversed(messages[:folded]) if m["role"] in ("user", "human")), "")
+            summary = f"已折叠 {folded} 条较早的消息"
+            if last_question:
+                summary += f"，最近一次提问：{last_question[:30]}"
+            st.caption(summary)
+            st.button("展开更早的消息", key=f"{key}_expand", on_click=_set_history_page, args=(state_key, 1))
+        else:
+            cols = st.columns(3)
+            cols[0].button("更早", key=f"{key}_older", disabled=page >= page_count, on_click=_set_history_page, args=(state_key, page + 1))
+            cols[1].button("更新", key=f"{key}_newer", disabled=page <= 1, on_click=_set_history_page, args=(state_key, page - 1))
+            cols[2].button("收起", key=f"{key}_fold", on_click=_set_history_page, args=(state_key, 0))
+            end = folded - (page - 1) * page_size
+            st.caption(f"更早的消息：第 {max(end - page_size, 0) + 1}-{end} 条（共 {folded} 条）")
+            for msg in messages[max(end - page_size, 0):end]:
+                render_message(msg)
+            st.divider()
+
+    for msg in messages[folded:]:
+        render_message(msg)
+
+def render_paged_table(key: str, fetch, page_size: int = None):
+    """分页显示表格，每次只获取并发送当前页
+    :param key: 组件唯一标识
+    :param fetch: 读取一页数据的函数 fetch(offset, limit) -> (当前页 DataFrame, 总行数)，如 payload_store.get_slice
+    :param page_size: 每页行数，默认使用全局渲染预算
+    """
+    from utils.downsample import default_budget
+
+    page_size = page_size or default_budget.table_page_rows
+    page_key = f"page_{key}"
+    page = max(int(st.session_state.get(page_key, 1)), 1)
+    page_df, total_rows = fetch((page - 1) * page_size, page_size)
+    page_count = max((total_rows + page_size - 1) // page_size, 1)
+    if page > page_count: # 数据变少（如过滤条件变化）时回到最后一页
+        page = page_count
+        st.session_state[page_key] = page
+        page_df, total_rows = fetch((page - 1) * page_size, page_size)
+
+    st.table(page_df)
+    if page_count > 1:
+        st.number_input(f"页码（共 {page_count} 页）", min_value=1, max_value=page_count, step=1, key=page_key)
+    st.caption(f"第 {page}/{page_count} 页，共 {total_rows:,} 行")
+
+
+def start_trace_turn() -> str:
+    """开始一轮对话的节点追踪
+    :return: turn_id，需放入运行配置的 configurable.turn_id，调试面板据此汇总本轮各节点的记录
+    """
+    from utils.tracing import new_turn_id
+
+    turn_id = new_turn_id()
+    turns = st.session_state.setdefault("trace_turns", [])
+    turns.append(turn_id)
+    del turns[:-TRACE_PANEL_TURNS]
+    return turn_id
+
+def render_trace_panel():
+    """侧边栏调试面板：最近几轮对话中每个节点的耗时、CPU 时间、内存峰值与输出大小"""
+    from utils.tracing import node_tracer
+
+    turns = st.session_state.get("trace_turns", [])
+    with st.sidebar.expander("🔍 节点耗时", expanded=False):
+        session_spans = []
+        for turn_id in reversed(turns):
+            spans = node_tracer.spans(turn_id=turn_id)
+            if not spans:
+                continue
+            session_spans = spans + session_spans
+            started = time.strftime("%H:%M:%S", time.localtime(spans[0].started_at))
+            st.markdown(f"**{started}** 共 {sum(span.wall_ms for span in spans):,.1f} ms")
+            st.dataframe([
+                {
+                    "节点": f"{span.graph}.{span.node}",
+                    "耗时(ms)": round(span.wall_ms, 1),
+                    "CPU(ms)": round(span.cpu_ms, 1),
+                    "内存峰值(KB)": round(span.peak_bytes / 1024, 1),
+                    "输出(KB)": round(span.output_bytes / 1024, 1),
+                    "异常": span.error,
+                }
+                for span in spans
+            ], hide_index=True)
+        if not session_spans:
+            st.caption("暂无记录")
+            return
+        st.download_button("导出 JSONL", node_tracer.to_jsonl(session_spans), file_name="agent_trace.jsonl", key="trace_jsonl")
+        st.download_button("导出 Prometheus 指标", node_tracer.to_prometheus(), file_name="agent_metrics.prom", key="trace_prometheus")
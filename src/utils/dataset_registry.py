@@ -0,0 +1,233 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, Optional
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from utils.cache import SingleFlight
+from utils.dataset_transform import medal_long
+from utils.payload_store import to_arrow_table
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# 数据目录 src/data
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+# 每个数据集（每个数据版本）缓存的过滤视图数量，超出时淘汰最久未使用的视图
+_MAX_VIEWS = 32
+
+
+@dataclass
+class _View:
+    """过滤视图，行格式与 DataFrame 按需生成"""
+    table: pa.Table
+    rows: Optional[list[dict[str, Any]]] = None
+    frame: Any = None
+
+
+@dataclass
+class _Dataset:
+    """已注册的数据集"""
+    loader: Callable[[], Any] # 加载函数，返回 list[dict] / DataFrame / Arrow Table
+    path: Optional[str | Callable[[], Optional[str]]] = None # 数据文件路径（或返回路径的函数），用于按修改时间失效
+    version: int = 0 # 数据版本（文件 mtime_ns），未加载时为 0
+    table: Optional[pa.Table] = None # 列式数据
+    rows: Optional[list[dict[str, Any]]] = None # 行格式数据，按需生成
+    views: OrderedDict[tuple, _View] = field(default_factory=OrderedDict) # 过滤视图（LRU，最多 _MAX_VIEWS 个）
+    source: Optional[str] = None # 投影的规范数据集名称，数据版本跟随规范数据集
+
+
+def load_json(path: str) -> list[dict[str, Any]]:
+    """读取 JSON 数据文件"""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_file(path: str) -> Any:
+    """按扩展名读取数据文件：.json / .csv / .parquet"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        from pyarrow import csv
+
+        return csv.read_csv(path)
+    if extension == ".parquet":
+        from pyarrow import parquet
+
+        return parquet.read_table(path)
+    return load_json(path)
+
+
+class DatasetRegistry:
+    """数据集注册表：每个数据集只加载一次，文件修改后自动重新加载，并缓存过滤视图"""
+
+    def __init__(self):
+        self._datasets: dict[str, _Dataset] = {}
+        self._lock = threading.RLock()
+        self._flights = SingleFlight() # 并发访问同一数据集时只加载、转换一次，不同数据集互不阻塞
+
+    def register(self, name: str, loader: Callable[[], Any], path: str | Callable[[], Optional[str]] = None) -> None:
+        """注册数据集
+        :param name: 数据集名称
+        :param loader: 加载函数
+        :param path: 数据文件路径，指定后文件修改时间变化会触发重新加载；也可传入函数，首次访问时再解析
+        """
+        with self._lock:
+            self._datasets[name] = _Dataset(loader=loader, path=path)
+
+    def register_json(self, name: str, file_name: str) -> None:
+        """注册 data 目录下的 JSON 数据集"""
+        path = os.path.join(DATA_DIR, file_name)
+        self.register(name, lambda: load_json(path), path)
+
+    def register_file(self, name: str, path: str) -> None:
+        """注册数据文件（.json / .csv / .parquet），相对路径基于 data 目录"""
+        path = os.path.join(DATA_DIR, path)
+        self.register(name, lambda: load_file(path), path)
+
+    def register_projection(self, name: str, source: str, transform: Callable[[pa.Table], pa.Table]) -> None:
+        """注册投影：由规范数据集变换得到的另一种形态（如宽表的长表形式），规范数据集更新后重新计算
+        :param name: 投影名称，与普通数据集一样通过 get/rows/view 访问
+        :param source: 规范数据集名称
+        :param transform: 变换函数，输入规范数据集的 Arrow Table
+        """
+        with self._lock:
+            self._datasets[name] = _Dataset(loader=lambda: transform(self.get(source)), source=source)
+
+    def names(self) -> list[str]:
+        """已注册的数据集名称"""
+        return list(self._datasets)
+
+    def _dataset(self, name: str) -> _Dataset:
+        """获取数据集，首次访问或文件已修改时加载"""
+        dataset = self._datasets[name]
+        if dataset.source:
+            version = self._dataset(dataset.source).version
+        else:
+            if callable(dataset.path):
+                dataset.path = dataset.path()
+            version = os.stat(dataset.path).st_mtime_ns if dataset.path else 1
+        if dataset.table is not None and dataset.version == version:
+            return dataset
+
+        def load():
+            if dataset.table is None or dataset.version != version:
+                table = to_arrow_table(dataset.loader())
+                with self._lock:
+                    dataset.table = table
+                    dataset.rows = None
+                    dataset.views = OrderedDict()
+                    dataset.version = version
+
+        self._flights.do((name, version), load)
+        return dataset
+
+    def version(self, name: str) -> int:
+        """数据版本号，数据文件变化后改变"""
+        return self._dataset(name).version
+
+    def get(self, name: str) -> pa.Table:
+        """获取列式数据（只读）"""
+        return self._dataset(name).table
+
+    def rows(self, name: str) -> list[dict[str, Any]]:
+        """获取行格式数据（只读，多个请求共享同一个列表）"""
+        dataset = self._dataset(name)
+        if dataset.rows is None:
+            def to_rows():
+                if dataset.rows is None:
+                    dataset.rows = dataset.table.to_pylist()
+
+            self._flights.do((name, dataset.version, "rows"), to_rows)
+        return dataset.rows
+
+    def _view(self, name: str, filters: dict[str, Any]) -> tuple[tuple, _View]:
+        """获取过滤视图：(单次计算的标识, 视图)
+        视图写入所属数据版本的 views，重新加载后旧版本的计算不会混入新版本
+        """
+        dataset = self._dataset(name)
+        view_key = tuple(sorted(filters.items()))
+        with self._lock:
+            version, table, views = dataset.version, dataset.table, dataset.views
+            view = views.get(view_key)
+            if view is not None:
+                views.move_to_end(view_key)
+        flight_key = (name, version, view_key)
+        if view is None:
+            def build():
+                with self._lock:
+                    if view_key in views:
+                        return views[view_key]
+                filtered = table
+                for column, value in view_key:
+                    filtered = filtered.filter(pc.field(column) == value)
+                built = _View(filtered)
+                with self._lock:
+                    views[view_key] = built
+                    while len(views) > _MAX_VIEWS:
+                        views.popitem(last=False)
+                return built
+
+            view = self._flights.do((*flight_key, "view"), build)
+        return flight_key, view
+
+    def view(self, name: str, **filters) -> pa.Table:
+        """获取按列等值过滤后的视图（如 barley 按年份），同一数据版本只计算一次
+        :param name: 数据集名称
+        :param filters: 列名=值
+        """
+        return self._view(name, filters)[1].table
+
+    def view_rows(self, name: str, **filters) -> list[dict[str, Any]]:
+        """获取过滤视图的行格式数据（只读），同一数据版本只转换一次"""
+        flight_key, view = self._view(name, filters)
+        if view.rows is not None:
+            return view.rows
+
+        def to_rows():
+            if view.rows is None:
+                view.rows = view.table.to_pylist()
+            return view.rows
+
+        return self._flights.do((*flight_key, "rows"), to_rows)
+
+    def view_frame(self, name: str, **filters) -> "pd.DataFrame":
+        """获取过滤视图的 DataFrame，同一数据版本只转换一次
+        注意：返回的 DataFrame 在多个会话之间共享，调用方只能读取，不能原地修改
+        """
+        flight_key, view = self._view(name, filters)
+        if view.frame is not None:
+            return view.frame
+
+        def to_frame():
+            if view.frame is None:
+                view.frame = view.table.to_pandas(split_blocks=True)
+            return view.frame
+
+        return self._flights.do((*flight_key, "frame"), to_frame)
+
+
+def _load_barley():
+    from vega_datasets import data
+
+    return data.barley()
+
+
+def _barley_path() -> Optional[str]:
+    from vega_datasets import data
+
+    return data.barley.filepath if data.barley.is_local else None
+
+
+# 全局唯一数据集注册表（单例）
+dataset_registry = DatasetRegistry()
+# 奖牌数据只保存一份规范表（宽表），宽/长两种形态都是它的投影
+dataset_registry.register_json("medal", "medal_width.json")
+dataset_registry.register_projection("medal_width", "medal", lambda table: table)
+dataset_registry.register_projection("medal_long", "medal", medal_long)
+dataset_registry.register_json("medal_list", "medal_list.json")
+dataset_registry.register("barley", _load_barley, _barley_path)
@@ -0,0 +1,39 @@
+"""数据集投影：由一张规范列式表派生不同形态（如宽表 → 长表），配合 DatasetRegistry.register_projection 使用
+
+派生结果随规范表的数据版本缓存，前端与智能体按需取用，不再分别存储、读取两份相同的数据。
+"""
+from typing import Sequence
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+MEDAL_DIMENSIONS = ["年份", "国家"]
+MEDAL_TYPES = ["金牌", "银牌", "铜牌"]
+
+
+def unpivot(table: pa.Table, id_columns: Sequence[str], value_columns: Sequence[str],
+            names_to: str, values_to: str) -> pa.Table:
+    """宽表转长表（与 DataFrame.melt 相同，但行按原行号排列：每行展开为连续的 len(value_columns) 行）
+    :param table: 宽表
+    :param id_columns: 保留的维度列
+    :param value_columns: 展开的指标列，需类型兼容
+    :param names_to: 存放指标名的列（字典编码）
+    :param values_to: 存放指标值的列
+    :return: 长表
+    """
+    rows, width = table.num_rows, len(value_columns)
+    row_ids = np.repeat(np.arange(rows), width)
+    value_ids = np.tile(np.arange(width), rows)
+
+    columns = {name: pc.take(table.column(name), pa.array(row_ids)) for name in id_columns}
+    columns[names_to] = pa.DictionaryArray.from_arrays(pa.array(value_ids, pa.int32()), pa.array(list(value_columns)))
+    # 指标列首尾相接后按 列号 * 行数 + 行号 取值，保留空值
+    values = pa.concat_arrays([table.column(name).combine_chunks() for name in value_columns])
+    columns[values_to] = pc.take(values, pa.array(value_ids * rows + row_ids))
+    return pa.table(columns)
+
+
+def medal_long(table: pa.Table) -> pa.Table:
+    """奖牌宽表（年份, 国家, 金牌, 银牌, 铜牌）转长表（年份, 国家, 奖牌, 数量）"""
+    return unpivot(table, MEDAL_DIMENSIONS, MEDAL_TYPES, "奖牌", "数量")
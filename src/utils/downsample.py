@@ -0,0 +1,164 @@
+"""图表渲染前的服务端降采样
+
+按图表类型和像素预算裁剪数据，避免把全部行发送到浏览器：
+折线图用 LTTB 保留形状，柱状图保留前 N 个类别并把其余合并为“其他”。
+数据量未超过预算时原样返回。
+"""
+import os
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Sequence
+
+import numpy as np
+
+from utils.aggregate import group_by, top_n
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+OTHER_LABEL = "其他"
+
+
+@dataclass
+class PixelBudget:
+    """渲染预算"""
+    width_px: int = 1200 # 图表绘图区宽度（像素）
+    min_bar_px: int = 6 # 每根柱子的最小宽度（像素）
+    table_page_rows: int = 50 # 表格每页行数
+
+    @property
+    def max_line_points(self) -> int:
+        """每条折线最多保留的点数：一个像素一个点"""
+        return self.width_px
+
+    def max_bars(self, series: int = 1) -> int:
+        """柱状图最多保留的类别数（分组柱状图按系列数分摊宽度）"""
+        return max(self.width_px // (self.min_bar_px * max(series, 1)), 1)
+
+
+@dataclass
+class RenderData:
+    """降采样结果"""
+    frame: "pd.DataFrame" # 用于渲染的数据
+    original_rows: int # 原始行数
+    reduced: bool = False # 是否做过降采样/截断
+    note: str = "" # 展示给用户的说明
+
+    @property
+    def nbytes(self) -> int:
+        """数据占用字节数（供缓存按字节预算淘汰）"""
+        return int(self.frame.memory_usage(deep=True).sum())
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets 降采样
+    :param x: 横坐标（已排序，数值或时间）
+    :param y: 纵坐标
+    :param threshold: 保留的点数
+    :return: 保留点的下标（升序）
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # 首尾点固定保留，中间 n-2 个点平均分为 threshold-2 个桶
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    prev = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # 下一个桶的均值点（最后一个桶用终点）
+        next_start, next_end = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        # 当前桶中与前一选中点、下一桶均值点组成三角形面积最大的点
+        area = np.abs((x[prev] - avg_x) * (y[start:end] - y[prev]) - (x[prev] - x[start:end]) * (avg_y - y[prev]))
+        prev = start + int(np.argmax(area))
+        selected[i + 1] = prev
+    return selected
+
+
+def downsample_line(df: "pd.DataFrame", x: str, y: str, color: str = None, budget: PixelBudget = None) -> RenderData:
+    """折线图降采样：每条折线（按 color 分组）分别做 LTTB"""
+    budget = budget or default_budget
+    threshold = budget.max_line_points
+    if len(df) <= threshold:
+        return RenderData(df, len(df))
+
+    groups = [df] if color is None else [g for _, g in df.groupby(color, sort=False, observed=True)]
+    parts = []
+    for part in groups:
+        part = part.sort_values(x, kind="stable")
+        x_values = part[x].to_numpy()
+        if np.issubdtype(x_values.dtype, np.datetime64):
+            x_values = x_values.astype("datetime64[ns]").astype(np.int64)
+        parts.append(part.iloc[lttb(x_values, part[y].to_numpy(), threshold)])
+
+    import pandas as pd
+
+    frame = pd.concat(parts, ignore_index=True)
+    if len(frame) == len(df):
+        return RenderData(df, len(df))
+    return RenderData(frame, len(df), True, f"共 {len(df):,} 个点，已按 LTTB 降采样为 {len(frame):,} 个点")
+
+
+def truncate_bars(df: "pd.DataFrame", category: str, value: str | Sequence[str], color: str = None,
+                  budget: PixelBudget = None, other_label: Any = OTHER_LABEL) -> RenderData:
+    """柱状图截断：按数值总和保留前 N 个类别，其余类别合并为 other_label
+    :param df: 数据
+    :param category: 类别列（x 轴）
+    :param value: 数值列，宽表可传多列（多指标分组柱状图）
+    :param color: 系列列（同一类别下的多根柱子），None 表示单系列
+    :param budget: 渲染预算
+    :param other_label: 合并后的类别名，None 表示直接丢弃其余类别
+    """
+    budget = budget or default_budget
+    values = [value] if isinstance(value, str) else list(value)
+    series = (df[color].nunique() if color else 1) * len(values)
+    max_bars = budget.max_bars(series)
+    n_categories = df[category].nunique()
+    if n_categories <= max_bars:
+        return RenderData(df, len(df))
+
+    keep = max(max_bars - (1 if other_label is not None else 0), 1)
+    ranking = df.assign(_total=df[values].sum(axis=1)) if len(values) > 1 else df.assign(_total=df[values[0]])
+    top = top_n(ranking, category, "_total", keep, other_label=None)[category]
+    labels = df[category].astype(object).where(df[category].isin(top), other_label)
+    frame = df.assign(**{category: labels}).dropna(subset=[category])
+
+    # 按（类别, 系列）聚合，每根柱子只保留一行
+    keys = [category] + ([color] if color else [])
+    merged = None
+    for column in values:
+        part = group_by(frame, keys, column)
+        merged = part if merged is None else merged.merge(part, on=keys)
+    note = f"共 {n_categories:,} 个{category}，仅展示前 {keep} 个"
+    if other_label is not None:
+        note += f"，其余合并为“{other_label}”"
+    return RenderData(merged, len(df), True, note)
+
+
+def prepare_chart(df: "pd.DataFrame", chart_type: str, x: str, y: str | Sequence[str], color: str = None,
+                  budget: PixelBudget = None) -> RenderData:
+    """渲染流水线入口：按图表类型选择降采样方式
+    :param chart_type: line / bar，其他类型原样返回
+    """
+    if chart_type == "line":
+        return downsample_line(df, x, y, color, budget)
+    if chart_type == "bar":
+        return truncate_bars(df, x, y, color, budget)
+    return RenderData(df, len(df))
+
+
+def _default_budget() -> PixelBudget:
+    return PixelBudget(
+        width_px=int(os.getenv("CHART_WIDTH_PX", 1200)),
+        min_bar_px=int(os.getenv("CHART_MIN_BAR_PX", 6)),
+        table_page_rows=int(os.getenv("TABLE_PAGE_ROWS", 50)),
+    )
+
+
+# 全局默认渲染预算，可通过环境变量按部署调整
+default_budget = _default_budget()
@@ -0,0 +1,219 @@
+"""OpenAI 兼容的模拟 LLM 服务（用于压测与本地调试，不需要真实模型）
+
+支持 /v1/chat/completions（流式与非流式）与 /v1/models，回答前可带 <think> 推理块，
+首 token 延迟与每秒 token 数可配置。默认监听 openai_agent 的默认地址：
+
+    PYTHONPATH=src python -m utils.llm_stub [--port 1234] [--latency 0.2] [--tps 50] [--tokens 120] [--think-tokens 30]
+
+每个 token 为一个字符（中文一个字即一个 token），回答内容由最后一条用户消息生成，相同问题回答相同。
+"""
+import argparse
+import json
+import os
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Iterator
+
+
+@dataclass
+class StubConfig:
+    """模拟服务的行为配置"""
+    latency: float = float(os.getenv("LLM_STUB_LATENCY", 0.2)) # 首 token 延迟（秒）
+    tps: float = float(os.getenv("LLM_STUB_TPS", 50)) # 每秒输出 token 数，0 表示不限速
+    tokens: int = int(os.getenv("LLM_STUB_TOKENS", 120)) # 回答 token 数（不含推理块）
+    think_tokens: int = int(os.getenv("LLM_STUB_THINK_TOKENS", 30)) # <think> 推理块 token 数，0 表示不输出
+    model: str = os.getenv("LLM_STUB_MODEL", "stub-model")
+
+
+def _last_user_content(messages: list[dict[str, Any]]) -> str:
+    for message in reversed(messages or []):
+        if message.get("role") == "user":
+            content = message.get("content", "")
+            if isinstance(content, list):
+                content = "".join(part.get("text", "") for part in content if isinstance(part, dict))
+            return content
+    return ""
+
+
+def reply_tokens(question: str, config: StubConfig) -> list[str]:
+    """生成回答的 token 序列：<think> 推理块 + 回答正文"""
+    think = ""
+    if config.think_tokens:
+        think = ("让我想一想" * config.think_tokens)[:config.think_tokens]
+        think = f"<think>{think}</think>\n"
+    answer = f"这是对「{question.strip()[:20]}」的模拟回答。"
+    answer = (answer * (config.tokens // max(len(answer), 1) + 1))[:config.tokens]
+    # 标签整体作为 token 输出会掩盖流式过滤的问题，这里逐字符拆分
+    return list(think) + list(answer)
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # 保持连接，客户端连接池可复用
+    server: "StubServer"
+
+    def log_message(self, format: str, *args) -> None: # 压测时不逐条打印访问日志
+        pass
+
+    def _send_json(self, status: int, body: dict[str, Any]) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _write_chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": self.server.config.model, "object": "model", "owned_by": "stub"}]})
+        else:
+            self._send_json(404, {"error": {"message": f"未知路径：{self.path}"}})
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"未知路径：{self.path}"}})
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        config = self.server.config
+        tokens = reply_tokens(_last_user_content(body.get("messages")), config)
+        if body.get("max_tokens") or body.get("max_completion_tokens"):
+            tokens = tokens[:body.get("max_completion_tokens") or body["max_tokens"]]
+        self.server.track(1)
+        try:
+            if body.get("stream"):
+                self._stream(body, tokens, config)
+            else:
+                self._complete(body, tokens, config)
+        finally:
+            self.server.track(-1)
+
+    @staticmethod
+    def _paced(tokens: list[str], config: StubConfig) -> Iterator[str]:
+        """按首 token 延迟与 tps 节奏产出 token（按计划时间等待，避免累计误差）"""
+        start = time.perf_counter() + config.latency
+        for i, token in enumerate(tokens):
+            due = start + (i / config.tps if config.tps else 0)
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            yield token
+
+    def _usage(self, body: dict[str, Any], tokens: list[str]) -> dict[str, int]:
+        prompt_tokens = sum(len(str(m.get("content", ""))) for m in body.get("messages", []))
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens), "total_tokens": prompt_tokens + len(tokens)}
+
+    def _complete(self, body: dict[str, Any], tokens: list[str], config: StubConfig) -> None:
+        content = "".join(self._paced(tokens, config))
+        self._send_json(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model") or config.model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": self._usage(body, tokens),
+        })
+
+    def _stream(self, body: dict[str, Any], tokens: list[str], config: StubConfig) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        chunk_id, created = f"chatcmpl-{uuid.uuid4().hex}", int(time.time())
+        model = body.get("model") or config.model
+
+        def event(delta: dict[str, Any], finish_reason: str = None, **extra) -> None:
+            payload = {
+                "id": chunk_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if delta is not None else [],
+                **extra,
+            }
+            self._write_chunk(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8"))
+
+        try:
+            event({"role": "assistant", "content": ""})
+            for token in self._paced(tokens, config):
+                event({"content": token})
+            event({}, "stop")
+            if (body.get("stream_options") or {}).get("include_usage"):
+                event(None, usage=self._usage(body, tokens))
+            self._write_chunk(b"data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True # 客户端中途取消
+
+
+class StubServer(ThreadingHTTPServer):
+    """模拟服务：每个连接一个线程，统计请求数与并发数"""
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], config: StubConfig = None):
+        super().__init__(address, _StubHandler)
+        self.config = config or StubConfig()
+        self.requests = 0
+        self.active = 0
+        self.peak_active = 0
+        self._lock = threading.Lock()
+
+    def track(self, delta: int) -> None:
+        with self._lock:
+            self.active += delta
+            if delta > 0:
+                self.requests += 1
+                self.peak_active = max(self.peak_active, self.active)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def stats(self) -> dict[str, int]:
+        return {"requests": self.requests, "active": self.active, "peak_active": self.peak_active}
+
+
+def start_stub(host: str = "127.0.0.1", port: int = 0, config: StubConfig = None) -> StubServer:
+    """在后台线程启动模拟服务
+    :param port: 端口，0 表示随机端口（通过 server.base_url 获取地址）
+    :return: 服务实例，用完调用 shutdown()
+    """
+    server = StubServer((host, port), config)
+    threading.Thread(target=server.serve_forever, name="llm-stub", daemon=True).start()
+    return server
+
+
+def main():
+    defaults = StubConfig()
+    parser = argparse.ArgumentParser(description="OpenAI 兼容的模拟 LLM 服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1234)
+    parser.add_argument("--latency", type=float, default=defaults.latency, help="首 token 延迟（秒）")
+    parser.add_argument("--tps", type=float, default=defaults.tps, help="每秒输出 token 数，0 表示不限速")
+    parser.add_argument("--tokens", type=int, default=defaults.tokens, help="回答 token 数")
+    parser.add_argument("--think-tokens", type=int, default=defaults.think_tokens, help="<think> 推理块 token 数")
+    parser.add_argument("--model", default=defaults.model)
+    args = parser.parse_args()
+
+    config = StubConfig(args.latency, args.tps, args.tokens, args.think_tokens, args.model)
+    server = StubServer((args.host, args.port), config)
+    print(f"模拟 LLM 服务已启动：{server.base_url} {asdict(config)}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+import hashlib
+import json
+import os
+import stat as stat_mode
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable
+
+import pyarrow as pa
+
+# Arrow 文件 schema 元数据中记录原始缓存键，用于按 store_key 建立索引
+_KEY_METADATA = b"cache_key"
+
+_ARROW_SUFFIX = ".arrow"
+_JSON_SUFFIX = ".json"
+
+_MISSING = object()
+
+# 超出字节预算时淘汰到预算的该比例，留出余量，避免目录满载后每次写入都扫描目录
+_LOW_WATERMARK = 0.9
+
+# stats() 返回的目录大小为估算值，距上次扫描超过该时间（秒）时重新扫描，以计入其他进程的写入
+_STATS_REFRESH_SECONDS = 30
+
+
+def private_dir(name: str) -> str:
+    """默认的缓存目录：系统临时目录下按用户区分的子目录"""
+    user = os.getuid() if hasattr(os, "getuid") else os.getenv("USERNAME", "user")
+    return os.path.join(tempfile.gettempdir(), f"{name}-{user}")
+
+
+def ensure_private_dir(path: str) -> None:
+    """创建仅当前用户可访问的目录（0700）；已存在的目录必须是属于当前用户的真实目录，否则拒绝使用
+    :raise PermissionError: 路径是符号链接或目录属于其他用户
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.lstat(path)
+    if not stat_mode.S_ISDIR(info.st_mode):
+        raise PermissionError(f"缓存目录 {path} 不是目录（可能是符号链接），拒绝使用")
+    if hasattr(os, "getuid"):
+        if info.st_uid != os.getuid():
+            raise PermissionError(f"缓存目录 {path} 属于其他用户，拒绝使用")
+        if info.st_mode & 0o077:
+            os.chmod(path, 0o700)
+
+
+class MmapTier:
+    """基于内存映射文件的缓存层，同一节点上的多个 Streamlit 进程共享数据载荷
+
+    - 列式载荷（Arrow Table 或带 table 属性的对象）写为 Arrow IPC 文件，读取时直接 mmap，零拷贝
+    - 其他值（如载荷别名）需可 JSON 序列化，以 JSON 文件保存；不使用 pickle，读取目录中的文件不会执行代码
+    - 文件名为缓存键的哈希，即按 store_key 的索引；写入采用临时文件 + 原子替换，读写无需跨进程锁
+    - 目录权限为 0700，且必须属于当前用户，否则拒绝使用
+    """
+
+    def __init__(self, name: str, root_dir: str, max_bytes: int, ttl: int = 36000, open_handles: int = 64,
+                 wrap: Callable[[str, pa.Table], Any] = None, cleanup_every: int = 64):
+        """
+        :param name: 缓存层名称
+        :param root_dir: 数据文件目录，同一节点的各进程需配置为同一目录（以同一用户运行）
+        :param max_bytes: 目录总字节预算，超出时按修改时间淘汰最旧文件
+        :param ttl: 文件有效期（秒）
+        :param open_handles: 本进程保留的已映射载荷数量
+        :param wrap: 读取 Arrow 文件后的包装函数 wrap(缓存键, table)，默认直接返回 table
+        :param cleanup_every: 每写入多少次扫描一次目录清理过期文件；本进程估算的目录大小超出预算时立即清理
+        """
+        self.name = name
+        self.root_dir = root_dir
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.open_handles = open_handles
+        self.wrap = wrap or (lambda key, table: table)
+        self.cleanup_every = cleanup_every
+        ensure_private_dir(root_dir)
+
+        self._lock = threading.Lock()
+        self._handles: OrderedDict[str, tuple[int, Any]] = OrderedDict() # 路径 -> (mtime_ns, 值)
+        self._stats = {"hits": 0, "misses": 0, "sets": 0, "rejected": 0, "evictions": 0, "expirations": 0}
+        # 上次扫描时的目录大小/文件数 + 此后本进程写入的字节数/文件数；首次写入时扫描目录
+        self._approx_bytes = 0
+        self._approx_entries = 0
+        self._writes = cleanup_every
+        self._scanned_at = 0.0 # 上次扫描时间，0 表示尚未扫描
+
+    def _path(self, key: Any, suffix: str) -> str:
+        digest = hashlib.sha1(str(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.root_dir, digest + suffix)
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._stats[name] += n
+
+    def set(self, key: Any, value: Any) -> bool:
+        """写入缓存文件
+        :return: 是否写入成功，超过目录预算的值返回 False
+        """
+        table = value if isinstance(value, pa.Table) else getattr(value, "table", None)
+        if isinstance(table, pa.Table):
+            metadata = dict(table.schema.metadata or {})
+            metadata[_KEY_METADATA] = str(key).encode("utf-8")
+            table = table.replace_schema_metadata(metadata)
+            path, stale = self._path(key, _ARROW_SUFFIX), self._path(key, _JSON_SUFFIX)
+            writer = lambda f: self._write_arrow(f, table)
+        else:
+            try:
+                data = json.dumps(value, ensure_ascii=False).encode("utf-8")
+            except (TypeError, ValueError):
+                self._count("rejected") # 不可 JSON 序列化的值不写入共享目录
+                return False
+            path, stale = self._path(key, _JSON_SUFFIX), self._path(key, _ARROW_SUFFIX)
+            writer = lambda f: f.write(data)
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.root_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                writer(f)
+            size = os.path.getsize(tmp_path)
+            if size > self.max_bytes:
+                os.remove(tmp_path)
+                self._remove(path)
+                self._count("rejected")
+                return False
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._remove(stale)
+        with self._lock:
+            self._stats["sets"] += 1
+            self._writes += 1
+            self._approx_bytes += size
+            self._approx_entries += 1
+            due = self._writes >= self.cleanup_every or self._approx_bytes > self.max_bytes
+        if due:
+            self._cleanup()
+        return True
+
+    @staticmethod
+    def _write_arrow(f, table: pa.Table) -> None:
+        with pa.ipc.new_file(f, table.schema) as writer:
+            writer.write_table(table)
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        for suffix in (_ARROW_SUFFIX, _JSON_SUFFIX):
+            path = self._path(key, suffix)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if time.time() - stat.st_mtime > self.ttl:
+                self._remove(path)
+                self._count("expirations")
+                break
+            value = self._load(path, str(key), stat.st_mtime_ns)
+            if value is _MISSING:
+                break
+            self._count("hits")
+            return value
+        self._count("misses")
+        return default
+
+    def _load(self, path: str, key: str, mtime_ns: int) -> Any:
+        """读取文件，已映射且未被替换的文件直接复用
+        :return: 缓存值；文件在 stat 之后被其他进程删除、替换或尚未写完时返回 _MISSING（按未命中处理）
+        """
+        with self._lock:
+            cached = self._handles.get(path)
+            if cached and cached[0] == mtime_ns:
+                self._handles.move_to_end(path)
+                return cached[1]
+
+        try:
+            if path.endswith(_ARROW_SUFFIX):
+                source = pa.memory_map(path, "r")
+                table = pa.ipc.open_file(source).read_all()
+                value = self.wrap(key, table)
+            else:
+                with open(path, "rb") as f:
+                    value = json.loads(f.read().decode("utf-8"))
+        except (OSError, pa.ArrowInvalid, ValueError):
+            return _MISSING
+
+        with self._lock:
+            self._handles[path] = (mtime_ns, value)
+            self._handles.move_to_end(path)
+            while len(self._handles) > self.open_handles:
+                self._handles.popitem(last=False)
+        return value
+
+    def _remove(self, path: str) -> None:
+        with self._lock:
+            self._handles.pop(path, None)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _files(self) -> list[tuple[str, os.stat_result]]:
+        files = []
+        for entry in os.scandir(self.root_dir):
+            if entry.name.endswith((_ARROW_SUFFIX, _JSON_SUFFIX)):
+                try:
+                    files.append((entry.path, entry.stat()))
+                except FileNotFoundError:
+                    pass # 其他进程已删除
+        return files
+
+    def _cleanup(self) -> None:
+        """清理过期文件；超出字节预算时按修改时间淘汰最旧文件，直到低于预算的 _LOW_WATERMARK"""
+        now = time.time()
+        files = []
+        for path, stat in self._files():
+            if now - stat.st_mtime > self.ttl:
+                self._remove(path)
+                self._count("expirations")
+            else:
+                files.append((path, stat))
+        total, entries = sum(stat.st_size for _, stat in files), len(files)
+        if total > self.max_bytes:
+            for path, stat in sorted(files, key=lambda item: item[1].st_mtime):
+                if total <= self.max_bytes * _LOW_WATERMARK:
+                    break
+                self._remove(path)
+                total -= stat.st_size
+                entries -= 1
+                self._count("evictions")
+        with self._lock:
+            self._writes = 0
+            self._approx_bytes = total
+            self._approx_entries = entries
+            self._scanned_at = time.monotonic()
+
+    def keys(self) -> list[str]:
+        """列出目录中的 Arrow 载荷缓存键（JSON 文件不记录原始键）"""
+        result = []
+        for path, _ in self._files():
+            if not path.endswith(_ARROW_SUFFIX):
+                continue
+            try:
+                metadata = pa.ipc.open_file(pa.memory_map(path, "r")).schema.metadata or {}
+            except (FileNotFoundError, pa.ArrowInvalid):
+                continue
+            if _KEY_METADATA in metadata:
+                result.append(metadata[_KEY_METADATA].decode("utf-8"))
+        return result
+
+    def delete(self, key: Any) -> None:
+        self._remove(self._path(key, _ARROW_SUFFIX))
+        self._remove(self._path(key, _JSON_SUFFIX))
+
+    def clear(self) -> None:
+        for path, _ in self._files():
+            self._remove(path)
+
+    def stats(self, exact: bool = False) -> dict[str, int]:
+        """统计信息：命中等计数为本进程视角，entries/bytes 为目录全局视角
+        :param exact: 是否扫描目录得到精确的 entries/bytes（O(文件数)，供调试面板使用）；
+            默认返回上次扫描后本进程维护的估算值，交付决策等热路径不扫描目录，估算值每 _STATS_REFRESH_SECONDS 秒刷新一次
+        """
+        if exact:
+            files = self._files()
+            entries, total = len(files), sum(stat.st_size for _, stat in files)
+        else:
+            with self._lock:
+                stale = not self._scanned_at or time.monotonic() - self._scanned_at > _STATS_REFRESH_SECONDS
+            if stale:
+                self._cleanup()
+            with self._lock:
+                entries, total = self._approx_entries, self._approx_bytes
+        with self._lock:
+            result = dict(self._stats)
+        result["entries"] = entries
+        result["bytes"] = total
+        result["max_bytes"] = self.max_bytes
+        return result
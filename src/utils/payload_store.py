@@ -0,0 +1,396 @@
+import contextlib
+import hashlib
+import os
+import threading
+import weakref
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Optional, Sequence
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from utils.cache import CacheType, GlobalCache, global_cache
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# 字符串列去重比例低于该阈值时做字典编码（重复的国家、品种等维度值只存一份）
+_DICTIONARY_RATIO = 0.5
+
+# 每个载荷缓存的过滤/排序视图（行号索引）数量
+_MAX_SLICE_VIEWS = 8
+
+# 过滤条件：{列名: 值}（列表/元组/集合表示 in），或直接传入 Arrow 表达式
+SliceFilter = dict[str, Any] | pc.Expression
+# 排序条件："列名" / "-列名"（降序）/ [("列名", "ascending" | "descending"), ...]
+SliceSort = str | Sequence[str | tuple[str, str]]
+
+
+def to_arrow_table(data: Any) -> pa.Table:
+    """将 list[dict] / DataFrame / Arrow Table 统一转换为列式 Arrow Table
+    :param data: 原始数据
+    :return: Arrow Table，低基数字符串列做字典编码
+    """
+    if isinstance(data, pa.Table):
+        table = data
+    elif hasattr(data, "to_dict") and hasattr(data, "columns"): # pandas DataFrame，避免为类型判断导入 pandas
+        table = pa.Table.from_pandas(data, preserve_index=False)
+    else:
+        table = pa.Table.from_pylist(list(data or []))
+
+    for i, col_field in enumerate(table.schema):
+        if not (pa.types.is_string(col_field.type) or pa.types.is_large_string(col_field.type)):
+            continue
+        column = table.column(i)
+        if len(column) and pc.count_distinct(column).as_py() <= len(column) * _DICTIONARY_RATIO:
+            table = table.set_column(i, col_field.name, pc.dictionary_encode(column))
+    return table
+
+
+def _hash_array(h: "hashlib._Hash", array: pa.Array) -> None:
+    h.update(f"{array.type}|{len(array)}|{array.offset}|{array.null_count}".encode("utf-8"))
+    for buffer in array.buffers():
+        h.update(b"-" if buffer is None else memoryview(buffer))
+    if pa.types.is_dictionary(array.type):
+        _hash_array(h, array.dictionary)
+
+
+def content_hash(table: pa.Table) -> str:
+    """数据内容摘要：直接对列缓冲区计算，不序列化
+    分块方式不同的相同数据可能得到不同摘要（只影响去重率，不影响正确性）
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str(table.schema).encode("utf-8"))
+    for column in table.columns:
+        h.update(f"#{column.num_chunks}".encode("utf-8"))
+        for chunk in column.chunks:
+            _hash_array(h, chunk)
+    return h.hexdigest()
+
+
+def table_schema(table: pa.Table) -> dict[str, str]:
+    """获取表结构：{列名: 类型}，字典编码列返回其值类型"""
+    schema = {}
+    for col_field in table.schema:
+        col_type = col_field.type.value_type if pa.types.is_dictionary(col_field.type) else col_field.type
+        schema[col_field.name] = str(col_type)
+    return schema
+
+
+def _filter_expression(filter: SliceFilter) -> pc.Expression:
+    if isinstance(filter, pc.Expression):
+        return filter
+    expression = None
+    for column, value in filter.items():
+        condition = pc.field(column).isin(list(value)) if isinstance(value, (list, tuple, set)) else pc.field(column) == value
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def _sort_keys(sort: SliceSort) -> list[tuple[str, str]]:
+    keys = []
+    for key in ([sort] if isinstance(sort, str) else sort):
+        if isinstance(key, str):
+            key = (key[1:], "descending") if key.startswith("-") else (key, "ascending")
+        keys.append(tuple(key))
+    return keys
+
+
+@dataclass
+class PayloadSlice:
+    """分页读取结果"""
+    table: pa.Table # 当前窗口的数据
+    offset: int # 窗口起始行（过滤、排序后的行号）
+    total_rows: int # 过滤后的总行数
+
+    def to_frame(self) -> "pd.DataFrame":
+        """转换为 DataFrame，行索引从 offset 开始"""
+        df = self.table.to_pandas()
+        df.index = df.index + self.offset
+        return df
+
+    def to_rows(self) -> list[dict[str, Any]]:
+        return self.table.to_pylist()
+
+
+class ColumnarPayload:
+    """列式数据载荷：数据以 Arrow 列缓冲区保存，DataFrame 视图仅在首次访问时构建一次"""
+
+    def __init__(self, store_key: str, table: pa.Table):
+        self.store_key = store_key
+        self.table = table
+        self._frame: Optional["pd.DataFrame"] = None
+        self._views: OrderedDict[tuple, pa.Array] = OrderedDict() # (过滤, 排序) -> 行号索引
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        """列缓冲区占用字节数（供缓存按字节预算淘汰）"""
+        return self.table.nbytes
+
+    @property
+    def row_count(self) -> int:
+        return self.table.num_rows
+
+    @property
+    def schema(self) -> dict[str, str]:
+        return table_schema(self.table)
+
+    def to_frame(self) -> "pd.DataFrame":
+        """获取 DataFrame 视图（数值列零拷贝共享 Arrow 缓冲区）
+        注意：返回的 DataFrame 在多个会话之间共享，调用方只能读取，不能原地修改
+        """
+        if self._frame is None:
+            with self._lock:
+                if self._frame is None:
+                    self._frame = self.table.to_pandas(split_blocks=True)
+        return self._frame
+
+    def to_rows(self) -> list[dict[str, Any]]:
+        """转换回 list[dict]，仅用于需要行格式的场景（如 local 模式内联数据）"""
+        return self.table.to_pylist()
+
+    def _view_indices(self, filter: Optional[SliceFilter], sort: Optional[SliceSort]) -> Optional[pa.Array]:
+        """过滤、排序后的行号索引，同一条件只计算一次；无条件时返回 None（直接按行号切片）"""
+        if not filter and not sort:
+            return None
+        view_key = (str(_filter_expression(filter)) if filter else None, tuple(_sort_keys(sort)) if sort else None)
+        with self._lock:
+            indices = self._views.get(view_key)
+            if indices is not None:
+                self._views.move_to_end(view_key)
+                return indices
+
+        if filter:
+            mask = _filter_expression(filter)
+            table = self.table.append_column("__row", pa.array(range(self.table.num_rows), pa.int64())).filter(mask)
+            rows = table.column("__row")
+        else:
+            table, rows = self.table, None
+        if sort:
+            keys = _sort_keys(sort)
+            # 字典编码列不支持直接排序，仅解码排序键列
+            sort_table = pa.table({
+                name: table.column(name).cast(table.schema.field(name).type.value_type)
+                if pa.types.is_dictionary(table.schema.field(name).type) else table.column(name)
+                for name, _ in keys
+            })
+            order = pc.sort_indices(sort_table, sort_keys=keys)
+            indices = rows.take(order) if rows is not None else order
+        else:
+            indices = rows
+        indices = indices.combine_chunks() if isinstance(indices, pa.ChunkedArray) else indices
+
+        with self._lock:
+            self._views[view_key] = indices
+            while len(self._views) > _MAX_SLICE_VIEWS:
+                self._views.popitem(last=False)
+        return indices
+
+    def slice(self, offset: int = 0, limit: int = 50, columns: Sequence[str] = None,
+              sort: SliceSort = None, filter: SliceFilter = None) -> PayloadSlice:
+        """按窗口读取数据，只物化当前窗口的行和列
+        :param offset: 起始行（过滤、排序后的行号）
+        :param limit: 行数
+        :param columns: 需要的列，默认全部
+        :param sort: 排序条件
+        :param filter: 过滤条件
+        """
+        offset = max(offset, 0)
+        table = self.table.select(list(columns)) if columns else self.table
+        indices = self._view_indices(filter, sort)
+        if indices is None:
+            return PayloadSlice(table.slice(offset, limit), offset, table.num_rows)
+        return PayloadSlice(table.take(indices.slice(offset, limit)), offset, len(indices))
+
+
+class PayloadStore:
+    """memory 模式的数据载荷存储：载荷按内容摘要保存，store_key 只是指向内容的别名
+
+    相同数据（如多个用户的同一个问题）只保存一份列缓冲区，共享 DataFrame 视图与分页索引。
+    进程内缓存层按别名计数引用：别名被删除、淘汰或过期时减少引用，最后一个别名删除时才删除内容。
+    共享/磁盘层（MmapTier）的别名可能由其他进程创建，不计数也不主动删除内容，交由有效期与字节预算淘汰。
+    """
+
+    def __init__(self, cache: GlobalCache, cache_type: str = CacheType.HOT):
+        """
+        :param cache: 底层缓存
+        :param cache_type: 使用的缓存层
+        """
+        self.cache = cache
+        self.cache_type = cache_type
+        self._refs: dict[str, set[str]] = {} # 内容摘要 -> 引用它的 store_key（只包含仍在缓存中的别名）
+        self._evicted: deque[tuple[str, str]] = deque() # 已被淘汰、尚未减少引用的 (store_key, 摘要)
+        self._digests: dict[int, tuple[weakref.ref, str]] = {} # id(table) -> (弱引用, 摘要)，同一个表对象只计算一次摘要
+        self._lock = threading.Lock()
+        self._counted = cache.add_eviction_listener(cache_type, self._on_evict) # 是否按别名计数引用
+
+    @staticmethod
+    def cache_key(store_key: str) -> str:
+        """别名的缓存键，值为内容摘要"""
+        return f"{CacheType.KEY_PAYLOAD_DATA}:{store_key}"
+
+    @staticmethod
+    def content_key(digest: str) -> str:
+        """内容的缓存键，值为列式数据载荷"""
+        return f"{CacheType.KEY_PAYLOAD_DATA}:content:{digest}"
+
+    def _digest(self, table: pa.Table) -> str:
+        with self._lock:
+            memo = self._digests.get(id(table))
+        if memo is not None and memo[0]() is table:
+            return memo[1]
+        digest = content_hash(table)
+        table_id = id(table)
+        with self._lock:
+            self._digests[table_id] = (weakref.ref(table, lambda _: self._digests.pop(table_id, None)), digest)
+        return digest
+
+    def _on_evict(self, key: Any, value: Any) -> None:
+        """缓存层淘汰/过期回调（在分片锁内调用）：只记录被淘汰的别名，下次操作时再减少引用"""
+        prefix = self.cache_key("")
+        if isinstance(key, str) and key.startswith(prefix) and not key.startswith(self.content_key("")):
+            self._evicted.append((key[len(prefix):], value))
+
+    def _drain(self) -> None:
+        """处理已被淘汰的别名（调用方持有锁）"""
+        while self._evicted:
+            store_key, digest = self._evicted.popleft()
+            if self.cache.get(self.cache_key(store_key), self.cache_type) == digest:
+                continue # 淘汰后又被重新写入
+            self._release(store_key, digest)
+
+    def _guard(self):
+        """计数引用时，检查内容、写入别名、增加引用在同一把锁内完成，避免并发删除刚被引用的内容"""
+        return self._lock if self._counted else contextlib.nullcontext()
+
+    def put(self, store_key: str, data: Any) -> ColumnarPayload:
+        """写入数据载荷，内容已存在时只增加别名
+        :param store_key: 存储键
+        :param data: list[dict] / DataFrame / Arrow Table
+        :return: 列式数据载荷（相同内容的各个 store_key 共享同一个对象）
+        """
+        table = data.table if isinstance(data, ColumnarPayload) else to_arrow_table(data)
+        digest = self._digest(table)
+        content_key = self.content_key(digest)
+        with self._guard():
+            payload = self.cache.get(content_key, self.cache_type)
+            if payload is None:
+                payload = data if isinstance(data, ColumnarPayload) else ColumnarPayload(f"content:{digest}", table)
+                self.cache.set(content_key, payload, self.cache_type)
+
+            previous = self.cache.get(self.cache_key(store_key), self.cache_type)
+            self.cache.set(self.cache_key(store_key), digest, self.cache_type)
+            if self._counted:
+                self._drain()
+                if previous and previous != digest:
+                    self._release(store_key, previous)
+                self._refs.setdefault(digest, set()).add(store_key)
+        return payload
+
+    def get(self, store_key: str) -> Optional[ColumnarPayload]:
+        """获取数据载荷，不存在时返回 None"""
+        digest = self.cache.get(self.cache_key(store_key), self.cache_type)
+        if digest is None:
+            return None
+        return self.cache.get(self.content_key(digest), self.cache_type)
+
+    def get_frame(self, store_key: str) -> Optional["pd.DataFrame"]:
+        """获取只读的 DataFrame 视图，不存在时返回 None"""
+        payload = self.get(store_key)
+        return payload.to_frame() if payload is not None else None
+
+    def get_slice(self, store_key: str, offset: int = 0, limit: int = 50, columns: Sequence[str] = None,
+                  sort: SliceSort = None, filter: SliceFilter = None) -> Optional[PayloadSlice]:
+        """分页读取数据载荷，不存在时返回 None
+        :param store_key: 存储键
+        :param offset: 起始行（过滤、排序后的行号）
+        :param limit: 行数
+        :param columns: 需要的列，默认全部
+        :param sort: 排序条件，如 "-数量" 或 [("年份", "ascending"), ("数量", "descending")]
+        :param filter: 过滤条件，如 {"年份": 2024, "国家": ["中国", "美国"]}
+        """
+        payload = self.get(store_key)
+        return payload.slice(offset, limit, columns, sort, filter) if payload is not None else None
+
+    def _release(self, store_key: str, digest: str) -> None:
+        """移除别名对内容的引用，已无引用时删除内容（调用方持有锁）"""
+        keys = self._refs.get(digest)
+        if keys is None or store_key not in keys:
+            return
+        keys.discard(store_key)
+        if not keys:
+            del self._refs[digest]
+            self.cache.delete(self.content_key(digest), self.cache_type)
+
+    def delete(self, store_key: str) -> None:
+        """删除别名；计数引用时最后一个别名删除后同时删除内容"""
+        with self._guard():
+            digest = self.cache.get(self.cache_key(store_key), self.cache_type)
+            self.cache.delete(self.cache_key(store_key), self.cache_type)
+            if self._counted:
+                self._drain()
+                if digest is not None:
+                    self._release(store_key, digest)
+
+    def has_content(self, data: Any) -> bool:
+        """相同内容是否已在缓存中（再次写入只增加别名，不占用额外空间）"""
+        table = data.table if isinstance(data, ColumnarPayload) else to_arrow_table(data)
+        return self.cache.get(self.content_key(self._digest(table)), self.cache_type) is not None
+
+    def usage(self) -> tuple[int, int]:
+        """缓存层占用：(已用字节数, 字节预算)"""
+        stats = self.cache.tier_stats(self.cache_type)
+        return stats.get("bytes", 0), stats.get("max_bytes", 0)
+
+    def ref_count(self, store_key: str) -> int:
+        """与 store_key 共享同一内容、仍在缓存中的别名数（共享/磁盘层不计数，返回 0）"""
+        if not self._counted:
+            return 0
+        with self._lock:
+            self._drain()
+            digest = self.cache.get(self.cache_key(store_key), self.cache_type)
+            return len(self._refs.get(digest, ())) if digest is not None else 0
+
+
+def _create_payload_store() -> PayloadStore:
+    """创建载荷存储，PAYLOAD_CACHE_TYPE=shared 时使用内存映射文件在同一节点的多进程间共享"""
+    cache_type = os.getenv("PAYLOAD_CACHE_TYPE", CacheType.HOT)
+    if cache_type == CacheType.SHARED:
+        from utils.mmap_cache import MmapTier, private_dir
+
+        root_dir = os.getenv("PAYLOAD_SHARED_DIR") or private_dir("streamlit-demo-payload")
+        max_bytes = int(float(os.getenv("PAYLOAD_SHARED_MB", 2048)) * 1024 * 1024)
+        global_cache.register_tier(
+            CacheType.SHARED,
+            MmapTier(CacheType.SHARED, root_dir, max_bytes, wrap=lambda key, table: ColumnarPayload(key.split(":", 1)[-1], table)),
+        )
+    return PayloadStore(global_cache, cache_type)
+
+
+# 全局唯一载荷存储实例（单例）
+payload_store = _create_payload_store()
+
+_spill_store: Optional[PayloadStore] = None
+_spill_lock = threading.Lock()
+
+
+def get_spill_store() -> PayloadStore:
+    """获取溢出存储：超大载荷写为磁盘上的 Arrow 文件，读取时内存映射，不占用进程内缓存
+    目录与容量由环境变量 PAYLOAD_SPILL_DIR、PAYLOAD_SPILL_MB（默认 4096MB）配置，首次使用时创建
+    """
+    global _spill_store
+    if _spill_store is None:
+        with _spill_lock:
+            if _spill_store is None:
+                from utils.mmap_cache import MmapTier, private_dir
+
+                root_dir = os.getenv("PAYLOAD_SPILL_DIR") or private_dir("streamlit-demo-spill")
+                max_bytes = int(float(os.getenv("PAYLOAD_SPILL_MB", 4096)) * 1024 * 1024)
+                global_cache.register_tier(
+                    CacheType.SPILL,
+                    MmapTier(CacheType.SPILL, root_dir, max_bytes, wrap=lambda key, table: ColumnarPayload(key.split(":", 1)[-1], table)),
+                )
+                _spill_store = PayloadStore(global_cache, CacheType.SPILL)
+    return _spill_store
@@ -0,0 +1,286 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+import pyarrow as pa
+
+from utils.cache import CacheType, global_cache
+from utils.dataset_registry import DatasetRegistry, dataset_registry
+from utils.payload_store import to_arrow_table
+
+KEY_SQL = "sql" # 缓存键前缀
+
+SQL_MAX_ROWS = int(os.getenv("SQL_MAX_ROWS", 10000)) # 单次查询返回的最大行数，超出部分截断
+SQL_TIMEOUT = float(os.getenv("SQL_TIMEOUT", 10)) # 单次查询最长执行时间（秒）
+
+# 词法单元：字符串、带引号的标识符、注释、空白、其他
+_TOKEN_PATTERN = re.compile(
+    r"(?P<string>'(?:[^']|'')*')"
+    r"|(?P<quoted>\"(?:[^\"]|\"\")*\"|`[^`]*`|\[[^\]]*\])"
+    r"|(?P<comment>--[^\n]*|/\*.*?(?:\*/|$))"
+    r"|(?P<space>\s+)"
+    r"|(?P<word>[^\s'\"`\[\-/]+|[\-/])",
+    re.S,
+)
+
+# 查询期间允许的操作：只读
+_READ_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE}
+
+
+class SqlError(ValueError):
+    """SQL 不合法或执行失败"""
+
+
+def normalize_sql(sql: str) -> str:
+    """规范化 SQL 作为缓存键：去掉注释和末尾分号，合并空白，引号外的内容转小写
+    :param sql: 原始 SQL
+    :return: 规范化后的 SQL，字符串常量与带引号的标识符保持原样
+    """
+    parts = []
+    for match in _TOKEN_PATTERN.finditer(sql):
+        kind, text = match.lastgroup, match.group()
+        if kind in ("comment", "space"):
+            if parts and parts[-1] != " ":
+                parts.append(" ")
+        elif kind == "word":
+            parts.append(text.lower())
+        else:
+            parts.append(text)
+    normalized = "".join(parts).strip()
+    while normalized.endswith(";"):
+        normalized = normalized[:-1].rstrip()
+    return normalized
+
+
+def _identifiers(normalized: str) -> set[str]:
+    """SQL 中出现的标识符（小写，去掉引号），用于找出引用的数据集"""
+    names = set()
+    for match in _TOKEN_PATTERN.finditer(normalized):
+        kind, text = match.lastgroup, match.group()
+        if kind == "quoted":
+            names.add(text[1:-1].replace('""', '"').lower())
+        elif kind == "word":
+            names.update(re.findall(r"\w+", text))
+    return names
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _sqlite_type(data_type: pa.DataType) -> str:
+    if pa.types.is_dictionary(data_type):
+        data_type = data_type.value_type
+    if pa.types.is_integer(data_type) or pa.types.is_boolean(data_type):
+        return "INTEGER"
+    if pa.types.is_floating(data_type) or pa.types.is_decimal(data_type):
+        return "REAL"
+    return "TEXT"
+
+
+def _value_type(data_type: pa.DataType) -> pa.DataType:
+    return data_type.value_type if pa.types.is_dictionary(data_type) else data_type
+
+
+def _result_column(values: list[Any], source_type: Optional[pa.DataType]) -> pa.Array:
+    """结果列转 Arrow：SQLite 是动态类型，同一列可能混合整数与字符串（如 CASE ... THEN '多' ELSE 0 END），
+    此时整列转为字符串；全为空值（含空结果）时沿用源表同名列的类型
+    """
+    if all(value is None for value in values):
+        return pa.array(values, type=source_type or pa.null())
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.array([None if value is None else str(value) for value in values], pa.string())
+
+
+def _sqlite_column(column: pa.ChunkedArray) -> list[Any]:
+    """转换为 sqlite3 可绑定的值：日期时间转 ISO 字符串，其余保持 Python 原生类型"""
+    if pa.types.is_temporal(column.type):
+        return [None if value is None else value.isoformat() for value in column.to_pylist()]
+    return column.to_pylist()
+
+
+@dataclass
+class QueryResult:
+    """查询结果"""
+    key: str # 结果缓存键（规范化 SQL + 数据版本的摘要），可作为 store_key
+    sql: str # 规范化后的 SQL
+    table: pa.Table # 结果数据（只读，多个请求共享）
+    versions: dict[str, int] = field(default_factory=dict) # 引用的数据集及其数据版本
+    truncated: bool = False # 结果超过 SQL_MAX_ROWS 被截断
+    elapsed_ms: float = 0.0 # 执行耗时（命中缓存时为首次执行的耗时）
+
+    @property
+    def nbytes(self) -> int:
+        """结果占用字节数（供缓存按字节预算淘汰）"""
+        return self.table.nbytes
+
+    @property
+    def row_count(self) -> int:
+        return self.table.num_rows
+
+
+class SqlEngine:
+    """嵌入式 SQL 引擎：在内存 SQLite 中查询 dataset_registry 的数据集
+
+    数据集按需导入（首次被查询引用时），数据版本变化后重新导入；过滤、聚合在引擎内完成，
+    只返回结果行。结果按 规范化 SQL + 引用数据集的版本 缓存，数据更新后自动失效。
+    查询只允许读操作，所有请求共享一个连接并串行执行。
+    """
+
+    def __init__(self, registry: DatasetRegistry = None, cache_type: str = CacheType.HOT,
+                 max_rows: int = None, timeout: float = None):
+        """
+        :param registry: 数据集注册表，默认为全局注册表
+        :param cache_type: 结果缓存层
+        :param max_rows: 单次查询返回的最大行数，默认读取环境变量 SQL_MAX_ROWS
+        :param timeout: 单次查询最长执行时间（秒），默认读取环境变量 SQL_TIMEOUT
+        """
+        self.registry = registry or dataset_registry
+        self.cache_type = cache_type
+        self.max_rows = max_rows or SQL_MAX_ROWS
+        self.timeout = timeout or SQL_TIMEOUT
+        self._conn = sqlite3.connect(":memory:", check_same_thread=False)
+        self._loaded: dict[str, int] = {} # 已导入的数据集 -> 数据版本
+        self._lock = threading.Lock()
+
+    def datasets(self) -> list[str]:
+        return self.registry.names()
+
+    def referenced(self, sql: str) -> list[str]:
+        """SQL 引用的已注册数据集"""
+        names = _identifiers(normalize_sql(sql))
+        return [name for name in self.datasets() if name.lower() in names]
+
+    def describe(self, names: list[str] = None) -> str:
+        """数据集的表结构说明（供模型生成 SQL），未能加载的数据集跳过
+        :param names: 数据集名称，默认全部
+        """
+        lines = []
+        for name in names or self.datasets():
+            try:
+                table = self.registry.get(name)
+            except (OSError, ValueError) as e:
+                print(f"数据集 {name} 加载失败，跳过：{e}")
+                continue
+            columns = ", ".join(f"{col.name} {_sqlite_type(col.type)}" for col in table.schema)
+            lines.append(f"{name}({columns}) -- {table.num_rows} 行")
+        return "\n".join(lines)
+
+    def _load(self, name: str, version: int) -> None:
+        """导入（或重新导入）数据集，维度列建索引以便等值过滤走索引"""
+        table = self.registry.get(name)
+        columns = ", ".join(f"{_quote(col.name)} {_sqlite_type(col.type)}" for col in table.schema)
+        placeholders = ", ".join("?" * table.num_columns)
+        with self._conn:
+            self._conn.execute(f"DROP TABLE IF EXISTS {_quote(name)}")
+            self._conn.execute(f"CREATE TABLE {_quote(name)} ({columns})")
+            if table.num_columns:
+                rows = zip(*(_sqlite_column(column) for column in table.columns))
+                self._conn.executemany(f"INSERT INTO {_quote(name)} VALUES ({placeholders})", rows)
+            for col in table.schema:
+                if pa.types.is_dictionary(col.type): # to_arrow_table 只对低基数字符串列做字典编码
+                    self._conn.execute(f"CREATE INDEX {_quote(f'{name}_{col.name}')} ON {_quote(name)} ({_quote(col.name)})")
+        self._loaded[name] = version
+        print(f"数据集 {name} 已导入 SQL 引擎：{table.num_rows} 行")
+
+    @staticmethod
+    def _authorize(action: int, *args) -> int:
+        return sqlite3.SQLITE_OK if action in _READ_ACTIONS else sqlite3.SQLITE_DENY
+
+    def _ensure_loaded(self, versions: dict[str, int]) -> None:
+        """导入数据版本已变化的数据集（调用方持有锁）"""
+        for name, version in versions.items():
+            if self._loaded.get(name) != version:
+                self._load(name, version)
+
+    def _source_types(self, names: list[str]) -> dict[str, pa.DataType]:
+        """引用的数据集的列类型（同名列以先出现的为准），用于推断空结果列的类型"""
+        types = {}
+        for name in names:
+            for col in self.registry.get(name).schema:
+                types.setdefault(col.name, _value_type(col.type))
+        return types
+
+    def _execute(self, sql: str, params: tuple, source_types: dict[str, pa.DataType] = None) -> tuple[pa.Table, bool]:
+        deadline = time.monotonic() + self.timeout
+        self._conn.set_authorizer(self._authorize)
+        self._conn.set_progress_handler(lambda: int(time.monotonic() > deadline), 10000)
+        try:
+            cursor = self._conn.execute(sql, params)
+            rows = cursor.fetchmany(self.max_rows + 1)
+        finally:
+            self._conn.set_authorizer(None)
+            self._conn.set_progress_handler(None, 0)
+        truncated = len(rows) > self.max_rows
+        columns = [description[0] for description in cursor.description or []]
+        source_types = source_types or {}
+        arrays = [_result_column([row[i] for row in rows[:self.max_rows]], source_types.get(name)) for i, name in enumerate(columns)]
+        return to_arrow_table(pa.Table.from_arrays(arrays, names=columns)), truncated
+
+    def _check(self, sql: str) -> tuple[str, dict[str, int]]:
+        """规范化 SQL 并找出引用的数据集：(规范化 SQL, {数据集: 数据版本})"""
+        normalized = normalize_sql(sql)
+        if not re.match(r"(select|with)\b", normalized):
+            raise SqlError("只支持 SELECT / WITH 查询")
+        versions = {}
+        for name in self.referenced(normalized):
+            try:
+                versions[name] = self.registry.version(name)
+            except (OSError, ValueError) as e: # 已注册但数据文件缺失或无法解析
+                raise SqlError(f"数据集 {name} 不可用") from e
+        return normalized, versions
+
+    def validate(self, sql: str, params: tuple = ()) -> str:
+        """检查 SQL 是否为单条可编译的只读查询（只编译，不执行）
+        :return: 规范化后的 SQL
+        :raise SqlError: 不是查询语句、语法错误、引用了不存在的表或包含多条语句
+        """
+        normalized, versions = self._check(sql)
+        with self._lock:
+            self._ensure_loaded(versions)
+            self._conn.set_authorizer(self._authorize)
+            try:
+                self._conn.execute(f"EXPLAIN {normalized}", params)
+            except sqlite3.Error as e:
+                raise SqlError(f"SQL 不合法：{e}") from e
+            finally:
+                self._conn.set_authorizer(None)
+        return normalized
+
+    def query(self, sql: str, params: tuple = (), use_cache: bool = True) -> QueryResult:
+        """执行只读查询
+        :param sql: SELECT / WITH 查询语句（单条）
+        :param params: 绑定参数
+        :param use_cache: 是否使用结果缓存
+        :return: 查询结果
+        """
+        normalized, versions = self._check(sql)
+
+        raw = repr((normalized, params, sorted(versions.items()), self.max_rows))
+        key = f"{KEY_SQL}:{hashlib.sha1(raw.encode('utf-8')).hexdigest()}"
+
+        def execute() -> QueryResult:
+            start = time.perf_counter()
+            with self._lock:
+                self._ensure_loaded(versions)
+                try:
+                    table, truncated = self._execute(normalized, params, self._source_types(list(versions)))
+                except sqlite3.Error as e:
+                    raise SqlError(f"SQL 执行失败：{e}") from e
+            return QueryResult(key, normalized, table, versions, truncated, (time.perf_counter() - start) * 1000)
+
+        if not use_cache:
+            return execute()
+        # 并发的相同查询只执行一次，其余请求等待并共享结果
+        return global_cache.get_or_compute(key, execute, self.cache_type)
+
+
+# 全局唯一 SQL 引擎（单例）
+sql_engine = SqlEngine()
@@ -0,0 +1,255 @@
+"""图节点追踪
+
+包装图节点函数，记录每次执行的耗时、CPU 时间、内存分配峰值和输出大小，
+导出为 Prometheus 文本格式或 JSONL 日志，并按轮次（turn_id）汇总供调试面板展示。
+
+- CPU 时间按线程统计（time.thread_time），异步节点在 await 期间同一线程上运行的其他协程也会计入，仅供参考
+- 内存峰值依赖 tracemalloc，开销较大，默认关闭（TRACE_MEMORY=1 开启）；
+  tracemalloc 的峰值是进程级的，多个节点并发执行时互相影响
+"""
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Optional
+
+from utils.cache import estimate_size
+
+TRACE_ENABLED = os.getenv("TRACE_ENABLED", "1") == "1"
+TRACE_MEMORY = os.getenv("TRACE_MEMORY", "0") == "1" # 是否用 tracemalloc 统计内存分配峰值
+TRACE_LOG_PATH = os.getenv("TRACE_LOG_PATH", "") # JSONL 日志路径，为空时不写日志
+TRACE_MAX_SPANS = int(os.getenv("TRACE_MAX_SPANS", 2000)) # 内存中保留的最近记录条数
+
+# 耗时直方图的分桶上界（秒）
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# 估算输出大小时大列表的采样条数
+_SIZE_SAMPLE_COUNT = 100
+
+
+def output_size(value: Any) -> int:
+    """估算节点输出的字节数：文本按 UTF-8 计，消息计内容与附件，大列表按前 N 条采样外推"""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    if isinstance(value, (int, float, bool)) or value is None:
+        return 8
+    if isinstance(value, dict):
+        return sum(output_size(k) + output_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        if not value:
+            return 0
+        sample = value[:_SIZE_SAMPLE_COUNT]
+        return sum(output_size(item) for item in sample) * len(value) // len(sample)
+    if hasattr(value, "content") and hasattr(value, "additional_kwargs"): # LangChain 消息
+        return output_size(value.content) + output_size(value.additional_kwargs)
+    return estimate_size(value)
+
+
+def _run_context() -> tuple[str, str]:
+    """从 LangGraph 运行配置中获取 (thread_id, turn_id)，不在图中运行时返回空值"""
+    try:
+        from langgraph.config import get_config
+
+        configurable = get_config().get("configurable", {})
+    except Exception:
+        return "", ""
+    return str(configurable.get("thread_id") or ""), str(configurable.get("turn_id") or "")
+
+
+@dataclass
+class NodeSpan:
+    """一次节点执行的记录"""
+    graph: str
+    node: str
+    thread_id: str
+    turn_id: str
+    started_at: float # 开始时间（Unix 时间戳）
+    wall_ms: float
+    cpu_ms: float
+    peak_bytes: int # 执行期间新增内存分配的峰值，未开启 tracemalloc 时为 0
+    output_bytes: int
+    error: str = ""
+
+
+@dataclass
+class _NodeStats:
+    calls: int = 0
+    errors: int = 0
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    output_bytes: int = 0
+    peak_bytes: int = 0
+    buckets: list = None
+
+    def __post_init__(self):
+        if self.buckets is None:
+            self.buckets = [0] * len(DURATION_BUCKETS)
+
+
+class NodeTracer:
+    """节点追踪器（线程安全）：保留最近的执行记录，并按 (图, 节点) 累计指标"""
+
+    def __init__(self, enabled: bool = TRACE_ENABLED, trace_memory: bool = TRACE_MEMORY,
+                 log_path: str = TRACE_LOG_PATH, max_spans: int = TRACE_MAX_SPANS):
+        """
+        :param enabled: 是否记录，关闭后包装函数直接调用原函数
+        :param trace_memory: 是否用 tracemalloc 统计内存分配峰值
+        :param log_path: JSONL 日志路径，为空时不写日志
+        :param max_spans: 内存中保留的最近记录条数
+        """
+        self.enabled = enabled
+        self.trace_memory = trace_memory
+        self.log_path = log_path
+        self._spans: deque[NodeSpan] = deque(maxlen=max_spans)
+        self._stats: dict[tuple[str, str], _NodeStats] = {}
+        self._lock = threading.Lock()
+
+    def _start(self) -> tuple[float, float, int]:
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        else:
+            base = 0
+        return time.perf_counter(), time.thread_time(), base
+
+    def _finish(self, graph: str, node: str, start: tuple[float, float, int], output: Any, error: str) -> None:
+        wall = time.perf_counter() - start[0]
+        cpu = time.thread_time() - start[1]
+        peak = max(tracemalloc.get_traced_memory()[1] - start[2], 0) if self.trace_memory and tracemalloc.is_tracing() else 0
+        thread_id, turn_id = _run_context()
+        span = NodeSpan(
+            graph=graph,
+            node=node,
+            thread_id=thread_id,
+            turn_id=turn_id,
+            started_at=time.time() - wall,
+            wall_ms=wall * 1000,
+            cpu_ms=cpu * 1000,
+            peak_bytes=peak,
+            output_bytes=output_size(output) if output is not None else 0,
+            error=error,
+        )
+        self.record(span)
+
+    def record(self, span: NodeSpan) -> None:
+        """保存一条执行记录，配置了日志路径时追加写入 JSONL"""
+        with self._lock:
+            self._spans.append(span)
+            stats = self._stats.setdefault((span.graph, span.node), _NodeStats())
+            stats.calls += 1
+            stats.errors += 1 if span.error else 0
+            stats.wall_seconds += span.wall_ms / 1000
+            stats.cpu_seconds += span.cpu_ms / 1000
+            stats.output_bytes += span.output_bytes
+            stats.peak_bytes = max(stats.peak_bytes, span.peak_bytes)
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if span.wall_ms / 1000 <= bound:
+                    stats.buckets[i] += 1
+            if self.log_path:
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(asdict(span), ensure_ascii=False) + "\n")
+
+    def wrap(self, graph: str, node: str, func: Callable) -> Callable:
+        """包装图节点函数（同步或异步），保留原函数签名（LangGraph 按签名注入 config 等参数）
+        :param graph: 图名称
+        :param node: 节点名称
+        :param func: 节点函数
+        :return: 包装后的节点函数
+        """
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return await func(*args, **kwargs)
+                start, output, error = self._start(), None, ""
+                try:
+                    output = await func(*args, **kwargs)
+                    return output
+                except Exception as e:
+                    error = type(e).__name__
+                    raise
+                finally:
+                    self._finish(graph, node, start, output, error)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not self.enabled:
+                return func(*args, **kwargs)
+            start, output, error = self._start(), None, ""
+            try:
+                output = func(*args, **kwargs)
+                return output
+            except Exception as e:
+                error = type(e).__name__
+                raise
+            finally:
+                self._finish(graph, node, start, output, error)
+        return wrapper
+
+    def spans(self, turn_id: Optional[str] = None, thread_id: Optional[str] = None) -> list[NodeSpan]:
+        """最近的执行记录，可按轮次或会话线程过滤"""
+        with self._lock:
+            spans = list(self._spans)
+        if turn_id is not None:
+            spans = [span for span in spans if span.turn_id == turn_id]
+        if thread_id is not None:
+            spans = [span for span in spans if span.thread_id == thread_id]
+        return spans
+
+    def to_jsonl(self, spans: Optional[list[NodeSpan]] = None) -> str:
+        """导出执行记录为 JSONL 文本，默认导出内存中的全部记录"""
+        spans = self.spans() if spans is None else spans
+        return "".join(json.dumps(asdict(span), ensure_ascii=False) + "\n" for span in spans)
+
+    def to_prometheus(self, prefix: str = "agent_node") -> str:
+        """导出累计指标为 Prometheus 文本格式"""
+        with self._lock:
+            items = sorted((key, _NodeStats(**asdict(stats))) for key, stats in self._stats.items())
+        lines = [
+            f"# HELP {prefix}_duration_seconds 节点执行耗时",
+            f"# TYPE {prefix}_duration_seconds histogram",
+        ]
+        for (graph, node), stats in items:
+            labels = f'graph="{graph}",node="{node}"'
+            for bound, count in zip(DURATION_BUCKETS, stats.buckets):
+                lines.append(f'{prefix}_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'{prefix}_duration_seconds_bucket{{{labels},le="+Inf"}} {stats.calls}')
+            lines.append(f"{prefix}_duration_seconds_sum{{{labels}}} {stats.wall_seconds:.6f}")
+            lines.append(f"{prefix}_duration_seconds_count{{{labels}}} {stats.calls}")
+        metrics = [
+            ("cpu_seconds_total", "counter", "节点 CPU 时间", lambda s: f"{s.cpu_seconds:.6f}"),
+            ("output_bytes_total", "counter", "节点输出字节数", lambda s: s.output_bytes),
+            ("peak_alloc_bytes", "gauge", "节点内存分配峰值（需开启 TRACE_MEMORY）", lambda s: s.peak_bytes),
+            ("errors_total", "counter", "节点异常次数", lambda s: s.errors),
+        ]
+        for name, metric_type, help_text, value in metrics:
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {metric_type}")
+            for (graph, node), stats in items:
+                lines.append(f'{prefix}_{name}{{graph="{graph}",node="{node}"}} {value(stats)}')
+        return "\n".join(lines) + "\n"
+
+    def clear(self) -> None:
+        with self._lock:
+            self._spans.clear()
+            self._stats.clear()
+
+
+def new_turn_id() -> str:
+    """生成一轮对话的 ID，随运行配置的 configurable.turn_id 传入图，用于按轮次汇总节点记录"""
+    return uuid.uuid4().hex
+
+
+# 全局唯一节点追踪器（单例）
+node_tracer = NodeTracer()
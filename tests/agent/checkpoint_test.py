@@ -0,0 +1,136 @@
+import asyncio
+import os
+import tempfile
+from unittest import TestCase
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.graph import StateGraph, MessagesState, START, END
+
+from agent.checkpoint import CompactingMemorySaver, SqliteCheckpointSaver, thread_inputs
+
+
+def build_echo_graph(checkpointer):
+    def echo(state: MessagesState):
+        return {"messages": [AIMessage(content=f"第 {len(state['messages'])} 条：{state['messages'][-1].content}")]}
+
+    graph = StateGraph(MessagesState)
+    graph.add_node("echo", echo)
+    graph.add_edge(START, "echo")
+    graph.add_edge("echo", END)
+    return graph.compile(checkpointer=checkpointer)
+
+
+def chat(graph, thread_id: str, turns: int) -> list:
+    config = {"configurable": {"thread_id": thread_id}}
+    state = None
+    for i in range(turns):
+        # 每轮只发送新消息，历史由检查点按 thread_id 恢复
+        state = graph.invoke({"messages": [HumanMessage(content=f"问题{i}")]}, config=config)
+    return state["messages"]
+
+
+class TestCheckpoint(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "checkpoint.db")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_sqlite_resume_by_thread(self):
+        saver = SqliteCheckpointSaver(self.path, keep_last=2)
+        self.assertEqual(saver.conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        messages = chat(build_echo_graph(saver), "t1", 3)
+        self.assertEqual([m.content for m in messages[-2:]], ["问题2", "第 5 条：问题2"])
+        self.assertTrue(saver.has_thread("t1"))
+        self.assertFalse(saver.has_thread("t2"))
+        saver.close()
+
+        # 重新打开文件后继续同一线程
+        saver = SqliteCheckpointSaver(self.path, keep_last=2)
+        messages = chat(build_echo_graph(saver), "t1", 1)
+        self.assertEqual(len(messages), 8)
+        saver.close()
+
+    def test_sqlite_compaction(self):
+        saver = SqliteCheckpointSaver(self.path, keep_last=2)
+        graph = build_echo_graph(saver)
+        chat(graph, "t1", 10)
+        config = {"configurable": {"thread_id": "t1"}}
+        self.assertLessEqual(len(list(saver.list(config))), 4)
+        # 压缩后最新状态完整
+        self.assertEqual(len(graph.get_state(config).values["messages"]), 20)
+        # 每个通道只保留被剩余检查点引用的版本
+        blob_count = saver.conn.execute("SELECT COUNT(*) FROM blobs WHERE channel = 'messages'").fetchone()[0]
+        self.assertLessEqual(blob_count, 4)
+
+        saver.prune(["t1"])
+        self.assertEqual(len(list(saver.list(config))), 1)
+        self.assertEqual(len(graph.get_state(config).values["messages"]), 20)
+        saver.delete_thread("t1")
+        self.assertIsNone(saver.get_tuple(config))
+        saver.close()
+
+    def test_sqlite_async(self):
+        saver = SqliteCheckpointSaver(":memory:")
+        graph = build_echo_graph(saver)
+        config = {"configurable": {"thread_id": "t1"}}
+
+        async def run():
+            await graph.ainvoke({"messages": [HumanMessage(content="a")]}, config=config)
+            return await graph.ainvoke({"messages": [HumanMessage(content="b")]}, config=config)
+
+        self.assertEqual(len(asyncio.run(run())["messages"]), 4)
+
+    def test_sqlite_async_does_not_block_loop(self):
+        import time
+        from unittest.mock import patch
+
+        saver = SqliteCheckpointSaver(":memory:")
+        graph = build_echo_graph(saver)
+        config = {"configurable": {"thread_id": "t1"}}
+        put = saver.put
+
+        def slow_put(*args, **kwargs):
+            time.sleep(0.1) # 模拟慢写入
+            return put(*args, **kwargs)
+
+        async def run():
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+
+            task = asyncio.create_task(ticker())
+            await graph.ainvoke({"messages": [HumanMessage(content="a")]}, config=config)
+            task.cancel()
+            return ticks
+
+        with patch.object(saver, "put", side_effect=slow_put):
+            # 写入期间事件循环仍在调度其他任务
+            self.assertGreater(asyncio.run(run()), 5)
+
+    def test_memory_compaction_and_eviction(self):
+        saver = CompactingMemorySaver(keep_last=2, max_threads=2)
+        graph = build_echo_graph(saver)
+        chat(graph, "t1", 10)
+        self.assertLessEqual(len(saver.storage["t1"][""]), 4)
+        self.assertEqual(len(chat(graph, "t1", 1)), 22)
+
+        chat(graph, "t2", 1)
+        chat(graph, "t3", 1) # 超出线程上限，淘汰最久未访问的 t1
+        self.assertFalse(saver.has_thread("t1"))
+        self.assertTrue(saver.has_thread("t3"))
+        self.assertFalse(any(key[0] == "t1" for key in saver.blobs))
+
+    def test_thread_inputs(self):
+        saver = CompactingMemorySaver()
+        history = [{"role": "user", "content": "a"}, {"role": "assistant", "content": "b"}, {"role": "user", "content": "c"}]
+        # 线程尚无状态（首轮或已被淘汰）时发送完整历史
+        self.assertEqual(thread_inputs(history, "t1", saver), history)
+        build_echo_graph(saver).invoke({"messages": history[:1]}, config={"configurable": {"thread_id": "t1"}})
+        self.assertEqual(thread_inputs(history, "t1", saver), history[-1:])
@@ -5,7 +5,7 @@ import uuid
 from langchain_core.messages import HumanMessage
 
 from agent.data_agent import graph2
-from agent.barley_agent import graph1
+from agent.graph_registry import graph_registry
 
 
 class TestAgent(TestCase):
@@ -34,11 +34,26 @@ class TestAgent(TestCase):
         #for message in result_state.get("messages", []):
         #    message.pretty_print()
         
-        for chunk in graph1.stream({"messages": [HumanMessage(content=question)]}, config=config):
+        for chunk in graph_registry.get("barley").stream({"messages": [HumanMessage(content=question)]}, config=config):
             print("="*20)
             print(f"\nchunk: {chunk}\n")
 
-    
+    def test_graph_compiled_once(self):
+        graph = graph_registry.get("medal")
+        self.assertIs(graph, graph_registry.get("medal"))
+        self.assertTrue(any(item["name"] == "medal" for item in graph_registry.stats()))
+
+    def test_graph_hits_counted_concurrently(self):
+        from concurrent.futures import ThreadPoolExecutor
+
+        from agent.graph_registry import GraphRegistry
+
+        registry = GraphRegistry()
+        registry.register("stub", lambda: object())
+        with ThreadPoolExecutor(8) as pool:
+            list(pool.map(lambda _: registry.get("stub"), range(2000)))
+        self.assertEqual(registry.stats()[0]["hits"], 2000)
+
     def test_data_agent_graph(self):
         config = {
             "configurable": {
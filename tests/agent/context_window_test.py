@@ -0,0 +1,72 @@
+import uuid
+from unittest import TestCase
+from unittest.mock import patch
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+
+from agent import openai_agent
+from agent.context_window import ContextManager, context_manager, count_tokens
+from utils.cache import GlobalCache
+
+
+def _conversation(turns: int) -> list[dict]:
+    messages = []
+    for i in range(turns):
+        messages.append({"role": "user", "content": f"第{i}个问题：{uuid.uuid4().hex}"})
+        messages.append({"role": "assistant", "content": f"第{i}个回答"})
+    return messages
+
+
+class TestContextManager(TestCase):
+
+    def setUp(self):
+        self.manager = ContextManager(GlobalCache(session_bytes=1024 * 1024, stripes=1), max_tokens=60, step=2)
+        self.calls = []
+
+    def summarize(self, summary: str, conversation: str) -> str:
+        self.calls.append(conversation)
+        return f"{summary}|{len(self.calls)}"
+
+    def test_window_within_budget(self):
+        history = _conversation(2)
+        window = self.manager.build(history, self.summarize)
+        self.assertEqual(window.folded, 0)
+        self.assertEqual(window.summary, "")
+        self.assertIn("第1个回答", window.history)
+        self.assertEqual(self.calls, [])
+
+    def test_summary_reused_across_turns(self):
+        history = _conversation(10)
+        window = self.manager.build(history, self.summarize)
+        self.assertGreater(window.folded, 0)
+        self.assertEqual(window.folded % 2, 0)
+        self.assertLessEqual(count_tokens(window.history), 60)
+        first_calls = len(self.calls)
+        self.assertEqual(first_calls, window.folded // 2) # 按 step 分批合并
+
+        # 同一历史再次构建：直接命中缓存的摘要
+        self.assertEqual(self.manager.build(history, self.summarize).summary, window.summary)
+        self.assertEqual(len(self.calls), first_calls)
+
+        # 新增一轮对话：只合并新折叠的消息
+        history += _conversation(1)
+        next_window = self.manager.build(history, self.summarize)
+        self.assertEqual(len(self.calls), first_calls + (next_window.folded - window.folded) // 2)
+        self.assertTrue(next_window.summary.startswith(window.summary))
+        self.assertLessEqual(count_tokens(next_window.history), 60)
+
+
+class TestOpenAIAgentContext(TestCase):
+
+    def test_graph_uses_summary(self):
+        history = _conversation(6)
+        model = GenericFakeChatModel(messages=iter([AIMessage(content="<think>嗯</think>摘要"), AIMessage(content="回答")]))
+        # 窗口预算很小且步长覆盖全部历史：一次摘要请求折叠全部历史
+        with patch.object(openai_agent, "model", model), patch.object(context_manager, "max_tokens", 30), \
+                patch.object(context_manager, "step", 100):
+            result = openai_agent.graph.invoke({"messages": history + [HumanMessage(content=f"追问 {uuid.uuid4().hex}")]})
+
+        self.assertEqual(result["summary"], "摘要")
+        self.assertEqual(result["history"], "")
+        self.assertEqual(result["messages"][-1].content, "回答")
@@ -0,0 +1,69 @@
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+import pyarrow as pa
+
+from agent.delivery import DeliveryMode, DeliveryPolicy, DeliveryThresholds, payload_store_for
+from utils import payload_store as payload_store_module
+from utils.cache import GlobalCache, global_cache
+from utils.payload_store import PayloadStore
+
+
+def _table(rows: int) -> pa.Table:
+    return pa.table({"国家": [f"国家{i % 50}" for i in range(rows)], "数量": list(range(rows))})
+
+
+class TestDeliveryPolicy(TestCase):
+
+    def setUp(self):
+        self.store = PayloadStore(GlobalCache(hot_bytes=1024 * 1024, stripes=1))
+        thresholds = DeliveryThresholds(inline_rows=10, inline_bytes=4096, paged_rows=1000, spill_bytes=512 * 1024, max_share=0.2)
+        self.policy = DeliveryPolicy(thresholds, self.store)
+
+    def test_decide_by_size(self):
+        self.assertEqual(self.policy.decide(_table(5)).mode, DeliveryMode.INLINE)
+        self.assertEqual(self.policy.decide(_table(100)).mode, DeliveryMode.REFERENCE)
+        self.assertEqual(self.policy.decide(_table(5000)).mode, DeliveryMode.PAGED)
+        self.assertEqual(self.policy.decide(_table(100_000)).mode, DeliveryMode.SPILL)
+        self.assertEqual(self.policy.decide(_table(100), store_type="local").mode, DeliveryMode.INLINE)
+
+    def test_cache_share(self):
+        table = _table(15_000) # 约 180KB，不超过缓存预算的 20%
+        self.store.put("b", table)
+        # 已缓存的相同内容不占用额外空间，按引用交付
+        self.assertEqual(self.policy.decide(table).mode, DeliveryMode.PAGED)
+        # 单个结果占用超过缓存预算的 20%，溢出到磁盘
+        decision = self.policy.decide(_table(25_000))
+        self.assertEqual(decision.mode, DeliveryMode.SPILL)
+
+    def test_full_but_healthy_tier(self):
+        # 预热后的 LRU 层接近满载是正常状态，中等结果仍按引用交付
+        for i in range(200):
+            self.store.cache.set(f"other{i}", b"x" * 8000)
+        decision = self.policy.decide(_table(500))
+        self.assertGreater(decision.pressure, 0.9)
+        self.assertEqual(decision.mode, DeliveryMode.REFERENCE)
+
+    def test_deliver_records_decision(self):
+        data_meta = self.policy.deliver("k1", _table(5), dataset="medal")
+        self.assertEqual((data_meta.store_type, data_meta.dataset), ("local", "medal"))
+        self.assertEqual(data_meta.delivery["mode"], "inline")
+        self.assertEqual(len(data_meta.data), 5)
+
+        data_meta = self.policy.deliver("k2", _table(100))
+        self.assertEqual((data_meta.store_type, data_meta.data), ("memory", []))
+        self.assertEqual(data_meta.delivery["rows"], 100)
+        self.assertEqual(self.store.get("k2").row_count, 100)
+
+    def test_spill_to_disk(self):
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+                patch.dict("os.environ", {"PAYLOAD_SPILL_DIR": tmp_dir}), patch.object(payload_store_module, "_spill_store", None), \
+                patch.dict(global_cache._tiers): # 测试结束后移除指向临时目录的溢出层
+            data_meta = self.policy.deliver("k3", _table(100_000))
+            self.assertEqual(data_meta.store_type, "disk")
+            page = payload_store_for(data_meta.__dict__).get_slice("k3", 99_990, 50)
+            self.assertEqual(page.total_rows, 100_000)
+            self.assertEqual(page.to_rows()[-1], {"国家": "国家49", "数量": 99_999})
+            self.assertIsNone(self.store.get("k3"))
+        self.assertNotIn("spill", global_cache.stats())
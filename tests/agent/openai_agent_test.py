@@ -0,0 +1,55 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+
+from agent import openai_agent
+from agent.openai_agent import ThinkTagFilter
+from utils.async_bridge import async_bridge
+
+
+class TestThinkTagFilter(TestCase):
+
+    def _run(self, chunks):
+        think_filter = ThinkTagFilter()
+        return "".join(think_filter.feed(chunk) for chunk in chunks) + think_filter.flush()
+
+    def test_split_tags(self):
+        text = "<think>推理过程</think>\n\n北京奥运会于2008年8月8日开幕"
+        # 逐字符输入，标签被拆分在多个片段中
+        self.assertEqual(self._run(list(text)), "北京奥运会于2008年8月8日开幕")
+
+    def test_case_and_unclosed(self):
+        self.assertEqual(self._run(["答案<THINK>x</Think>是42", "<think>未闭合"]), "答案是42")
+        self.assertEqual(self._run(["a < b", " <t"]), "a < b <t")
+
+
+class TestOpenAIAgentStream(TestCase):
+
+    def test_stream_reply(self):
+        model = GenericFakeChatModel(messages=iter([AIMessage(content="<think>嗯</think>\n北京 2008")]))
+        with patch.object(openai_agent, "model", model):
+            chunks = list(openai_agent.stream_reply({"messages": [HumanMessage(content="北京奥运会的开幕时间")]}))
+
+        self.assertEqual(chunks[0], ("start", "你的问题是：北京奥运会的开幕时间"))
+        self.assertEqual("".join(text for node, text in chunks if node == "model"), "北京 2008")
+
+    def test_astream_reply_via_bridge(self):
+        model = GenericFakeChatModel(messages=iter([AIMessage(content="<think>嗯</think>北京 2008")]))
+        with patch.object(openai_agent, "model", model):
+            chunks = list(async_bridge.iterate(openai_agent.astream_reply({"messages": [HumanMessage(content="你好")]})))
+
+        self.assertEqual("".join(text for node, text in chunks if node == "model"), "北京 2008")
+
+    def test_response_cache(self):
+        question = "异常波动最大的指标是什么？"
+        model = GenericFakeChatModel(messages=iter([AIMessage(content="日活"), AIMessage(content="留存")]))
+        with patch.object(openai_agent, "model", model):
+            first = openai_agent.graph.invoke({"messages": [HumanMessage(content=question)]})
+            second = openai_agent.graph.invoke({"messages": [HumanMessage(content=question)]})
+            bypass = openai_agent.graph.invoke({"messages": [HumanMessage(content=question)]}, config={"configurable": {"bypass_cache": True}})
+
+        self.assertEqual(first["messages"][-1].content, "日活")
+        self.assertEqual(second["messages"][-1].content, "日活")
+        self.assertEqual(bypass["messages"][-1].content, "留存")
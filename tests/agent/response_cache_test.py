@@ -0,0 +1,63 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase
+
+from agent.response_cache import ResponseCache, normalize_prompt
+from utils.cache import GlobalCache
+
+
+class TestResponseCache(TestCase):
+
+    def setUp(self):
+        self.cache = ResponseCache(GlobalCache(session_bytes=1024 * 1024, stripes=1), ttl=60, semantic=True, threshold=0.8)
+
+    def test_exact_match_normalized(self):
+        self.assertEqual(normalize_prompt("  最近7天的新增用户？ "), "最近7天的新增用户")
+        self.cache.set("最近7天的新增用户", "qwen", "tpl", "1024")
+        self.assertEqual(self.cache.get("最近7天的新增用户？", "qwen", "tpl"), "1024")
+        # 模型或模板不同视为不同回答
+        self.assertIsNone(self.cache.get("最近7天的新增用户", "other", "tpl"))
+        self.assertIsNone(self.cache.get("最近7天的新增用户", "qwen", "tpl2"))
+
+    def test_semantic_match(self):
+        self.cache.set("本周销售额同比增长情况", "qwen", "tpl", "增长 12%")
+        self.assertEqual(self.cache.get("本周的销售额同比增长情况", "qwen", "tpl"), "增长 12%")
+        self.assertIsNone(self.cache.get("昨天的活跃用户是多少", "qwen", "tpl"))
+
+    def test_semantic_requires_same_numbers_and_dates(self):
+        from agent.response_cache import _embed
+
+        pairs = [
+            ("统计最近7天每天的新增用户数量", "统计最近3天每天的新增用户数量"),
+            ("中国2024年金牌总数是多少", "中国2020年金牌总数是多少"),
+            ("2024年北京奥运会的金牌数", "2020年北京奥运会的金牌数"),
+            ("今年的新增用户数量是多少", "去年的新增用户数量是多少"),
+        ]
+        cache = ResponseCache(GlobalCache(session_bytes=1024 * 1024, stripes=1), ttl=60, semantic=True, threshold=0.9)
+        for cached, asked in pairs:
+            # 字符向量相似度都超过阈值，但数字或日期不同，答案不能复用
+            self.assertGreaterEqual(float(_embed(cached, 1024) @ _embed(asked, 1024)), 0.9)
+            cache.set(cached, "qwen", "tpl", cached)
+            self.assertIsNone(cache.get(asked, "qwen", "tpl"), asked)
+        # 数字相同、措辞不同仍可命中
+        self.assertEqual(cache.get("中国2024年的金牌总数是多少", "qwen", "tpl"), "中国2024年金牌总数是多少")
+
+    def test_ttl(self):
+        self.cache.ttl = 0.05
+        self.cache.set("q", "qwen", "tpl", "a")
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get("q", "qwen", "tpl"))
+
+    def test_concurrent_same_question(self):
+        calls = []
+
+        def generate():
+            calls.append(1)
+            time.sleep(0.1)
+            return "1024"
+
+        with ThreadPoolExecutor(6) as pool:
+            replies = list(pool.map(lambda _: self.cache.get_or_compute("最近7天的新增用户", "qwen", "tpl", generate), range(6)))
+        self.assertEqual(replies, ["1024"] * 6)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(self.cache.get("最近7天的新增用户", "qwen", "tpl"), "1024")
@@ -0,0 +1,41 @@
+from unittest import TestCase
+
+import pandas as pd
+
+from agent.schema import (DataPayload, DataProtocol, data_message, decode_table, encode_table, message_artifact,
+                          protocol_message)
+from utils.dataset_registry import dataset_registry
+
+
+class TestWireFormat(TestCase):
+
+    def test_encode_decode_roundtrip(self):
+        table = dataset_registry.view("barley", year=1931)
+        for compression in (None, "zstd"):
+            with self.subTest(compression=compression):
+                decoded = decode_table(encode_table(table, compression))
+                self.assertTrue(decoded.equals(table))
+                self.assertEqual(decoded.to_pylist(), dataset_registry.view_rows("barley", year=1931))
+
+    def test_data_message(self):
+        df = pd.DataFrame({"国家": ["中国", "美国"], "金牌": [40, 40]})
+        message = data_message(df, title="奖牌榜")
+        artifact = message_artifact(message)
+        self.assertEqual(artifact["row_count"], 2)
+        self.assertEqual(list(artifact["schema"]), ["国家", "金牌"])
+        self.assertEqual(artifact["schema"]["金牌"], "int64")
+        self.assertEqual(artifact["title"], "奖牌榜")
+        self.assertEqual(message.content, "数据表，共 2 行")
+        self.assertEqual(decode_table(artifact["data"]).to_pandas().to_dict("records"), df.to_dict("records"))
+        # 相同内容的附件摘要相同，可用作缓存键
+        self.assertEqual(artifact["key"], message_artifact(data_message(df))["key"])
+        self.assertIsNone(message_artifact({"role": "assistant", "content": "hi"}))
+
+    def test_protocol_message(self):
+        protocol = DataProtocol(type="chart", meta={"title": "奖牌榜"}, payload=DataPayload(
+            chart_type="bar", columns=["国家", "金牌"], data=[["中国", 40], ["美国", 40]]))
+        message = protocol_message(protocol)
+        self.assertNotIn("中国", message.content) # 数据不再重复出现在文本中
+        artifact = message_artifact(message)
+        self.assertEqual(artifact["display_type"], "chart")
+        self.assertEqual(decode_table(artifact["data"]).to_pylist(), [{"国家": "中国", "金牌": 40}, {"国家": "美国", "金牌": 40}])
@@ -0,0 +1,51 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+
+from agent import openai_agent
+from agent.sql_agent import build_graph, extract_sql
+
+
+class TestSqlAgent(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.graph = build_graph()
+
+    def test_extract_sql(self):
+        text = "<think>按年份过滤</think>\n```sql\nselect * from medal_width limit 5\n```"
+        self.assertEqual(extract_sql(text), "select * from medal_width limit 5")
+        self.assertEqual(extract_sql("好的：SELECT 1"), "SELECT 1")
+
+    def test_generated_sql(self):
+        model = GenericFakeChatModel(messages=iter([AIMessage(
+            content='```sql\nselect "国家", sum("金牌") as 金牌 from medal_width where "年份" = \'2024\' group by "国家"\n```'
+        )]))
+        with patch.object(openai_agent, "model", model):
+            state = self.graph.invoke({"messages": [HumanMessage(content="2024年各国金牌数")]})
+
+        data_meta = state["data_meta"]
+        self.assertEqual(data_meta["store_type"], "local") # 聚合后的小结果直接内联
+        self.assertEqual(data_meta["delivery"]["mode"], "inline")
+        self.assertEqual(len(data_meta["data"]), data_meta["row_count"])
+        self.assertEqual(set(data_meta["data"][0]), {"国家", "金牌"})
+
+    def test_query_error(self):
+        state = self.graph.invoke({"messages": [HumanMessage(content="查询不存在的表")]},
+                                  config={"configurable": {"sql": "select * from not_exists"}})
+        self.assertEqual(state["data_meta"], {})
+        self.assertTrue(state["messages"][-1].content.startswith("查询失败"))
+
+    def test_direct_sql_and_fallback(self):
+        # 问题本身是可编译的查询时直接执行，不调用模型
+        state = self.graph.invoke({"messages": [HumanMessage(content='select "国家" from medal_width limit 2')]})
+        self.assertEqual(state["data_meta"]["row_count"], 2)
+
+        # 以 with 开头的自然语言问题交给模型生成
+        model = GenericFakeChatModel(messages=iter([AIMessage(content='select count(*) as n from medal_width')]))
+        with patch.object(openai_agent, "model", model):
+            state = self.graph.invoke({"messages": [HumanMessage(content="With 2024 data, how many rows are there?")]})
+        self.assertEqual(state["sql"], "select count(*) as n from medal_width")
+        self.assertEqual(set(state["data_meta"]["data"][0]), {"n"})
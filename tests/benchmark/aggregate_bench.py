@@ -0,0 +1,70 @@
+"""聚合内核基准：对比 utils.aggregate.rank_groups 与 demo30 原先的 pandas 链路
+
+从 barley 原始数据（120 行）逐级放大到千万行合成数据：
+    PYTHONPATH=src python tests/benchmark/aggregate_bench.py [--max-rows 10000000] [--repeat 3]
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.aggregate import rank_groups
+
+
+def pandas_chain(df: pd.DataFrame) -> pd.DataFrame:
+    """demo30 重构前的实现"""
+    df_grouped = df.groupby(["variety", "site"], as_index=False, observed=True)["yield"].sum()
+    df_variety_total = df_grouped.groupby("variety", observed=True)["yield"].sum().reset_index()
+    df_variety_total.columns = ["variety", "total_yield"]
+    df_merged = pd.merge(df_grouped, df_variety_total, on="variety")
+    fixed_site_order = df["site"].unique().tolist()
+    df_merged["site"] = pd.Categorical(df_merged["site"], categories=fixed_site_order, ordered=True)
+    return df_merged.sort_values(["total_yield", "site"], ascending=[False, True])
+
+
+def synthetic_barley(rows: int, seed: int = 0) -> pd.DataFrame:
+    """按 barley 的列结构生成合成数据，品种/地点为分类列（与 payload_store 字典编码后的形态一致）"""
+    rng = np.random.default_rng(seed)
+    varieties = [f"variety_{i}" for i in range(50)]
+    sites = [f"site_{i}" for i in range(20)]
+    return pd.DataFrame({
+        "yield": rng.gamma(9.0, 4.0, rows),
+        "variety": pd.Categorical.from_codes(rng.integers(0, len(varieties), rows), varieties),
+        "year": rng.integers(1931, 1933, rows),
+        "site": pd.Categorical.from_codes(rng.integers(0, len(sites), rows), sites),
+    })
+
+
+def best_of(func, df: pd.DataFrame, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(df)
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--max-rows", type=int, default=10_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    from vega_datasets import data
+
+    datasets = [("barley", data.barley())]
+    rows = 10_000
+    while rows <= args.max_rows:
+        datasets.append((f"{rows:,}", synthetic_barley(rows)))
+        rows *= 10
+
+    print(f"{'数据':>12} {'行数':>12} {'pandas(ms)':>12} {'numpy(ms)':>12} {'加速比':>8}")
+    for name, df in datasets:
+        pandas_ms = best_of(pandas_chain, df, args.repeat)
+        numpy_ms = best_of(lambda d: rank_groups(d, "variety", "site", "yield", total_name="total_yield"), df, args.repeat)
+        print(f"{name:>12} {len(df):>12,} {pandas_ms:>12.2f} {numpy_ms:>12.2f} {pandas_ms / numpy_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
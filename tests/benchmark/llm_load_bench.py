@@ -0,0 +1,94 @@
+"""openai_agent 压测：N 个并发会话经由 OpenAI 兼容服务（默认为进程内的 utils.llm_stub 模拟服务）多轮问答
+
+    PYTHONPATH=src python tests/benchmark/llm_load_bench.py [--sessions 16] [--turns 3] [--same-question]
+        [--latency 0.2] [--tps 50] [--tokens 120] [--think-tokens 30] [--base-url http://127.0.0.1:1234/v1]
+
+每个会话使用独立的 thread_id，每轮只发送新消息（状态由检查点恢复），跳过回答缓存。
+--same-question 时所有会话同时提出相同的问题并使用回答缓存，用于观察并发相同请求的合并（模拟服务的请求数约等于轮数）。
+统计每轮的首 token 延迟（TTFT）与完整耗时的 p50/p95/p99，以及整体吞吐（轮/秒、输出字符/秒）。
+注意 LLM_MAX_CONCURRENCY 限制同时进行的模型请求数，并发会话数超过它时多出的请求排队。
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import time
+import uuid
+
+import numpy as np
+
+
+def percentiles(values: list[float]) -> str:
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return f"p50 {p50:>8.1f}  p95 {p95:>8.1f}  p99 {p99:>8.1f}"
+
+
+async def session(openai_agent, index: int, turns: int, records: list[dict], same_question: bool = False) -> None:
+    config = {"configurable": {"thread_id": f"load-{index}-{uuid.uuid4().hex}", "bypass_cache": not same_question}}
+    for turn in range(turns):
+        question = f"第{turn}个问题：北京奥运会的开幕时间" if same_question else f"会话{index}的第{turn}个问题：北京奥运会的开幕时间"
+        start = time.perf_counter()
+        first_token, chars = None, 0
+        async for node, text in openai_agent.astream_reply({"messages": [{"role": "user", "content": question}]}, config):
+            if node == "model" and text:
+                if first_token is None:
+                    first_token = time.perf_counter()
+                chars += len(text)
+        end = time.perf_counter()
+        records.append({
+            "ttft_ms": ((first_token or end) - start) * 1000,
+            "latency_ms": (end - start) * 1000,
+            "chars": chars,
+        })
+
+
+async def run(sessions: int, turns: int, same_question: bool = False) -> tuple[list[dict], float]:
+    from agent import openai_agent
+
+    await session(openai_agent, -1, 1, []) # 预热：创建模型客户端、加载分词器
+    records: list[dict] = []
+    start = time.perf_counter()
+    await asyncio.gather(*(session(openai_agent, i, turns, records, same_question) for i in range(sessions)))
+    return records, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=16, help="并发会话数")
+    parser.add_argument("--turns", type=int, default=3, help="每个会话的轮数")
+    parser.add_argument("--same-question", action="store_true", help="所有会话提出相同的问题（使用回答缓存）")
+    parser.add_argument("--base-url", default=None, help="已启动的 OpenAI 兼容服务地址，不指定时启动进程内模拟服务")
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--tps", type=float, default=50)
+    parser.add_argument("--tokens", type=int, default=120)
+    parser.add_argument("--think-tokens", type=int, default=30)
+    args = parser.parse_args()
+
+    server = None
+    if args.base_url:
+        base_url = args.base_url
+    else:
+        from utils.llm_stub import StubConfig, start_stub
+
+        server = start_stub(config=StubConfig(args.latency, args.tps, args.tokens, args.think_tokens))
+        base_url = server.base_url
+    os.environ["LLM_BASE_URL"] = base_url # 需在导入 openai_agent 之前设置
+
+    print(f"服务：{base_url}  并发会话：{args.sessions}  每会话轮数：{args.turns}")
+    with contextlib.redirect_stdout(io.StringIO()): # 节点中的 print 不计入
+        records, elapsed = asyncio.run(run(args.sessions, args.turns, args.same_question))
+
+    ttft = [r["ttft_ms"] for r in records]
+    latency = [r["latency_ms"] for r in records]
+    chars = sum(r["chars"] for r in records)
+    print(f"首 token 延迟(ms)  {percentiles(ttft)}")
+    print(f"单轮耗时(ms)       {percentiles(latency)}")
+    print(f"吞吐：{len(records) / elapsed:.2f} 轮/秒，{chars / elapsed:,.0f} 字符/秒，总耗时 {elapsed:.2f}s")
+    if server is not None:
+        print(f"模拟服务：{server.stats()}")
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""页面冷启动基准：以 python -X importtime 执行各页面脚本，统计顶层模块的累计导入耗时并与预算对比
+
+    PYTHONPATH=src python tests/benchmark/startup_bench.py [--pages demo20 demo30] [--scale 1.5] [--strict]
+
+耗时受机器负载影响，不放在单元测试中；首屏不加载重量级依赖由 tests/ui/startup_test.py 检查。
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+SRC_DIR = os.path.join(ROOT_DIR, "src")
+
+# 各页面冷启动的导入耗时预算（毫秒）
+ENTRY_POINT_BUDGET_MS = {
+    "demo10": 3000, # 首屏即展示 vega 数据集，需要立即加载 pandas
+    "demo20": 1500,
+    "demo21": 1500,
+    "demo30": 1500,
+    "demo31": 1500,
+    "demo40": 1500,
+}
+
+# 在 Streamlit bare 模式下执行页面脚本
+_BOOTSTRAP = "import runpy, sys; runpy.run_path(sys.argv[1], run_name='__main__')"
+
+
+def measure_startup(entry_point: str) -> tuple[float, dict[str, float]]:
+    """执行页面脚本，统计顶层模块的累计导入耗时
+    :param entry_point: 页面名称，如 demo30
+    :return: (总导入耗时 ms, {顶层模块: 累计耗时 ms})
+    """
+    script = os.path.join(SRC_DIR, "ui", f"{entry_point}.py")
+    env = dict(os.environ, PYTHONPATH=SRC_DIR)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _BOOTSTRAP, script],
+        cwd=ROOT_DIR, env=env, capture_output=True, text=True, timeout=120,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{entry_point} 启动失败:\n{result.stderr[-2000:]}")
+
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if name.startswith("  "): # 缩进表示被其他模块间接导入，只统计顶层
+            continue
+        modules[name.strip()] = modules.get(name.strip(), 0) + int(cumulative) / 1000
+    return sum(modules.values()), modules
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", nargs="+", default=list(ENTRY_POINT_BUDGET_MS))
+    parser.add_argument("--scale", type=float, default=1.0, help="预算整体放宽倍数（如慢速机器）")
+    parser.add_argument("--strict", action="store_true", help="有页面超出预算时以非零状态退出")
+    args = parser.parse_args()
+
+    over = []
+    for name in args.pages:
+        total, modules = measure_startup(name)
+        budget = ENTRY_POINT_BUDGET_MS[name] * args.scale
+        flag = "" if total <= budget else "  超出预算"
+        print(f"\n{name}: {total:.1f}ms (预算 {budget:.0f}ms){flag}")
+        for module, ms in sorted(modules.items(), key=lambda item: -item[1])[:10]:
+            print(f"  {ms:8.1f}ms  {module}")
+        if total > budget:
+            over.append(name)
+    if over and args.strict:
+        sys.exit(f"超出导入耗时预算：{over}")
+
+
+if __name__ == "__main__":
+    main()
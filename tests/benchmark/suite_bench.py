@@ -0,0 +1,263 @@
+"""端到端基准：智能体图延迟、GlobalCache 并发吞吐、图表数据构建、页面渲染与 LLM 链路
+
+    PYTHONPATH=src python tests/benchmark/suite_bench.py [--rows 1000 100000] [--only graphs cache]
+        [--save [PATH]] [--compare [PATH]]
+
+- 数据集替换为 synthetic.py 生成的合成数据，按 --rows 逐级放大
+- LLM 链路默认使用进程内的假模型（只测图与流式过滤的开销）；指定 --llm-base-url 时请求真实的 OpenAI 兼容服务
+- --save 保存结果；--compare 与已保存的结果对比（不指定路径时均为 results/baseline.json），耗时超过 --threshold 倍的项标记为回退，带 --strict 时以非零状态退出
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import threading
+import time
+import uuid
+from typing import Any, Callable
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+BASELINE_PATH = os.path.join(RESULTS_DIR, "baseline.json")
+GROUPS = ["graphs", "cache", "helpers", "ui", "llm"]
+
+
+def measure(func: Callable[[], Any], repeat: int, warmup: int = 1) -> dict[str, float]:
+    """多次执行取耗时统计（毫秒），节点中的 print 输出不计入"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(warmup):
+            func()
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+    return {"min_ms": min(timings), "median_ms": statistics.median(timings), "mean_ms": statistics.fmean(timings)}
+
+
+def bench_graphs(rows: int, repeat: int) -> dict[str, dict]:
+    """四个数据智能体图的单轮延迟"""
+    from langchain_core.messages import HumanMessage
+
+    from agent.graph_registry import graph_registry
+
+    results = {}
+    medal = graph_registry.get("medal")
+    barley = graph_registry.get("barley")
+    for store_type in ("local", "memory"):
+        config = {"configurable": {"data_type": "medal_width", "store_type": store_type}}
+        results[f"graph.medal[{store_type}]"] = measure(lambda: medal.invoke({"messages": [HumanMessage(content="奖牌榜")]}, config=config), repeat)
+    results["graph.barley"] = measure(lambda: barley.invoke({"messages": [HumanMessage(content="表格")]}), repeat)
+
+    from agent.data_agent import graph2
+
+    results["graph.data"] = measure(lambda: graph2.invoke({"messages": [HumanMessage(content="表格")]}), repeat)
+
+    from agent.tool_agent import graph as tool_graph
+
+    for question in ("图表", "表格", "数据"):
+        results[f"graph.tool[{question}]"] = measure(lambda: tool_graph.invoke({"messages": [HumanMessage(content=question)]}), repeat)
+    return results
+
+
+def bench_cache(rows: int, repeat: int, threads_list=(1, 4, 8), ops: int = 20_000) -> dict[str, dict]:
+    """GlobalCache 多线程读写吞吐：90% get / 10% set，键空间 1000"""
+    from utils.cache import CacheType, GlobalCache
+
+    results = {}
+    keys = [f"key:{i}" for i in range(1000)]
+    for cache_type in (CacheType.HOT, CacheType.SESSION):
+        for threads in threads_list:
+            cache = GlobalCache(hot_bytes=64 * 1024 * 1024, session_bytes=64 * 1024 * 1024)
+            for key in keys:
+                cache.set(key, key * 4, cache_type)
+
+            def worker(seed: int):
+                rng = random.Random(seed)
+                for _ in range(ops // threads):
+                    key = keys[rng.randrange(len(keys))]
+                    if rng.random() < 0.1:
+                        cache.set(key, key * 4, cache_type)
+                    else:
+                        cache.get(key, cache_type)
+
+            def run():
+                pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+                for thread in pool:
+                    thread.start()
+                for thread in pool:
+                    thread.join()
+
+            stats = measure(run, repeat)
+            stats["ops_per_s"] = ops / (stats["min_ms"] / 1000)
+            results[f"cache.{cache_type}[threads={threads}]"] = stats
+    return results
+
+
+def bench_helpers(rows: int, repeat: int) -> dict[str, dict]:
+    """demo 中的数据变换与图表构建（不含 Streamlit 渲染）"""
+    import plotly.express as px
+
+    from synthetic import barley, medal_width
+    from utils.downsample import prepare_chart
+    from utils.payload_store import ColumnarPayload, to_arrow_table
+
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        from ui.demo30 import build_bar_plotly2 # 以 bare 模式导入页面脚本，只取其中的图表构建函数
+
+    results = {}
+    df_barley = barley(rows)
+    results["helpers.demo30.build_bar_plotly2"] = measure(lambda: build_bar_plotly2(df_barley), repeat)
+    results["helpers.prepare_chart[bar]"] = measure(lambda: prepare_chart(df_barley, "bar", "variety", "yield", "site"), repeat)
+
+    df_medal = medal_width(rows)
+    year = df_medal["年份"].iloc[0]
+
+    def demo31_figure():
+        # 与 demo31.plotly_chart 相同的链路：按年份过滤 → 截断类别 → melt → px.bar
+        render = prepare_chart(df_medal[df_medal["年份"] == year], "bar", "国家", ["金牌", "银牌", "铜牌"])
+        melted = render.frame.melt(id_vars=["国家"], value_vars=["金牌", "银牌", "铜牌"], var_name="指标", value_name="值")
+        return px.bar(melted, x="国家", y="值", color="指标", barmode="group")
+
+    results["helpers.demo31.figure"] = measure(demo31_figure, repeat)
+
+    payload = ColumnarPayload("bench", to_arrow_table(df_medal))
+    results["helpers.payload.slice[page]"] = measure(lambda: payload.slice(rows // 2, 50), repeat)
+    results["helpers.payload.slice[sorted]"] = measure(lambda: payload.slice(0, 50, sort="-金牌", filter={"年份": year}), repeat)
+    return results
+
+
+def bench_ui(rows: int, repeat: int) -> dict[str, dict]:
+    """页面脚本的完整重新运行（含历史消息渲染），每个页面先提问 3 轮"""
+    from streamlit.testing.v1 import AppTest
+
+    ui_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "src", "ui")
+    results = {}
+    for page in ("demo30", "demo31", "demo40"):
+        at = AppTest.from_file(os.path.join(ui_dir, f"{page}.py"), default_timeout=120)
+        with contextlib.redirect_stdout(io.StringIO()):
+            at.run()
+            for i in range(3):
+                at.chat_input[0].set_value(f"问题{i}").run()
+        if at.exception:
+            print(f"{page} 运行异常：{[e.value for e in at.exception]}", file=sys.stderr)
+            continue
+        results[f"ui.{page}.rerun"] = measure(at.run, repeat)
+    return results
+
+
+def bench_llm(rows: int, repeat: int, base_url: str = None) -> dict[str, dict]:
+    """openai_agent 单轮问答（流式），默认使用进程内假模型"""
+    from agent import openai_agent
+
+    if not base_url:
+        from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+        from langchain_core.messages import AIMessage
+
+        def replies():
+            while True:
+                yield AIMessage(content="<think>" + "推理" * 50 + "</think>" + "回答内容" * 40)
+
+        openai_agent.model = GenericFakeChatModel(messages=replies())
+
+    def turn():
+        config = {"configurable": {"bypass_cache": True, "thread_id": uuid.uuid4().hex}}
+        for _ in openai_agent.stream_reply({"messages": [{"role": "user", "content": "北京奥运会的开幕时间"}]}, config):
+            pass
+
+    return {f"llm.stream_reply[{'server' if base_url else 'fake'}]": measure(turn, repeat)}
+
+
+def environment() -> dict[str, str]:
+    import numpy
+    import pandas
+    import pyarrow
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": str(os.cpu_count()),
+        "numpy": numpy.__version__,
+        "pandas": pandas.__version__,
+        "pyarrow": pyarrow.__version__,
+    }
+
+
+def compare(results: dict[str, dict], baseline: dict[str, dict], threshold: float, min_delta_ms: float = 1.0) -> list[str]:
+    """与基线对比（按最短耗时，受调度抖动影响最小），返回回退项；差值小于 min_delta_ms 的亚毫秒级波动忽略"""
+    regressions = []
+    print(f"\n{'项目':<48} {'基线(ms)':>10} {'本次(ms)':>10} {'比值':>8}")
+    for name, stats in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        ratio = stats["min_ms"] / max(base["min_ms"], 1e-6)
+        flag = ""
+        if ratio > threshold and stats["min_ms"] - base["min_ms"] > min_delta_ms:
+            flag = "  ← 回退"
+            regressions.append(name)
+        print(f"{name:<48} {base['min_ms']:>10.2f} {stats['min_ms']:>10.2f} {ratio:>8.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 100_000], help="合成数据行数，逐个运行")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", nargs="+", choices=GROUPS, default=GROUPS)
+    parser.add_argument("--llm-base-url", default=None, help="OpenAI 兼容服务地址，不指定时使用假模型")
+    parser.add_argument("--save", nargs="?", const=BASELINE_PATH, default=None, help="保存结果的 JSON 路径")
+    parser.add_argument("--compare", nargs="?", const=BASELINE_PATH, default=None, help="对比的基线 JSON 路径")
+    parser.add_argument("--threshold", type=float, default=1.3, help="耗时超过基线该倍数视为回退")
+    parser.add_argument("--strict", action="store_true", help="存在回退时以非零状态退出")
+    args = parser.parse_args()
+
+    if args.llm_base_url:
+        os.environ["LLM_BASE_URL"] = args.llm_base_url # 需在导入 openai_agent 之前设置
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from synthetic import install_datasets
+
+    benches = {
+        "graphs": bench_graphs,
+        "cache": bench_cache,
+        "helpers": bench_helpers,
+        "ui": bench_ui,
+        "llm": lambda rows, repeat: bench_llm(rows, repeat, args.llm_base_url),
+    }
+    results = {}
+    for rows in args.rows:
+        install_datasets(rows)
+        from agent.graph_registry import graph_registry
+
+        graph_registry.clear()
+        for group in args.only:
+            if group in ("cache", "llm") and rows != args.rows[0]:
+                continue # 与数据规模无关，只运行一次
+            for name, stats in benches[group](rows, args.repeat).items():
+                key = name if group in ("cache", "llm") else f"{name}@{rows}"
+                results[key] = stats
+                extra = f" {stats['ops_per_s']:>12,.0f} ops/s" if "ops_per_s" in stats else ""
+                print(f"{key:<48} median {stats['median_ms']:>10.2f} ms  min {stats['min_ms']:>10.2f} ms{extra}", flush=True)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} 项耗时超过基线 {args.threshold} 倍")
+            if args.strict:
+                sys.exit(1)
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            settings = {k: v for k, v in vars(args).items() if k not in ("save", "compare")}
+            json.dump({"environment": environment(), "args": settings, "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存：{args.save}")
+
+
+if __name__ == "__main__":
+    main()
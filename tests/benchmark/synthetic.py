@@ -0,0 +1,65 @@
+"""基准测试用的合成数据：按真实数据集的列结构放大行数
+
+    from synthetic import install_datasets
+    install_datasets(100_000) # 用合成数据替换 dataset_registry 中的 medal/barley 数据集
+"""
+import numpy as np
+import pandas as pd
+
+from utils.dataset_registry import dataset_registry
+
+MEDALS = ["金牌", "银牌", "铜牌"]
+
+
+def _countries(count: int) -> list[str]:
+    base = ["中国", "美国", "英国", "日本", "法国", "德国", "澳大利亚", "荷兰", "意大利", "韩国"]
+    return base[:count] + [f"国家{i}" for i in range(len(base), count)]
+
+
+def _years(count: int) -> list[str]:
+    return [str(2024 - 4 * i) for i in range(count)]
+
+
+def medal_width(rows: int, seed: int = 0) -> pd.DataFrame:
+    """宽表：年份, 国家, 金牌, 银牌, 铜牌（年份 × 国家 的组合数约为 rows）"""
+    rng = np.random.default_rng(seed)
+    years = _years(max(min(rows // 10, 30), 1))
+    countries = _countries(max(rows // len(years), 1))
+    index = pd.MultiIndex.from_product([years, countries], names=["年份", "国家"]).to_frame(index=False)[:rows]
+    for medal in MEDALS:
+        index[medal] = rng.integers(0, 50, len(index))
+    return index
+
+
+def medal_list(rows: int, seed: int = 0) -> pd.DataFrame:
+    """奖牌榜：国家, 金牌, 银牌, 铜牌"""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({"国家": _countries(rows)})
+    for medal in MEDALS:
+        df[medal] = rng.integers(0, 50, rows)
+    return df
+
+
+def barley(rows: int, seed: int = 0) -> pd.DataFrame:
+    """barley：yield, variety, year, site"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "yield": rng.gamma(9.0, 4.0, rows).round(5),
+        "variety": rng.choice([f"variety_{i}" for i in range(10)], rows),
+        "year": rng.integers(1931, 1933, rows),
+        "site": rng.choice([f"site_{i}" for i in range(6)], rows),
+    })
+
+
+# medal_width / medal_long 是规范奖牌表 medal 的投影，替换 medal 即可
+GENERATORS = {
+    "medal": medal_width,
+    "medal_list": medal_list,
+    "barley": barley,
+}
+
+
+def install_datasets(rows: int, seed: int = 0) -> None:
+    """用合成数据替换 dataset_registry 中的数据集（不读文件，数据版本固定）"""
+    for name, generator in GENERATORS.items():
+        dataset_registry.register(name, lambda generator=generator: generator(rows, seed))
@@ -0,0 +1,76 @@
+"""消息数据格式基准：对比 JSON 文本与 Arrow IPC 附件的完整往返
+
+JSON：agent 端 to_dict + json.dumps，UI 端 json.loads + DataFrame
+Arrow：agent 端 encode_table，UI 端 decode_table + to_pandas
+    PYTHONPATH=src python tests/benchmark/wire_format_bench.py [--max-rows 1000000] [--repeat 5]
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from agent.schema import decode_table, encode_table
+
+
+def json_roundtrip(df: pd.DataFrame) -> tuple[int, pd.DataFrame]:
+    text = json.dumps(df.to_dict(orient="records"), ensure_ascii=False)
+    data = json.loads(text)
+    return len(text.encode("utf-8")), pd.DataFrame(data, columns=data[0].keys())
+
+
+def arrow_roundtrip(df: pd.DataFrame, compression: str = None) -> tuple[int, pd.DataFrame]:
+    encoded = encode_table(df, compression)
+    return len(encoded), decode_table(encoded).to_pandas()
+
+
+def synthetic_barley(rows: int, seed: int = 0) -> pd.DataFrame:
+    """按 barley 的列结构生成合成数据"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "yield": rng.gamma(9.0, 4.0, rows).round(5),
+        "variety": rng.choice([f"variety_{i}" for i in range(10)], rows),
+        "year": rng.integers(1931, 1933, rows),
+        "site": rng.choice([f"site_{i}" for i in range(6)], rows),
+    })
+
+
+def best_of(func, repeat: int) -> tuple[float, int]:
+    timings, size = [], 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        size, _ = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000, size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--max-rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    from vega_datasets import data
+
+    barley = data.barley()
+    datasets = [("barley(1931)", barley[barley["year"] == 1931].reset_index(drop=True))]
+    rows = 1_000
+    while rows <= args.max_rows:
+        datasets.append((f"{rows:,}", synthetic_barley(rows)))
+        rows *= 10
+
+    formats = [
+        ("json", json_roundtrip),
+        ("arrow", arrow_roundtrip),
+        ("arrow+zstd", lambda df: arrow_roundtrip(df, "zstd")),
+    ]
+    print(f"{'数据':>14} {'格式':>12} {'耗时(ms)':>10} {'大小(KB)':>12}")
+    for name, df in datasets:
+        for fmt, func in formats:
+            ms, size = best_of(lambda: func(df), args.repeat)
+            print(f"{name:>14} {fmt:>12} {ms:>10.2f} {size / 1024:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+from unittest import TestCase
+
+from streamlit.testing.v1 import AppTest
+
+
+def _history_app():
+    import streamlit as st
+
+    from utils.common_util import render_history
+
+    messages = [{"role": "user" if i % 2 == 0 else "assistant", "content": f"消息{i}"} for i in range(25)]
+    render_history(messages, lambda msg: st.text(msg["content"]), recent=4, page_size=5)
+
+
+class TestRenderHistory(TestCase):
+
+    def rendered(self, at: AppTest) -> list[str]:
+        return [item.value for item in at.text]
+
+    def test_folded_and_paged(self):
+        at = AppTest.from_function(_history_app).run()
+        # 默认只渲染最近 4 条，更早的 21 条折叠为一行摘要
+        self.assertEqual(self.rendered(at), ["消息21", "消息22", "消息23", "消息24"])
+        self.assertIn("已折叠 21 条较早的消息", at.caption[0].value)
+
+        at.button(key="history_expand").click().run()
+        self.assertEqual(self.rendered(at), [f"消息{i}" for i in range(16, 21)] + ["消息21", "消息22", "消息23", "消息24"])
+
+        for _ in range(4):
+            at.button(key="history_older").click().run()
+        # 最后一页只剩最早的 1 条，每次运行渲染量不超过 recent + page_size
+        self.assertEqual(self.rendered(at), ["消息0", "消息21", "消息22", "消息23", "消息24"])
+        self.assertTrue(at.button(key="history_older").disabled)
+
+        at.button(key="history_fold").click().run()
+        self.assertEqual(len(self.rendered(at)), 4)
@@ -0,0 +1,43 @@
+import json
+import os
+import subprocess
+import sys
+from unittest import TestCase
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+SRC_DIR = os.path.join(ROOT_DIR, "src")
+
+# 首屏（无历史消息）应延迟导入重量级依赖的页面；demo10 首屏即展示 vega 数据集，需要立即加载 pandas
+ENTRY_POINTS = ["demo20", "demo21", "demo30", "demo31", "demo40"]
+
+# 首屏不应加载的重量级依赖（streamlit 自身会加载 plotly 核心模块，不在此列）
+LAZY_MODULES = ["pandas", "plotly.express", "altair", "langchain", "langgraph", "tkinter", "turtle"]
+
+# 在 Streamlit bare 模式下执行页面脚本，最后一行输出已导入的模块
+_BOOTSTRAP = "import json, runpy, sys; runpy.run_path(sys.argv[1], run_name='__main__'); print(json.dumps(sorted(sys.modules)))"
+
+
+def imported_modules(entry_point: str) -> set[str]:
+    """在子进程中执行页面脚本，返回执行后已导入的全部模块
+    :param entry_point: 页面名称，如 demo30
+    """
+    script = os.path.join(SRC_DIR, "ui", f"{entry_point}.py")
+    env = dict(os.environ, PYTHONPATH=SRC_DIR)
+    result = subprocess.run(
+        [sys.executable, "-c", _BOOTSTRAP, script],
+        cwd=ROOT_DIR, env=env, capture_output=True, text=True, timeout=120,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{entry_point} 启动失败:\n{result.stderr[-2000:]}")
+    return set(json.loads(result.stdout.strip().splitlines()[-1]))
+
+
+class TestStartup(TestCase):
+    """首屏不加载重量级依赖（只检查导入了哪些模块，不断言耗时；耗时见 tests/benchmark/startup_bench.py）"""
+
+    def test_lazy_imports(self):
+        for entry_point in ENTRY_POINTS:
+            with self.subTest(entry_point=entry_point):
+                imported = imported_modules(entry_point)
+                loaded = [m for m in LAZY_MODULES if any(name == m or name.startswith(m + ".") for name in imported)]
+                self.assertEqual(loaded, [], f"{entry_point} 首屏不应加载 {loaded}")
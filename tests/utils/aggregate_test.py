@@ -0,0 +1,88 @@
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+from vega_datasets import data
+
+from utils.aggregate import factorize, group_by, rank_groups, rollup, top_n
+
+
+class TestAggregate(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.df = data.barley()
+
+    def test_factorize_keeps_first_appearance_order(self):
+        codes, uniques = factorize(["b", "a", "b", "c"])
+        self.assertEqual(list(codes), [0, 1, 0, 2])
+        self.assertEqual(list(uniques), ["b", "a", "c"])
+
+        categorical = pd.Series(pd.Categorical(["y", "x", "y"], categories=["x", "y", "z"]))
+        codes, uniques = factorize(categorical)
+        self.assertEqual(list(codes), [0, 1, 0])
+        self.assertEqual(list(uniques), ["y", "x"])
+
+    def test_group_by_matches_pandas(self):
+        for agg in ("sum", "count", "mean", "min", "max"):
+            with self.subTest(agg=agg):
+                result = group_by(self.df, ["variety", "site"], "yield", agg).sort_values(["variety", "site"])
+                expected = self.df.groupby(["variety", "site"], as_index=False)["yield"].agg(agg)
+                np.testing.assert_allclose(result["yield"].to_numpy(), expected["yield"].to_numpy())
+                self.assertEqual(list(result["variety"]), list(expected["variety"]))
+
+    def test_group_by_skips_missing(self):
+        df = pd.DataFrame({"k": ["a", "a", "b", None], "v": [1.0, np.nan, 2.0, 5.0]})
+        result = group_by(df, ["k"], "v", "mean")
+        self.assertEqual(list(result["k"]), ["a", "b"])
+        self.assertEqual(list(result["v"]), [1.0, 2.0])
+
+    def test_rank_groups_matches_pandas_chain(self):
+        # 与 demo30 原先的 groupby + merge + Categorical + sort_values 链路结果一致
+        grouped = self.df.groupby(["variety", "site"], as_index=False)["yield"].sum()
+        totals = grouped.groupby("variety")["yield"].sum().reset_index()
+        totals.columns = ["variety", "total_yield"]
+        expected = pd.merge(grouped, totals, on="variety")
+        expected["site"] = pd.Categorical(expected["site"], categories=self.df["site"].unique().tolist(), ordered=True)
+        expected = expected.sort_values(["total_yield", "site"], ascending=[False, True])
+
+        result = rank_groups(self.df, "variety", "site", "yield", total_name="total_yield")
+        self.assertEqual(list(result["variety"]), list(expected["variety"]))
+        self.assertEqual(list(result["site"]), list(expected["site"]))
+        self.assertEqual(list(result["site"].cat.categories), list(expected["site"].cat.categories))
+        np.testing.assert_allclose(result["yield"], expected["yield"])
+        np.testing.assert_allclose(result["total_yield"], expected["total_yield"])
+
+    def test_rollup_and_top_n(self):
+        result = rollup(self.df, ["year", "site"], "yield")
+        self.assertEqual(sorted(result["_level"].unique()), [0, 1, 2])
+        grand_total = result.loc[result["_level"] == 0, "yield"].iloc[0]
+        self.assertAlmostEqual(grand_total, self.df["yield"].sum())
+
+        top = top_n(self.df, "variety", "yield", 3)
+        self.assertEqual(len(top), 4)
+        self.assertEqual(top["variety"].iloc[-1], "其他")
+        self.assertAlmostEqual(top["yield"].sum(), self.df["yield"].sum())
+        expected = self.df.groupby("variety")["yield"].sum().nlargest(3)
+        self.assertEqual(list(top["variety"][:3]), list(expected.index))
+
+    def test_rollup_and_top_n_other_aggs(self):
+        df = pd.DataFrame({"a": ["x", "x", "y", "y", "z", "z"], "b": [1, 2, 1, 2, 1, 2], "v": [1.0, 5.0, 2.0, 4.0, 9.0, 3.0]})
+        for agg in ("mean", "min", "max", "count"):
+            with self.subTest(agg=agg):
+                result = rollup(df, ["a", "b"], "v", agg)
+                grand_total = result.loc[result["_level"] == 0, "v"].iloc[0]
+                self.assertAlmostEqual(grand_total, df["v"].agg(agg))
+                subtotals = result.loc[result["_level"] == 1].set_index("a")["v"]
+                expected = df.groupby("a")["v"].agg(agg)
+                np.testing.assert_allclose(subtotals[expected.index].to_numpy(), expected.to_numpy())
+
+                top = top_n(df, "a", "v", 1, agg=agg)
+                grouped = df.groupby("a")["v"].agg(agg).sort_values(ascending=False, kind="stable")
+                self.assertEqual(list(top["a"]), [grouped.index[0], "其他"])
+                rest = df[df["a"] != grouped.index[0]]["v"]
+                self.assertAlmostEqual(top["v"].iloc[-1], rest.agg(agg))
+
+                # 其余分组为空时不追加 “其他”
+                top = top_n(df, "a", "v", 3, agg=agg)
+                self.assertEqual(len(top), 3)
@@ -0,0 +1,130 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase
+
+from utils.cache import CacheType, GlobalCache, SingleFlight, estimate_size
+
+
+class TestGlobalCache(TestCase):
+
+    def setUp(self):
+        self.cache = GlobalCache(hot_bytes=64 * 1024, session_bytes=64 * 1024, forever_bytes=64 * 1024, stripes=2)
+
+    def test_get_set_stats(self):
+        self.assertTrue(self.cache.set("a", [1, 2, 3]))
+        self.assertEqual(self.cache.get("a"), [1, 2, 3])
+        self.assertIsNone(self.cache.get("b"))
+
+        stats = self.cache.stats()[CacheType.HOT]
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["entries"], 1)
+        self.assertGreater(stats["bytes"], 0)
+
+    def test_byte_budget_evicts(self):
+        # 每个值约 4KB，分片预算 32KB，写入 40 个必然触发淘汰
+        for i in range(40):
+            self.cache.set(f"k{i}", b"x" * 4000, CacheType.FOREVER)
+        stats = self.cache.stats()[CacheType.FOREVER]
+        self.assertGreater(stats["evictions"], 0)
+        self.assertLessEqual(stats["bytes"], stats["max_bytes"])
+
+    def test_eviction_listener(self):
+        evicted = []
+        self.assertTrue(self.cache.add_eviction_listener(CacheType.FOREVER, lambda key, value: evicted.append(key)))
+        for i in range(40):
+            self.cache.set(f"k{i}", b"x" * 4000, CacheType.FOREVER)
+        self.assertEqual(len(evicted), self.cache.stats()[CacheType.FOREVER]["evictions"])
+        self.assertTrue(all(self.cache.get(key, CacheType.FOREVER) is None for key in evicted))
+
+    def test_too_large_rejected(self):
+        self.cache.set("big", b"small")
+        self.assertFalse(self.cache.set("big", b"x" * 100 * 1024))
+        self.assertIsNone(self.cache.get("big"))
+        self.assertEqual(self.cache.stats()[CacheType.HOT]["rejected"], 1)
+
+    def test_estimate_size_sampled(self):
+        rows = [{"国家": "中国", "数量": i} for i in range(10000)]
+        size = estimate_size(rows)
+        self.assertGreater(size, estimate_size(rows[:100]) * 50)
+
+    def test_concurrent_access(self):
+        def worker(n):
+            for i in range(500):
+                self.cache.set(f"{n}:{i % 20}", i, CacheType.SESSION)
+                self.cache.get(f"{n}:{(i + 1) % 20}", CacheType.SESSION)
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        stats = self.cache.stats()[CacheType.SESSION]
+        self.assertEqual(stats["sets"], 8 * 500)
+        self.assertEqual(stats["hits"] + stats["misses"], 8 * 500)
+
+
+class TestSingleFlight(TestCase):
+
+    def setUp(self):
+        self.flight = SingleFlight()
+        self.calls = 0
+
+    def _slow(self, value="v", error=None):
+        def func():
+            self.calls += 1
+            time.sleep(0.1)
+            if error:
+                raise error
+            return value
+        return func
+
+    def test_concurrent_calls_share_one_execution(self):
+        with ThreadPoolExecutor(8) as pool:
+            results = list(pool.map(lambda _: self.flight.do("k", self._slow()), range(8)))
+        self.assertEqual(results, ["v"] * 8)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual((self.flight.executions, self.flight.shared, self.flight.in_flight()), (1, 7, 0))
+        self.assertEqual(self.flight.do("k", self._slow("w")), "w") # 执行结束后不再合并
+
+    def test_error_shared(self):
+        def call(_):
+            try:
+                return self.flight.do("k", self._slow(error=ValueError("加载失败")))
+            except ValueError as e:
+                return str(e)
+
+        with ThreadPoolExecutor(4) as pool:
+            self.assertEqual(list(pool.map(call, range(4))), ["加载失败"] * 4)
+        self.assertEqual(self.calls, 1)
+
+    def test_async_and_leader_cancelled(self):
+        async def slow():
+            self.calls += 1
+            await asyncio.sleep(0.1)
+            return self.calls
+
+        async def main():
+            results = await asyncio.gather(*(self.flight.ado("k", slow) for _ in range(5)))
+            self.assertEqual(results, [1] * 5)
+
+            # 执行方被取消后，等待方重新执行而不是拿到取消异常
+            leader = asyncio.create_task(self.flight.ado("c", slow))
+            await asyncio.sleep(0.01)
+            waiter = asyncio.create_task(self.flight.ado("c", slow))
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            self.assertEqual(await waiter, 3)
+
+        asyncio.run(main())
+
+    def test_get_or_compute(self):
+        cache = GlobalCache(hot_bytes=64 * 1024, stripes=1)
+        with ThreadPoolExecutor(8) as pool:
+            results = list(pool.map(lambda _: cache.get_or_compute("k", self._slow()), range(8)))
+        self.assertEqual(results, ["v"] * 8)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(cache.get_or_compute("k", self._slow("w")), "v")
+        self.assertEqual(self.calls, 1)
@@ -0,0 +1,31 @@
+import uuid
+from unittest import TestCase
+
+import plotly.graph_objects as go
+
+from utils.chart_cache import cached_figure, cached_frame, content_key
+
+
+class TestChartCache(TestCase):
+
+    def setUp(self):
+        self.store_key = str(uuid.uuid4())
+        self.calls = 0
+
+    def _build_figure(self):
+        self.calls += 1
+        return go.Figure(data=[go.Bar(x=["中国", "美国"], y=[39, 40])])
+
+    def test_figure_built_once_per_config(self):
+        first = cached_figure(self.store_key, {"year": "2024"}, self._build_figure)
+        second = cached_figure(self.store_key, {"year": "2024"}, self._build_figure)
+        self.assertEqual(first, second)
+        self.assertEqual(self.calls, 1)
+
+        cached_figure(self.store_key, {"year": "2020"}, self._build_figure)
+        self.assertEqual(self.calls, 2)
+
+    def test_frame(self):
+        key = content_key('[{"a": 1}]')
+        df = cached_frame(key, {}, lambda: [1, 2, 3])
+        self.assertIs(df, cached_frame(key, {}, lambda: self.fail("不应重新构建")))
@@ -0,0 +1,102 @@
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+from utils.dataset_registry import DATA_DIR, DatasetRegistry, dataset_registry, load_json
+from utils.dataset_transform import unpivot
+
+
+class TestDatasetRegistry(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "medal.json")
+        self._write([{"年份": "2024", "国家": "中国", "数量": 39}, {"年份": "2020", "国家": "中国", "数量": 38}])
+        self.registry = DatasetRegistry()
+        self.registry.register("medal", lambda: load_json(self.path), self.path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _write(self, rows):
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(rows, f, ensure_ascii=False)
+
+    def test_load_once_and_view(self):
+        table = self.registry.get("medal")
+        self.assertEqual(table.num_rows, 2)
+        self.assertIs(table, self.registry.get("medal"))
+        self.assertIs(self.registry.rows("medal"), self.registry.rows("medal"))
+        self.assertEqual(self.registry.view_rows("medal", 年份="2024"), [{"年份": "2024", "国家": "中国", "数量": 39}])
+
+    def test_reload_on_mtime_change(self):
+        version = self.registry.version("medal")
+        self._write([{"年份": "2016", "国家": "中国", "数量": 26}])
+        os.utime(self.path, ns=(version + 10**9, version + 10**9))
+        self.assertNotEqual(self.registry.version("medal"), version)
+        self.assertEqual(self.registry.rows("medal"), [{"年份": "2016", "国家": "中国", "数量": 26}])
+        self.assertEqual(self.registry.view("medal", 年份="2024").num_rows, 0)
+
+    def test_view_frame_once_and_bounded(self):
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+        from unittest.mock import patch
+
+        from utils import dataset_registry as module
+
+        conversions = []
+
+        class SlowTable:
+            def __init__(self, table):
+                self.table = table
+
+            def to_pandas(self, **kwargs):
+                conversions.append(1)
+                time.sleep(0.05)
+                return self.table.to_pandas(**kwargs)
+
+        class SlowView(module._View):
+            def __init__(self, table):
+                super().__init__(SlowTable(table))
+
+        with patch.object(module, "_View", SlowView), ThreadPoolExecutor(8) as pool:
+            frames = list(pool.map(lambda _: self.registry.view_frame("medal", 年份="2024"), range(16)))
+        self.assertEqual(len(conversions), 1) # 并发请求只转换一次
+        self.assertTrue(all(frame is frames[0] for frame in frames))
+
+        for i in range(module._MAX_VIEWS + 10):
+            self.registry.view_frame("medal", 数量=i)
+        self.assertEqual(len(self.registry._dataset("medal").views), module._MAX_VIEWS)
+
+    def test_barley_by_year(self):
+        rows = dataset_registry.view_rows("barley", year=1931)
+        self.assertEqual(len(rows), 60)
+        self.assertTrue(all(row["year"] == 1931 for row in rows))
+
+    def test_projection_follows_source(self):
+        self.registry.register_projection("medal_long", "medal", lambda table: unpivot(table, ["年份", "国家"], ["数量"], "奖牌", "值"))
+        projection = self.registry.get("medal_long")
+        self.assertEqual(projection.column_names, ["年份", "国家", "奖牌", "值"])
+        self.assertIs(self.registry.view_frame("medal_long", 年份="2024"), self.registry.view_frame("medal_long", 年份="2024"))
+
+        version = self.registry.version("medal")
+        self._write([{"年份": "2016", "国家": "中国", "数量": 26}])
+        os.utime(self.path, ns=(version + 10**9, version + 10**9))
+        self.assertEqual(self.registry.version("medal_long"), self.registry.version("medal"))
+        self.assertEqual(self.registry.rows("medal_long"), [{"年份": "2016", "国家": "中国", "奖牌": "数量", "值": 26}])
+        self.assertEqual(len(self.registry.view_frame("medal_long", 年份="2024")), 0)
+
+    def test_medal_projections(self):
+        wide = dataset_registry.get("medal").to_pandas()
+        expected = wide.melt(id_vars=["年份", "国家"], value_vars=["金牌", "银牌", "铜牌"], var_name="奖牌", value_name="数量")
+        long = dataset_registry.get("medal_long").to_pandas()
+        self.assertEqual(
+            sorted(map(tuple, long.astype(str).values.tolist())),
+            sorted(map(tuple, expected.astype(str).values.tolist())),
+        )
+        self.assertIs(dataset_registry.get("medal_width"), dataset_registry.get("medal"))
+        # 长表只由规范宽表派生，不再单独存放（曾与宽表不一致：2024 美国铜牌 42 / 26）
+        bronze = long[(long["年份"] == "2024") & (long["国家"] == "美国") & (long["奖牌"] == "铜牌")]["数量"]
+        self.assertEqual(bronze.tolist(), [26])
+        self.assertFalse(os.path.exists(os.path.join(DATA_DIR, "medal_long.json")))
@@ -0,0 +1,53 @@
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+
+from utils.downsample import PixelBudget, lttb, prepare_chart, truncate_bars
+
+
+class TestDownsample(TestCase):
+
+    def test_lttb_keeps_endpoints_and_peaks(self):
+        x = np.arange(10_000)
+        y = np.sin(x / 500)
+        y[4321] = 10 # 尖峰必须保留
+        indices = lttb(x, y, 200)
+        self.assertEqual(len(indices), 200)
+        self.assertEqual((indices[0], indices[-1]), (0, 9_999))
+        self.assertIn(4321, indices)
+        self.assertTrue(np.all(np.diff(indices) > 0))
+
+    def test_line_within_budget_unchanged(self):
+        df = pd.DataFrame({"x": range(100), "y": range(100)})
+        render = prepare_chart(df, "line", "x", "y", budget=PixelBudget(width_px=200))
+        self.assertIs(render.frame, df)
+        self.assertFalse(render.reduced)
+
+    def test_line_per_series(self):
+        df = pd.DataFrame({"x": np.tile(np.arange(5_000), 2), "y": np.random.default_rng(0).random(10_000), "s": ["a"] * 5_000 + ["b"] * 5_000})
+        render = prepare_chart(df, "line", "x", "y", "s", PixelBudget(width_px=300))
+        self.assertTrue(render.reduced)
+        self.assertEqual(render.original_rows, 10_000)
+        self.assertEqual(render.frame.groupby("s").size().tolist(), [300, 300])
+
+    def test_truncate_bars_top_n_and_other(self):
+        df = pd.DataFrame({
+            "国家": [f"c{i}" for i in range(100)] * 2,
+            "奖牌": ["金牌"] * 100 + ["银牌"] * 100,
+            "数量": list(range(100)) * 2,
+        })
+        render = truncate_bars(df, "国家", "数量", "奖牌", PixelBudget(width_px=120, min_bar_px=6))
+        # 2 个系列，每个类别占 12px，最多 10 个类别：前 9 个 + “其他”
+        self.assertTrue(render.reduced)
+        self.assertEqual(render.original_rows, 200)
+        self.assertEqual(render.frame["国家"].nunique(), 10)
+        self.assertEqual(set(render.frame["国家"]) - {"其他"}, {f"c{i}" for i in range(91, 100)})
+        self.assertEqual(render.frame["数量"].sum(), df["数量"].sum())
+
+    def test_truncate_wide_metrics(self):
+        df = pd.DataFrame({"国家": [f"c{i}" for i in range(50)], "金牌": range(50), "银牌": range(50)})
+        render = truncate_bars(df, "国家", ["金牌", "银牌"], budget=PixelBudget(width_px=60, min_bar_px=6))
+        self.assertEqual(list(render.frame.columns), ["国家", "金牌", "银牌"])
+        self.assertEqual(len(render.frame), 5)
+        self.assertEqual(render.frame["银牌"].sum(), df["银牌"].sum())
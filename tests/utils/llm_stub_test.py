@@ -0,0 +1,54 @@
+import json
+import time
+from unittest import TestCase
+from unittest.mock import patch
+
+import httpx
+
+from utils.llm_stub import StubConfig, reply_tokens, start_stub
+
+
+class TestLLMStub(TestCase):
+
+    def setUp(self):
+        self.server = start_stub(config=StubConfig(latency=0, tps=0, tokens=20, think_tokens=5))
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_completion(self):
+        response = httpx.post(f"{self.server.base_url}/chat/completions", json={"messages": [{"role": "user", "content": "你好"}]})
+        body = response.json()
+        content = body["choices"][0]["message"]["content"]
+        self.assertTrue(content.startswith("<think>让我想一想</think>\n"))
+        self.assertEqual(body["usage"]["completion_tokens"], len(reply_tokens("你好", self.server.config)))
+
+    def test_stream(self):
+        with httpx.stream("POST", f"{self.server.base_url}/chat/completions",
+                          json={"messages": [{"role": "user", "content": "你好"}], "stream": True}) as response:
+            lines = [line for line in response.iter_lines() if line.startswith("data: ")]
+        self.assertEqual(lines[-1], "data: [DONE]")
+        chunks = [json.loads(line[6:]) for line in lines[:-1]]
+        self.assertEqual(chunks[-1]["choices"][0]["finish_reason"], "stop")
+        text = "".join(chunk["choices"][0]["delta"].get("content", "") for chunk in chunks)
+        self.assertEqual(text, "".join(reply_tokens("你好", self.server.config)))
+
+    def test_pacing(self):
+        self.server.config = StubConfig(latency=0.1, tps=100, tokens=10, think_tokens=0)
+        start = time.perf_counter()
+        httpx.post(f"{self.server.base_url}/chat/completions", json={"messages": [{"role": "user", "content": "q"}]})
+        # 首 token 0.1s + 9 个间隔 0.09s
+        self.assertGreaterEqual(time.perf_counter() - start, 0.19)
+
+    def test_openai_agent_through_stub(self):
+        from agent import openai_agent
+
+        with patch.object(openai_agent, "LLM_BASE_URL", self.server.base_url), patch.object(openai_agent, "model", None):
+            chunks = list(openai_agent.stream_reply(
+                {"messages": [{"role": "user", "content": "北京奥运会"}]}, {"configurable": {"bypass_cache": True}}
+            ))
+        reply = "".join(text for node, text in chunks if node == "model")
+        self.assertNotIn("<think>", reply)
+        self.assertTrue(reply.startswith("这是对「")) # 提示词模板整体作为用户消息发送
+        self.assertGreaterEqual(self.server.stats()["requests"], 1)
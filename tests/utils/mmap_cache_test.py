@@ -0,0 +1,89 @@
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+import pyarrow as pa
+
+from utils.mmap_cache import MmapTier
+
+
+class TestMmapTier(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.tier = MmapTier("shared", self.tmp_dir.name, 1024 * 1024)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_removed_after_stat_is_miss(self):
+        self.tier.set("k1", pa.table({"a": [1, 2, 3]}))
+        # 模拟其他进程在 stat 与 mmap 之间删除文件
+        real_stat = os.stat
+
+        def stat_then_remove(path, *args, **kwargs):
+            result = real_stat(path, *args, **kwargs)
+            os.remove(path)
+            return result
+
+        with patch("utils.mmap_cache.os.stat", side_effect=stat_then_remove):
+            self.assertIsNone(self.tier.get("k1"))
+        self.assertEqual(self.tier.stats()["misses"], 1)
+
+    def test_truncated_file_is_miss(self):
+        self.tier.set("k1", pa.table({"a": list(range(1000))}))
+        path = self.tier._path("k1", ".arrow")
+        with open(path, "r+b") as f:
+            f.truncate(os.path.getsize(path) // 2)
+        self.assertIsNone(self.tier.get("k1"))
+
+    def test_small_values_as_json(self):
+        self.assertTrue(self.tier.set("alias", "0123abcd"))
+        self.assertEqual(self.tier.get("alias"), "0123abcd")
+        self.assertTrue(os.path.exists(self.tier._path("alias", ".json")))
+        # 不可 JSON 序列化的值拒绝写入，不回退到 pickle
+        self.assertFalse(self.tier.set("obj", object()))
+        self.assertEqual(os.listdir(self.tmp_dir.name), [os.path.basename(self.tier._path("alias", ".json"))])
+
+    def test_private_dir(self):
+        path = os.path.join(self.tmp_dir.name, "shared")
+        os.makedirs(path, mode=0o777)
+        os.chmod(path, 0o777)
+        MmapTier("shared", path, 1024)
+        self.assertEqual(os.stat(path).st_mode & 0o777, 0o700)
+
+        link = os.path.join(self.tmp_dir.name, "link")
+        os.symlink(path, link)
+        with self.assertRaises(PermissionError):
+            MmapTier("shared", link, 1024)
+        if os.getuid() == 0: # 仅 root 可以构造属于其他用户的目录
+            os.chown(path, 12345, 12345)
+            with self.assertRaises(PermissionError):
+                MmapTier("shared", path, 1024)
+
+    def test_cleanup_is_amortized(self):
+        tier = MmapTier("shared", self.tmp_dir.name, 1024 * 1024, cleanup_every=16)
+        table = pa.table({"a": list(range(1000))}) # 约 8KB
+        with patch.object(tier, "_files", wraps=tier._files) as files:
+            for i in range(8):
+                tier.set(f"k{i}", table)
+            self.assertEqual(files.call_count, 1) # 首次写入时扫描一次
+            for i in range(8, 300):
+                tier.set(f"k{i}", table)
+            self.assertLess(files.call_count, 300 // 8) # 目录满载后也不是每次写入都扫描
+        # 字节预算仍然生效
+        self.assertLessEqual(tier.stats()["bytes"], 1024 * 1024)
+        self.assertGreater(tier.stats()["evictions"], 0)
+        self.assertIsNotNone(tier.get("k299"))
+
+    def test_stats_without_scanning(self):
+        table = pa.table({"a": list(range(1000))})
+        for i in range(4):
+            self.tier.set(f"k{i}", table)
+        exact = self.tier.stats(exact=True)
+        with patch.object(self.tier, "_files", wraps=self.tier._files) as files:
+            for _ in range(100):
+                stats = self.tier.stats()
+            self.assertEqual(files.call_count, 0) # 热路径不扫描目录
+        self.assertEqual((stats["entries"], stats["bytes"]), (exact["entries"], exact["bytes"]))
@@ -0,0 +1,123 @@
+import tempfile
+from unittest import TestCase
+
+from utils.cache import GlobalCache
+from utils.dataset_registry import dataset_registry
+from utils.payload_store import PayloadStore
+
+
+
+class TestPayloadStore(TestCase):
+
+    def setUp(self):
+        self.store = PayloadStore(GlobalCache(hot_bytes=1024 * 1024, stripes=1))
+        self.rows = [dict(row) for row in dataset_registry.rows("medal_long")]
+
+    def test_put_get_frame(self):
+        payload = self.store.put("k1", self.rows)
+        self.assertEqual(payload.row_count, len(self.rows))
+        self.assertEqual(payload.schema["数量"], "int64")
+        self.assertEqual(payload.schema["国家"], "string")
+
+        df = self.store.get_frame("k1")
+        self.assertEqual(len(df), len(self.rows))
+        # 同一载荷重复获取不重建 DataFrame
+        self.assertIs(df, self.store.get_frame("k1"))
+        self.assertEqual(payload.to_rows(), self.rows)
+
+    def test_dedup_by_content(self):
+        payloads = [self.store.put(f"k{i}", self.rows) for i in range(100)]
+        self.assertTrue(all(payload is payloads[0] for payload in payloads))
+        self.assertEqual(self.store.cache.stats()["hot"]["entries"], 101) # 100 个别名 + 1 份内容
+        self.assertEqual(self.store.ref_count("k0"), 100)
+
+        other = self.store.put("other", self.rows[:3])
+        self.assertIsNot(other, payloads[0])
+        for i in range(99):
+            self.store.delete(f"k{i}")
+        self.assertIsNone(self.store.get("k0"))
+        self.assertIs(self.store.get("k99"), payloads[0])
+        self.store.delete("k99")
+        self.assertIsNone(self.store.cache.get(self.store.content_key(payloads[0].store_key.split(":")[-1])))
+
+        # store_key 改为指向其他内容时释放旧内容的引用
+        self.store.put("k1", self.rows)
+        self.store.put("k1", self.rows[:3])
+        self.assertEqual(self.store.ref_count("k1"), 2)
+        self.assertIs(self.store.get("k1"), other)
+
+    def test_refs_bounded_by_eviction(self):
+        store = PayloadStore(GlobalCache(hot_bytes=64 * 1024, stripes=1))
+        for i in range(2000):
+            store.put(f"k{i}", self.rows[:3])
+        live = store.cache.stats()["hot"]["entries"] - 1 # 除内容外都是别名
+        # 被淘汰的别名不再计入引用，引用数随缓存中的别名数有界
+        self.assertEqual(store.ref_count("k1999"), live)
+        self.assertLess(live, 2000)
+        self.assertEqual(sum(len(keys) for keys in store._refs.values()), live)
+
+    def test_missing(self):
+        self.assertIsNone(self.store.get("nope"))
+        self.assertIsNone(self.store.get_frame("nope"))
+        self.assertIsNone(self.store.get_slice("nope"))
+
+    def test_get_slice(self):
+        self.store.put("k1", self.rows)
+        page = self.store.get_slice("k1", offset=2, limit=3, columns=["国家", "数量"])
+        self.assertEqual(page.total_rows, len(self.rows))
+        self.assertEqual(page.table.column_names, ["国家", "数量"])
+        self.assertEqual(page.to_rows(), [{"国家": r["国家"], "数量": r["数量"]} for r in self.rows[2:5]])
+        self.assertEqual(list(page.to_frame().index), [2, 3, 4])
+
+        # 过滤 + 排序（字典编码列参与排序）
+        china = [r for r in self.rows if r["国家"] == "中国"]
+        expected = sorted(china, key=lambda r: (-r["数量"], r["奖牌"]))
+        page = self.store.get_slice("k1", 0, 2, sort=["-数量", "奖牌"], filter={"国家": "中国"})
+        self.assertEqual(page.total_rows, len(china))
+        self.assertEqual(page.to_rows(), expected[:2])
+        page = self.store.get_slice("k1", 2, 100, sort=["-数量", "奖牌"], filter={"国家": ["中国"]})
+        self.assertEqual(page.to_rows(), expected[2:])
+
+
+class TestMmapPayloadStore(TestCase):
+
+    def setUp(self):
+        from utils.cache import CacheType
+        from utils.mmap_cache import MmapTier
+        from utils.payload_store import ColumnarPayload
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        wrap = lambda key, table: ColumnarPayload(key.split(":", 1)[-1], table)
+        # 模拟同一节点的两个进程：各自的缓存实例指向同一目录
+        self.stores = []
+        for _ in range(2):
+            cache = GlobalCache(hot_bytes=1024 * 1024, stripes=1)
+            cache.register_tier(CacheType.SHARED, MmapTier(CacheType.SHARED, self.tmp_dir.name, 1024 * 1024, wrap=wrap))
+            self.stores.append(PayloadStore(cache, CacheType.SHARED))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_shared_between_instances(self):
+        rows = [{"国家": "中国", "数量": i} for i in range(100)]
+        self.stores[0].put("k1", rows)
+
+        payload = self.stores[1].get("k1")
+        self.assertIsNotNone(payload)
+        self.assertEqual(payload.to_rows(), rows)
+        self.assertIs(payload, self.stores[1].get("k1"))
+        # 共享目录中只有一份内容文件，k1 是指向它的别名
+        self.assertEqual(self.stores[1].cache._tier("shared").keys(), [f"payload:{payload.store_key}"])
+
+        self.stores[1].delete("k1")
+        self.assertIsNone(self.stores[0].get("k1"))
+
+    def test_shared_delete_keeps_content(self):
+        rows = [{"国家": "中国", "数量": i} for i in range(100)]
+        self.stores[0].put("k1", rows)
+        self.stores[1].put("k2", rows)
+        # 一个进程删除自己的别名，不影响其他进程指向同一内容的别名
+        self.stores[0].delete("k1")
+        self.stores[1].delete("k1")
+        self.assertIsNone(self.stores[1].get("k1"))
+        self.assertEqual(self.stores[0].get("k2").to_rows(), rows)
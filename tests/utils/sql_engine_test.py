@@ -0,0 +1,92 @@
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+from utils.dataset_registry import DatasetRegistry, load_json
+from utils.sql_engine import SqlEngine, SqlError, normalize_sql
+
+
+class TestSqlEngine(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "medal.json")
+        self._write([
+            {"年份": "2024", "国家": "中国", "金牌": 40},
+            {"年份": "2024", "国家": "美国", "金牌": 40},
+            {"年份": "2020", "国家": "中国", "金牌": 38},
+        ])
+        registry = DatasetRegistry()
+        registry.register("medal", lambda: load_json(self.path), self.path)
+        self.engine = SqlEngine(registry, max_rows=2)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _write(self, rows):
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(rows, f, ensure_ascii=False)
+
+    def test_normalize(self):
+        sql = "SELECT  国家 -- 注释\n FROM Medal WHERE 国家 = 'China' ;"
+        self.assertEqual(normalize_sql(sql), "select 国家 from medal where 国家 = 'China'")
+        self.assertEqual(normalize_sql('select "A"  /* x */from t;;'), 'select "A" from t')
+
+    def test_aggregate_and_cache(self):
+        sql = "select 国家, sum(金牌) as 金牌 from medal group by 国家 order by 国家"
+        result = self.engine.query(sql)
+        self.assertEqual(result.table.to_pylist(), [{"国家": "中国", "金牌": 78}, {"国家": "美国", "金牌": 40}])
+        self.assertEqual(list(result.versions), ["medal"])
+        self.assertIs(self.engine.query(sql.replace("select", "SELECT") + " ;"), result) # 规范化后命中缓存
+
+    def test_truncate(self):
+        result = self.engine.query("select * from medal")
+        self.assertTrue(result.truncated)
+        self.assertEqual(result.row_count, 2)
+
+    def test_reload_on_version_change(self):
+        sql = "select count(*) as n from medal"
+        result = self.engine.query(sql)
+        self._write([{"年份": "2016", "国家": "中国", "金牌": 26}])
+        os.utime(self.path, ns=(result.versions["medal"] + 10**9, result.versions["medal"] + 10**9))
+        changed = self.engine.query(sql)
+        self.assertNotEqual(changed.key, result.key)
+        self.assertEqual(changed.table.to_pylist(), [{"n": 1}])
+
+    def test_read_only(self):
+        for sql in ("delete from medal", "select 1; drop table medal", "select * from sqlite_master; pragma writable_schema=1"):
+            with self.subTest(sql=sql), self.assertRaises(SqlError):
+                self.engine.query(sql)
+        with self.assertRaises(SqlError):
+            self.engine.query("with t as (select 1) insert into medal values ('2000', 'x', 1)")
+
+    def test_dynamic_and_empty_columns(self):
+        # SQLite 同一列可能混合整数与字符串，整列转为字符串
+        result = self.engine.query("select 1 as a union all select 'x'")
+        self.assertEqual(result.table.column("a").to_pylist(), ["1", "x"])
+        result = self.engine.query("select \"国家\", case when \"金牌\" > 39 then '多' else 0 end as n from medal order by \"金牌\"")
+        self.assertEqual(result.table.column("n").to_pylist(), ["0", "多"])
+
+        # 空结果保留源表的列类型
+        result = self.engine.query("select * from medal where 1 = 0")
+        self.assertEqual(result.row_count, 0)
+        self.assertEqual(str(result.table.schema.field("金牌").type), "int64")
+        self.assertEqual(str(result.table.schema.field("国家").type), "string")
+
+    def test_validate(self):
+        self.assertEqual(self.engine.validate("SELECT * FROM medal;"), "select * from medal")
+        for sql in ["With 2024 data, who won?", "select 1; select 2", "select * from nope", "delete from medal"]:
+            with self.subTest(sql=sql), self.assertRaises(SqlError):
+                self.engine.validate(sql)
+
+    def test_missing_dataset(self):
+        self.engine.registry.register("missing", lambda: load_json(self.path + ".missing"), self.path + ".missing")
+        for sql in ("select * from missing", "select * from medal, missing"):
+            with self.subTest(sql=sql):
+                with self.assertRaises(SqlError):
+                    self.engine.validate(sql)
+                with self.assertRaises(SqlError):
+                    self.engine.query(sql)
+        self.assertEqual(self.engine.query("select count(*) as n from medal").table.to_pylist(), [{"n": 3}])
+
@@ -0,0 +1,93 @@
+import asyncio
+import json
+import os
+import tempfile
+import tracemalloc
+from unittest import TestCase
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.graph import StateGraph, MessagesState, START, END
+
+from utils.tracing import NodeTracer, output_size
+
+
+class TestTracing(TestCase):
+
+    def setUp(self):
+        self.tracer = NodeTracer(enabled=True, trace_memory=False, log_path="")
+
+    def build_graph(self, async_mode: bool = False):
+        def start(state: MessagesState, config: RunnableConfig):
+            # 包装后仍按签名注入 config
+            return {"messages": [AIMessage(content=config["configurable"]["data_type"])]}
+
+        def model(state: MessagesState):
+            return {"messages": [AIMessage(content="x" * 1000)]}
+
+        async def amodel(state: MessagesState):
+            await asyncio.sleep(0.01)
+            return {"messages": [AIMessage(content="x" * 1000)]}
+
+        graph = StateGraph(MessagesState)
+        graph.add_node("start", self.tracer.wrap("demo", "start", start))
+        graph.add_node("model", self.tracer.wrap("demo", "model", amodel if async_mode else model))
+        graph.add_edge(START, "start")
+        graph.add_edge("start", "model")
+        graph.add_edge("model", END)
+        return graph.compile()
+
+    def test_spans_by_turn(self):
+        graph = self.build_graph()
+        config = {"configurable": {"data_type": "medal", "turn_id": "t1", "thread_id": "s1"}}
+        result = graph.invoke({"messages": [HumanMessage(content="q")]}, config=config)
+        self.assertEqual(result["messages"][1].content, "medal")
+        graph.invoke({"messages": [HumanMessage(content="q")]}, config={"configurable": {"data_type": "medal", "turn_id": "t2"}})
+
+        spans = self.tracer.spans(turn_id="t1")
+        self.assertEqual([span.node for span in spans], ["start", "model"])
+        self.assertEqual(spans[0].thread_id, "s1")
+        self.assertGreaterEqual(spans[1].output_bytes, 1000)
+        self.assertEqual(len(self.tracer.spans()), 4)
+
+    def test_async_node(self):
+        graph = self.build_graph(async_mode=True)
+        asyncio.run(graph.ainvoke({"messages": [HumanMessage(content="q")]}, config={"configurable": {"data_type": "a", "turn_id": "t"}}))
+        model_span = self.tracer.spans(turn_id="t")[-1]
+        self.assertEqual(model_span.node, "model")
+        self.assertGreaterEqual(model_span.wall_ms, 10)
+
+    def test_error_recorded(self):
+        def broken(state):
+            raise ValueError("bad")
+
+        with self.assertRaises(ValueError):
+            self.tracer.wrap("demo", "broken", broken)({})
+        self.assertEqual(self.tracer.spans()[-1].error, "ValueError")
+        self.assertIn('agent_node_errors_total{graph="demo",node="broken"} 1', self.tracer.to_prometheus())
+
+    def test_export(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            log_path = os.path.join(tmp_dir, "trace.jsonl")
+            tracer = NodeTracer(enabled=True, trace_memory=True, log_path=log_path)
+            node = tracer.wrap("demo", "alloc", lambda state: {"data": [0] * 100_000})
+            try:
+                node({})
+                node({})
+            finally:
+                tracemalloc.stop()
+            with open(log_path, encoding="utf-8") as f:
+                records = [json.loads(line) for line in f]
+        self.assertEqual(len(records), 2)
+        self.assertGreater(records[0]["peak_bytes"], 100_000 * 8 // 2)
+        self.assertEqual(tracer.to_jsonl().count("\n"), 2)
+
+        text = tracer.to_prometheus()
+        self.assertIn('agent_node_duration_seconds_count{graph="demo",node="alloc"} 2', text)
+        self.assertIn('agent_node_duration_seconds_bucket{graph="demo",node="alloc",le="+Inf"} 2', text)
+
+    def test_output_size(self):
+        self.assertEqual(output_size("中文"), 6)
+        self.assertEqual(output_size({"messages": [AIMessage(content="abc", additional_kwargs={"a": b"1234"})]}), 8 + 3 + 1 + 4)
+        # 大列表按采样外推
+        self.assertEqual(output_size([{"k": "v"}] * 10_000), 20_000)